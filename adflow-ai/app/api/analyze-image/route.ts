@@ -2,7 +2,7 @@ import { NextRequest, NextResponse } from 'next/server';
 import { put } from '@vercel/blob';
 import fs from 'fs';
 import path from 'path';
-import { executePipelexWorkflow } from '@/lib/pipelex-client';
+import { errorStatus, executePipelexWorkflow } from '@/lib/pipelex-client';
 
 export async function POST(request: NextRequest) {
   try {
@@ -50,7 +50,7 @@ export async function POST(request: NextRequest) {
     const result = await executePipelexWorkflow('analyze_product_image', {
       image_url: uploadedImageUrl,
       product_info: productInfo,
-    });
+    }, { signal: request.signal });
 
     if (!result.success) {
       return NextResponse.json(
@@ -58,7 +58,7 @@ export async function POST(request: NextRequest) {
           success: false,
           error: result.error || 'Failed to analyze image'
         },
-        { status: 500 }
+        { status: errorStatus(result) }
       );
     }
 
@@ -2,7 +2,7 @@ import { NextRequest, NextResponse } from 'next/server';
 import { put } from '@vercel/blob';
 import fs from 'fs';
 import path from 'path';
-import { executePipelexWorkflow } from '@/lib/pipelex-client';
+import { errorStatus, executePipelexWorkflow } from '@/lib/pipelex-client';
 import type { AdGenerationRequest, AdGenerationResponse } from '@/types/ad-generation';
 
 export async function POST(request: NextRequest) {
@@ -58,7 +58,7 @@ export async function POST(request: NextRequest) {
     const result = await executePipelexWorkflow('generate_complete_ad', {
       image_url: uploadedImageUrl,
       product_info: productInfo,
-    });
+    }, { signal: request.signal });
 
     if (!result.success) {
       return NextResponse.json(
@@ -66,7 +66,7 @@ export async function POST(request: NextRequest) {
           success: false,
           error: result.error || 'Failed to generate ad'
         },
-        { status: 500 }
+        { status: errorStatus(result) }
       );
     }
 
@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { executePipelexWorkflow } from '@/lib/pipelex-client';
+import { errorStatus, executePipelexWorkflow } from '@/lib/pipelex-client';
 
 export async function POST(request: NextRequest) {
   try {
@@ -19,7 +19,7 @@ export async function POST(request: NextRequest) {
     // Execute video generation workflow
     const result = await executePipelexWorkflow('generate_video', {
       video_prompt: truncatedPrompt,
-    });
+    }, { signal: request.signal });
 
     if (!result.success) {
       return NextResponse.json(
@@ -27,7 +27,7 @@ export async function POST(request: NextRequest) {
           success: false,
           error: result.error || 'Failed to generate video'
         },
-        { status: 500 }
+        { status: errorStatus(result) }
       );
     }
 
@@ -0,0 +1,89 @@
+import { NextRequest, NextResponse } from 'next/server';
+import fs from 'fs';
+import path from 'path';
+import { Readable } from 'stream';
+
+// Directory scripts/video_store.py downloads rendered videos to
+const VIDEO_DIR = path.join(
+  process.env.ADFLOW_DATA_DIR || path.join(process.cwd(), '.cache'),
+  'videos'
+);
+const VIDEO_ID = /^[0-9a-f]{64}$/;
+
+interface StoredVideo {
+  size: number;
+  mime_type: string;
+  sha256: string;
+}
+
+function notFound(id: string) {
+  return NextResponse.json(
+    { success: false, error: `Video ${id} not found` },
+    { status: 404 }
+  );
+}
+
+function fileBody(filePath: string, start: number, end: number): ReadableStream {
+  return Readable.toWeb(fs.createReadStream(filePath, { start, end })) as ReadableStream;
+}
+
+// GET: Play a stored video, with Range support for seeking
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  const { id } = await params;
+  if (!VIDEO_ID.test(id)) {
+    return notFound(id);
+  }
+
+  let video: StoredVideo;
+  try {
+    video = JSON.parse(await fs.promises.readFile(path.join(VIDEO_DIR, `${id}.json`), 'utf8'));
+  } catch {
+    return notFound(id);
+  }
+
+  const filePath = path.join(VIDEO_DIR, `${id}.bin`);
+  const size = video.size;
+  // The store evicts the least recently played videos first
+  const now = new Date();
+  fs.promises.utimes(filePath, now, now).catch(() => {});
+  // An id can name other bytes after eviction and a re-render: revalidate by content hash
+  const headers: Record<string, string> = {
+    'Accept-Ranges': 'bytes',
+    'Cache-Control': 'public, no-cache',
+    'Content-Type': video.mime_type,
+    ETag: `"${video.sha256}"`,
+  };
+
+  if (request.headers.get('if-none-match')?.includes(headers.ETag)) {
+    return new Response(null, { status: 304, headers });
+  }
+
+  const range = /^bytes=(\d*)-(\d*)$/.exec(request.headers.get('range') || '');
+  if (!range || (range[1] === '' && range[2] === '')) {
+    return new Response(fileBody(filePath, 0, size - 1), {
+      headers: { ...headers, 'Content-Length': String(size) },
+    });
+  }
+
+  // "bytes=-N" is the last N bytes
+  const start = range[1] === '' ? Math.max(0, size - Number(range[2])) : Number(range[1]);
+  const end = range[1] !== '' && range[2] !== '' ? Math.min(Number(range[2]), size - 1) : size - 1;
+  if (start > end) {
+    return new Response(null, {
+      status: 416,
+      headers: { ...headers, 'Content-Range': `bytes */${size}` },
+    });
+  }
+
+  return new Response(fileBody(filePath, start, end), {
+    status: 206,
+    headers: {
+      ...headers,
+      'Content-Range': `bytes ${start}-${end}/${size}`,
+      'Content-Length': String(end - start + 1),
+    },
+  });
+}
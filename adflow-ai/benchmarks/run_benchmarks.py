@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+AdFlow AI - Offline Benchmarks
+Load-tests railway_api.py and AdGenerator against the stub inference backend
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --levels 1,8,32 --requests 200 --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json   # exit 1 on regression
+    python benchmarks/run_benchmarks.py --cassette .cache/cassettes/pipes.jsonl.gz
+
+Pipe latencies and failure rates come from [stub_backend] in pipelex_config.toml,
+or with --cassette from real calls recorded with ADFLOW_INFERENCE_BACKEND=record,
+scaled by --latency-scale. No inference provider is called.
+
+Reports, per concurrency level: throughput, p50/p95/p99 latency, status codes
+and traced memory per in-flight request; then the latency of the same request
+through the in-process generator, a warm worker and a one-shot
+workflow_executor.py subprocess.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+EXECUTOR = PROJECT_ROOT / "scripts" / "workflow_executor.py"
+
+
+def configure_environment(latency_scale: float, seed: int, cassette: Optional[Path] = None) -> None:
+    """Point the app at the stub (or cassette) backend and a throwaway data directory (before importing it)"""
+    if cassette is not None:
+        os.environ["ADFLOW_INFERENCE_BACKEND"] = "replay"
+        os.environ["ADFLOW_CASSETTE"] = str(cassette.resolve())
+        os.environ["ADFLOW_CASSETTE_LATENCY_SCALE"] = str(latency_scale)
+    else:
+        os.environ["ADFLOW_INFERENCE_BACKEND"] = "stub"
+        os.environ["ADFLOW_STUB_LATENCY_SCALE"] = str(latency_scale)
+        os.environ["ADFLOW_STUB_SEED"] = str(seed)
+    os.environ.setdefault("ADFLOW_DATA_DIR", tempfile.mkdtemp(prefix="adflow-bench-"))
+    # Pipelex.make() requires provider keys to be set, even though none is used
+    os.environ.setdefault("BLACKBOX_API_KEY", "stub")
+    os.environ.setdefault("PIPELEX_INFERENCE_API_KEY", "stub")
+
+
+def make_image(index: int) -> str:
+    """
+    A small PNG data URI that is unique per index, so caches do not hide the work
+
+    Each image is its own random 16x16 block pattern: images that only differ
+    in a few pixels would be near-duplicates and skip analyze_product.
+    """
+    import random
+    from PIL import Image
+
+    rng = random.Random(index)
+    blocks = Image.new("RGB", (16, 16))
+    blocks.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(16 * 16)])
+    image = blocks.resize((256, 256), Image.NEAREST)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1)
+    }
+
+
+def ad_request(index: int) -> Dict[str, Any]:
+    return {
+        "image_url": make_image(index),
+        "product_info": {"name": f"Benchmark product {index}"}
+    }
+
+
+async def run_level(client, path: str, concurrency: int, total: int, offset: int) -> Dict[str, Any]:
+    """Closed-loop load: `concurrency` clients send `total` requests back to back"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_index = iter(range(offset, offset + total))
+
+    async def client_loop():
+        for index in next_index:
+            payload = ad_request(index)
+            started = time.perf_counter()
+            response = await client.post(path, json=payload)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    tracemalloc.reset_peak()
+    memory_before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    _, memory_peak = tracemalloc.get_traced_memory()
+
+    ok = statuses.get(200, 0)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        **summarize(latencies),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "peak_kib_per_inflight_request": round(max(0, memory_peak - memory_before) / 1024 / concurrency, 1)
+    }
+
+
+async def benchmark_api(app, path: str, levels: List[int], requests: int) -> List[Dict[str, Any]]:
+    """Drive the FastAPI app in-process at each concurrency level"""
+    import httpx
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            offset = 0
+            for concurrency in levels:
+                result = await run_level(client, path, concurrency, requests, offset)
+                offset += requests
+                results.append(result)
+                print(
+                    f"  c={concurrency:<4} {result['throughput_rps']:>8.2f} req/s  "
+                    f"p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+                    f"p99 {result['p99_ms']:>8.1f} ms  {result['peak_kib_per_inflight_request']:>8.1f} KiB/req  "
+                    f"{result['statuses']}",
+                    flush=True
+                )
+    return results
+
+
+async def benchmark_in_process(generator, samples: int) -> List[float]:
+    """generate_complete_ad called directly on the API's AdGenerator"""
+    await generator.bundles.load_all()
+    latencies = []
+    for index in range(samples):
+        payload = ad_request(1_000_000 + index)
+        started = time.perf_counter()
+        await generator.generate_complete_ad(**payload)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def benchmark_one_shot(samples: int) -> List[float]:
+    """One workflow_executor.py subprocess per request (the legacy Next.js path)"""
+    latencies = []
+    for index in range(samples):
+        request = json.dumps({"workflow_name": "generate_complete_ad", "inputs": ad_request(2_000_000 + index)})
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, str(EXECUTOR)],
+            input=request,
+            capture_output=True,
+            text=True,
+            cwd=PROJECT_ROOT,
+            check=False
+        )
+        latencies.append(time.perf_counter() - started)
+        if completed.returncode != 0:
+            raise RuntimeError(f"workflow_executor.py failed: {completed.stderr[-2000:]}")
+    return latencies
+
+
+def read_message(stream) -> Dict[str, Any]:
+    """Next NDJSON message from a worker, skipping any log lines printed before it"""
+    for line in stream:
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(message, dict):
+            return message
+    raise RuntimeError("workflow_executor.py --worker exited")
+
+
+def benchmark_worker(samples: int) -> List[float]:
+    """Sequential requests to one warm `workflow_executor.py --worker` process"""
+    worker = subprocess.Popen(
+        [sys.executable, str(EXECUTOR), "--worker"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        cwd=PROJECT_ROOT
+    )
+    try:
+        if read_message(worker.stdout).get("event") != "ready":
+            raise RuntimeError("workflow_executor.py --worker did not start")
+        latencies = []
+        for index in range(samples):
+            request = {"id": index, "workflow_name": "generate_complete_ad", "inputs": ad_request(3_000_000 + index)}
+            started = time.perf_counter()
+            worker.stdin.write(json.dumps(request) + "\n")
+            worker.stdin.flush()
+            read_message(worker.stdout)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+    finally:
+        worker.stdin.close()
+        worker.wait(timeout=30)
+
+
+def compare_paths(generator, samples: int) -> Dict[str, Dict[str, float]]:
+    """Latency of the same request through each execution path"""
+    paths = {
+        "in_process": asyncio.run(benchmark_in_process(generator, samples)),
+        "warm_worker": benchmark_worker(samples),
+        "subprocess_per_request": benchmark_one_shot(samples)
+    }
+    results = {}
+    for name, latencies in paths.items():
+        results[name] = summarize(latencies)
+        print(f"  {name:<24} p50 {results[name]['p50_ms']:>8.1f} ms  p95 {results[name]['p95_ms']:>8.1f} ms", flush=True)
+    return results
+
+
+def find_regressions(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float
+) -> List[str]:
+    """Levels whose throughput dropped or p95 grew by more than `tolerance`"""
+    regressions = []
+    previous = {level["concurrency"]: level for level in baseline.get("api", [])}
+    for level in current["api"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+        if level["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"c={level['concurrency']}: throughput {before['throughput_rps']} -> {level['throughput_rps']} req/s"
+            )
+        if level["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"c={level['concurrency']}: p95 {before['p95_ms']} -> {level['p95_ms']} ms"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test of the AdFlow API with stubbed inference")
+    parser.add_argument("--endpoint", default="/api/generate-ad", help="API path to load")
+    parser.add_argument("--levels", default="1,4,16,64", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Requests sent per level")
+    parser.add_argument("--latency-scale", type=float, default=0.01,
+                        help="Multiplier on the [stub_backend] or recorded latencies (1.0 = production-like)")
+    parser.add_argument("--cassette", type=Path,
+                        help="Replay pipe calls recorded with ADFLOW_INFERENCE_BACKEND=record instead of the stub")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the stub backend")
+    parser.add_argument("--path-samples", type=int, default=5,
+                        help="Requests per execution path in the subprocess comparison (0 to skip)")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Earlier --output file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative throughput drop / p95 increase before failing")
+    args = parser.parse_args(argv)
+    # Importing railway_api moves the working directory to the project root
+    for name in ("cassette", "output", "baseline"):
+        if getattr(args, name) is not None:
+            setattr(args, name, getattr(args, name).resolve())
+
+    configure_environment(args.latency_scale, args.seed, args.cassette)
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+
+    sys.path.insert(0, str(PROJECT_ROOT))
+    import railway_api
+
+    tracemalloc.start()
+    backend = f"cassette {args.cassette}" if args.cassette else "stub"
+    print(f"API {args.endpoint} ({backend} latency x{args.latency_scale}, {args.requests} requests per level)")
+    results: Dict[str, Any] = {
+        "endpoint": args.endpoint,
+        "latency_scale": args.latency_scale,
+        "api": asyncio.run(benchmark_api(railway_api.app, args.endpoint, levels, args.requests))
+    }
+    tracemalloc.stop()
+
+    if args.path_samples > 0:
+        print(f"Execution paths ({args.path_samples} sequential generate_complete_ad requests each)")
+        results["paths"] = compare_paths(railway_api.generator, args.path_samples)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        regressions = find_regressions(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
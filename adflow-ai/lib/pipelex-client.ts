@@ -1,22 +1,243 @@
-import { spawn } from 'child_process';
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
 import path from 'path';
-import type { PipelexExecutionResult } from '@/types/pipelex';
+import type { PipelexExecutionOptions, PipelexExecutionResult } from '@/types/pipelex';
 
 const PYTHON_PATH = '/opt/homebrew/bin/python3.11';
 const SCRIPTS_DIR = path.join(process.cwd(), 'scripts');
 
+// Number of warm `workflow_executor.py --worker` processes to keep alive.
+// 0 (the default) spawns a fresh Python process per request.
+const WORKER_POOL_SIZE = parseInt(process.env.PIPELEX_WORKER_POOL_SIZE || '0', 10);
+
+// Concurrent requests each warm worker runs on its event loop
+const WORKER_CONCURRENCY = parseInt(process.env.PIPELEX_WORKER_CONCURRENCY || '4', 10);
+
+// Default deadline of a workflow run in milliseconds (0 = none). It is also
+// sent to Python as inputs.deadline_ms so pipeline stages abort in time.
+const DEFAULT_TIMEOUT_MS = parseInt(process.env.PIPELEX_TIMEOUT_MS || '300000', 10);
+
+function timedOutResult(timeoutMs: number, startTime: number): PipelexExecutionResult {
+  return {
+    success: false,
+    output: null,
+    error: `Workflow timed out after ${timeoutMs} ms`,
+    executionTime: Date.now() - startTime,
+    timedOut: true,
+  };
+}
+
+function cancelledResult(startTime: number): PipelexExecutionResult {
+  return {
+    success: false,
+    output: null,
+    error: 'Request cancelled',
+    executionTime: Date.now() - startTime,
+    cancelled: true,
+  };
+}
+
+/**
+ * Calls `onStop` once when the timeout elapses or the signal aborts.
+ * Returns a function that disarms both.
+ */
+function watchDeadline(
+  timeoutMs: number,
+  signal: AbortSignal | undefined,
+  onStop: (reason: 'timeout' | 'cancelled') => void
+): () => void {
+  const timer = timeoutMs > 0 ? setTimeout(() => onStop('timeout'), timeoutMs) : undefined;
+  const onAbort = () => onStop('cancelled');
+  signal?.addEventListener('abort', onAbort, { once: true });
+  return () => {
+    if (timer) clearTimeout(timer);
+    signal?.removeEventListener('abort', onAbort);
+  };
+}
+
+interface PendingRequest {
+  resolve: (result: PipelexExecutionResult) => void;
+  startTime: number;
+}
+
+/**
+ * A long-lived Python worker speaking newline-delimited JSON over stdio.
+ * Responses are correlated to requests by id, so many requests can be in
+ * flight on the same process.
+ */
+class PipelexWorker {
+  private process: ChildProcessWithoutNullStreams;
+  private pending = new Map<number, PendingRequest>();
+  // Pieces of the response line still being received
+  private partial: string[] = [];
+  private nextId = 1;
+  alive = true;
+
+  constructor() {
+    const scriptPath = path.join(SCRIPTS_DIR, 'workflow_executor.py');
+    this.process = spawn(PYTHON_PATH, [
+      scriptPath,
+      '--worker',
+      '--concurrency',
+      String(WORKER_CONCURRENCY),
+    ]);
+
+    // Decode as a stream so multi-byte characters split across chunks stay intact
+    this.process.stdout.setEncoding('utf8');
+    this.process.stdout.on('data', (chunk: string) => this.onStdout(chunk));
+
+    // Worker logs go to stderr; surface them without failing requests
+    this.process.stderr.on('data', (data) => {
+      console.error(`[pipelex-worker ${this.process.pid}] ${data.toString().trimEnd()}`);
+    });
+
+    // A worker that died mid-write makes stdin emit EPIPE; without a listener that would crash Node
+    this.process.stdin.on('error', (error) => {
+      this.failAll(`Worker stdin closed: ${error.message}`);
+      this.process.kill();
+    });
+
+    this.process.on('close', (code) => this.failAll(`Worker exited with code ${code}`));
+    this.process.on('error', (error) =>
+      this.failAll(`Failed to start Python worker: ${error.message}`)
+    );
+  }
+
+  get load(): number {
+    return this.pending.size;
+  }
+
+  execute(
+    workflowName: string,
+    inputs: Record<string, any>,
+    timeoutMs: number,
+    signal?: AbortSignal
+  ): Promise<PipelexExecutionResult> {
+    const id = this.nextId++;
+    const startTime = Date.now();
+
+    return new Promise((resolve) => {
+      // Abort the request inside the worker and answer right away;
+      // the worker's own late response is then ignored
+      const disarm = watchDeadline(timeoutMs, signal, (reason) => {
+        if (!this.pending.delete(id)) return;
+        this.process.stdin.write(JSON.stringify({ id, cancel: true }) + '\n');
+        resolve(reason === 'timeout' ? timedOutResult(timeoutMs, startTime) : cancelledResult(startTime));
+      });
+
+      this.pending.set(id, {
+        resolve: (result) => {
+          disarm();
+          resolve(result);
+        },
+        startTime,
+      });
+      this.process.stdin.write(
+        JSON.stringify({ id, workflow_name: workflowName, inputs }) + '\n'
+      );
+    });
+  }
+
+  private onStdout(chunk: string) {
+    // Only the new chunk is scanned for line ends; a long line is joined once
+    let newline = chunk.indexOf('\n');
+    while (newline !== -1) {
+      this.partial.push(chunk.slice(0, newline));
+      const line = this.partial.join('').trim();
+      this.partial = [];
+      chunk = chunk.slice(newline + 1);
+      newline = chunk.indexOf('\n');
+
+      if (!line.startsWith('{')) continue;
+
+      let message: any;
+      try {
+        message = JSON.parse(line);
+      } catch {
+        continue;
+      }
+
+      const request = this.pending.get(message.id);
+      if (!request) continue;
+      this.pending.delete(message.id);
+
+      request.resolve({
+        success: message.success,
+        output: message.data,
+        error: message.error,
+        executionTime: Date.now() - request.startTime,
+        timedOut: message.deadline_exceeded,
+        cancelled: message.cancelled,
+      });
+    }
+    if (chunk) this.partial.push(chunk);
+  }
+
+  private failAll(error: string) {
+    this.alive = false;
+    for (const request of this.pending.values()) {
+      request.resolve({
+        success: false,
+        output: null,
+        error,
+        executionTime: Date.now() - request.startTime,
+      });
+    }
+    this.pending.clear();
+  }
+}
+
+/** HTTP status for a failed workflow result */
+export function errorStatus(result: PipelexExecutionResult): number {
+  if (result.timedOut) return 504;
+  if (result.cancelled) return 499;
+  return 500;
+}
+
+const workerPool: PipelexWorker[] = [];
+
+function acquireWorker(): PipelexWorker {
+  // Replace workers that have died since the last request
+  for (let i = workerPool.length - 1; i >= 0; i--) {
+    if (!workerPool[i].alive) workerPool.splice(i, 1);
+  }
+  while (workerPool.length < WORKER_POOL_SIZE) {
+    workerPool.push(new PipelexWorker());
+  }
+  return workerPool.reduce((least, worker) => (worker.load < least.load ? worker : least));
+}
+
 export async function executePipelexWorkflow(
   workflowName: string,
-  inputs: Record<string, any>
+  inputs: Record<string, any>,
+  options: PipelexExecutionOptions = {}
 ): Promise<PipelexExecutionResult> {
+  const timeoutMs = options.timeoutMs ?? DEFAULT_TIMEOUT_MS;
   const startTime = Date.now();
 
+  if (options.signal?.aborted) {
+    return cancelledResult(startTime);
+  }
+  if (timeoutMs > 0) {
+    inputs = { ...inputs, deadline_ms: timeoutMs };
+  }
+
+  if (WORKER_POOL_SIZE > 0) {
+    return acquireWorker().execute(workflowName, inputs, timeoutMs, options.signal);
+  }
+
   return new Promise((resolve, reject) => {
     const scriptPath = path.join(SCRIPTS_DIR, 'workflow_executor.py');
 
     const pythonProcess = spawn(PYTHON_PATH, [scriptPath]);
 
-    let outputData = '';
+    // Kill the process when the deadline passes or the caller goes away
+    let stopped: PipelexExecutionResult | null = null;
+    const disarm = watchDeadline(timeoutMs, options.signal, (reason) => {
+      stopped = reason === 'timeout' ? timedOutResult(timeoutMs, startTime) : cancelledResult(startTime);
+      pythonProcess.kill('SIGKILL');
+    });
+
+    const stdoutChunks: Buffer[] = [];
     let errorData = '';
 
     // Send input data to Python script via stdin
@@ -25,12 +246,14 @@ export async function executePipelexWorkflow(
       inputs: inputs,
     });
 
+    // EPIPE from a process that exited early; its 'close' handler reports the failure
+    pythonProcess.stdin.on('error', () => {});
     pythonProcess.stdin.write(inputJson);
     pythonProcess.stdin.end();
 
     // Collect output data
-    pythonProcess.stdout.on('data', (data) => {
-      outputData += data.toString();
+    pythonProcess.stdout.on('data', (data: Buffer) => {
+      stdoutChunks.push(data);
     });
 
     // Collect error data
@@ -40,8 +263,14 @@ export async function executePipelexWorkflow(
 
     // Handle process completion
     pythonProcess.on('close', (code) => {
+      disarm();
       const executionTime = Date.now() - startTime;
 
+      if (stopped) {
+        resolve(stopped);
+        return;
+      }
+
       if (code !== 0) {
         resolve({
           success: false,
@@ -52,61 +281,17 @@ export async function executePipelexWorkflow(
         return;
       }
 
+      // workflow_executor.py prints exactly one JSON line on stdout: the result
+      const outputData = Buffer.concat(stdoutChunks).toString('utf8').trim();
       try {
-        // Extract JSON from output (ignore warnings and other text)
-        // Try multiple strategies to find valid JSON
-        let result = null;
-        
-        // Strategy 1: Look for lines starting with { and ending with }
-        const lines = outputData.split('\n');
-        for (const line of lines) {
-          const trimmed = line.trim();
-          if (trimmed.startsWith('{') && trimmed.endsWith('}')) {
-            try {
-              result = JSON.parse(trimmed);
-              break;
-            } catch {
-              continue;
-            }
-          }
-        }
-        
-        // Strategy 2: Find the last complete JSON object
-        if (!result) {
-          const matches = outputData.match(/\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}/g);
-          if (matches && matches.length > 0) {
-            // Try from the last match backwards (most likely to be our result)
-            for (let i = matches.length - 1; i >= 0; i--) {
-              try {
-                result = JSON.parse(matches[i]);
-                break;
-              } catch {
-                continue;
-              }
-            }
-          }
-        }
-        
-        // Strategy 3: Traditional first { to last }
-        if (!result) {
-          const firstBrace = outputData.indexOf('{');
-          const lastBrace = outputData.lastIndexOf('}');
-          
-          if (firstBrace !== -1 && lastBrace !== -1) {
-            const jsonString = outputData.substring(firstBrace, lastBrace + 1);
-            result = JSON.parse(jsonString);
-          }
-        }
-
-        if (!result) {
-          throw new Error('No valid JSON object found in output');
-        }
+        const result = JSON.parse(outputData.slice(outputData.lastIndexOf('\n') + 1));
 
         resolve({
           success: result.success,
           output: result.data,
           error: result.error,
           executionTime,
+          timedOut: result.deadline_exceeded,
         });
       } catch (error) {
         resolve({
@@ -120,6 +305,7 @@ export async function executePipelexWorkflow(
 
     // Handle errors
     pythonProcess.on('error', (error) => {
+      disarm();
       resolve({
         success: false,
         output: null,
@@ -4,16 +4,37 @@ Railway API - FastAPI wrapper for Pipelex workflows
 Deploy this to Railway/Render/Fly.io for production Vercel deployment
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from starlette.background import BackgroundTask
+from typing import Awaitable, Dict, Any, List, Optional, Tuple, TypeVar
 import asyncio
 import logging
 import os
+import time
+
+_import_started = time.perf_counter()
 
 # Import the AdGenerator
 from scripts.ad_generator import AdGenerator
+from scripts.admission import AdmissionRejected, controllers_from_settings
+from scripts.json_codec import dumps, dumps_bytes, loads
+from scripts.metrics import HTTP_REQUEST_DURATION, REGISTRY
+from scripts.pipelex_runtime import enter_project_root, record_phase, startup_report
+from scripts.settings import get_section
+from scripts.upload_store import StoredUpload, UploadRejected, UploadStore
+from scripts.video_jobs import VideoJobQueue
+from scripts.worker_readiness import WorkerReadiness
+
+record_phase("import_app", _import_started)
+
+# Worker start: Pipelex initializes later, during warm-up, relative to the project root
+enter_project_root()
 
 # Configure logging
 logging.basicConfig(
@@ -22,11 +43,221 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Initialize AdGenerator
+generator = AdGenerator()
+
+# Background queue for long-running video generation
+video_jobs = VideoJobQueue.from_settings(generator)
+
+# Uploaded images, streamed to disk and referred to as "upload:<sha256>"
+uploads = UploadStore.from_settings()
+
+# Per-endpoint concurrency limits and wait queues
+admission = controllers_from_settings(
+    "generate_ad", "analyze_image", "generate_tone_variants", "generate_video", "upload"
+)
+
+# Requests whose client went away are cancelled instead of run to completion
+DISCONNECT_POLL_SECONDS = float(get_section("cancellation").get("disconnect_poll_seconds", 0.5))
+ABANDONED_REQUESTS = REGISTRY.counter(
+    "adflow_abandoned_requests_total",
+    "Requests cancelled because the client disconnected before the response",
+    ["route"]
+)
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client disconnected while its request was being served"""
+
+
+async def cancel_on_disconnect(http_request: Request, work: Awaitable[T]) -> T:
+    """
+    Await `work`, cancelling it as soon as the client disconnects
+
+    Args:
+        http_request: Incoming request whose connection is watched
+        work: Coroutine producing the response data
+
+    Returns:
+        The result of `work`
+
+    Raises:
+        ClientDisconnected: If the client went away first
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                route = http_request.scope.get("route")
+                ABANDONED_REQUESTS.inc(route=getattr(route, "path", http_request.url.path))
+                raise ClientDisconnected(f"Client disconnected from {http_request.url.path}")
+    finally:
+        # Also covers this handler itself being cancelled
+        if not task.done():
+            task.cancel()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded in one pass (orjson when installed)
+
+    Endpoints returning large results return it directly, which also skips
+    FastAPI's jsonable_encoder walk over the result.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+
+def error_status(result: Dict[str, Any]) -> int:
+    """HTTP status of a failed generator result"""
+    if result.get("deadline_exceeded"):
+        return 504
+    return 503 if result.get("circuit_open") else 500
+
+# Values owned by other components, read when /metrics is scraped
+REGISTRY.callback(
+    "adflow_admission_in_flight",
+    "Requests currently being served per endpoint",
+    ["endpoint"],
+    lambda: {(name,): controller.in_flight for name, controller in admission.items()}
+)
+REGISTRY.callback(
+    "adflow_admission_queued",
+    "Requests waiting for a slot per endpoint",
+    ["endpoint"],
+    lambda: {(name,): controller.queued for name, controller in admission.items()}
+)
+REGISTRY.callback(
+    "adflow_admission_rejected_total",
+    "Requests rejected by admission control",
+    ["endpoint", "reason"],
+    lambda: {
+        key: value
+        for name, controller in admission.items()
+        for key, value in (
+            ((name, "queue_full"), controller.rejected_queue_full),
+            ((name, "queue_timeout"), controller.rejected_timeout)
+        )
+    },
+    kind="counter"
+)
+REGISTRY.callback(
+    "adflow_cache_lookups_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+    lambda: {
+        ("ad_content", "hit"): generator.result_cache.hits,
+        ("ad_content", "miss"): generator.result_cache.misses,
+        ("image", "hit"): generator.image_ingestor.cache_hits,
+        ("image", "miss"): generator.image_ingestor.cache_misses
+    },
+    kind="counter"
+)
+REGISTRY.callback(
+    "adflow_single_flight_in_flight",
+    "Distinct generation runs in progress that identical requests can attach to",
+    ["operation"],
+    lambda: {
+        (flights.operation,): flights.in_flight
+        for flights in (generator.ad_flights, generator.video_flights)
+    }
+)
+REGISTRY.callback(
+    "adflow_model_fallbacks_total",
+    "Stages routed to the fast model to meet a request deadline",
+    [],
+    lambda: {(): generator.model_router.fallbacks},
+    kind="counter"
+)
+REGISTRY.callback(
+    "adflow_circuit_open",
+    "1 while a model's circuit is open or probing for recovery",
+    ["model"],
+    lambda: {
+        (model,): int(state["state"] != "closed")
+        for model, state in generator.resilience.stats()["circuits"].items()
+    }
+)
+REGISTRY.callback(
+    "adflow_video_jobs_active",
+    "Video jobs currently scheduled in this process",
+    [],
+    lambda: {(): video_jobs.stats()["active_tasks"]}
+)
+
+
+# Warm-up and readiness of this worker (and its siblings under serve_api.py)
+server_settings = get_section("server")
+readiness = WorkerReadiness.from_environment()
+warm_up_state: Dict[str, Any] = {"error": None, "timings": None}
+# Set when warm_up_state["error"] is, to release requests held by ColdWorkerGate
+warm_up_failed = asyncio.Event()
+
+# Answered even while the worker is cold
+PROBE_PATHS = {"/", "/health", "/livez", "/readyz", "/metrics"}
+
+# Endpoints that never run Pipelex (stored data and stats): served during warm-up too
+COLD_SAFE_PREFIXES = (
+    "/api/history",
+    "/api/videos/",
+    "/api/uploads",
+    "/api/bundles",
+    "/api/admission",
+    "/api/model-routing",
+    "/api/resilience",
+    "/api/cache/stats",
+)
+
+
+async def warm_up() -> None:
+    """Load bundles, prime caches and resume video jobs, then report ready"""
+    started = time.perf_counter()
+    try:
+        # Pipelex initializes here, on the first bundle load;
+        # an invalid bundle keeps the worker unready and fails /livez
+        if server_settings.get("warm_up", True):
+            warm_up_state["timings"] = await generator.warm_up(
+                inference=bool(server_settings.get("warm_up_inference", False))
+            )
+        else:
+            await generator.bundles.load_all()
+        await video_jobs.start()
+    except Exception as e:
+        logger.exception("Worker warm-up failed")
+        warm_up_state["error"] = str(e)
+        warm_up_failed.set()
+        return
+    record_phase("warm_up", started)
+    readiness.mark_ready()
+    logger.info(f"Worker {readiness.pid} ready (warm-up {warm_up_state['timings']})")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up in the background so probes answer at once; drain cleanly on shutdown"""
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    # Stop advertising this worker before tearing anything down
+    readiness.mark_draining()
+    warm_up_task.cancel()
+    await asyncio.gather(warm_up_task, return_exceptions=True)
+    await video_jobs.shutdown()
+    await generator.image_ingestor.fetcher.aclose()
+
+
 # Initialize FastAPI
 app = FastAPI(
     title="AdFlow AI - Pipelex API",
     description="Backend API for AdFlow AI product ad generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS configuration - update with your Vercel domain
@@ -44,23 +275,187 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AdGenerator
-generator = AdGenerator()
+# Responses never compressed: the event stream must flush every event, videos are compressed already
+UNCOMPRESSED_PREFIXES = ("/api/generate-ad/stream", "/api/videos/")
+
+
+class SelectiveGZip:
+    """
+    GZipMiddleware for every path except UNCOMPRESSED_PREFIXES
+
+    Older Starlette releases compress text/event-stream and video bodies
+    too, so those paths are excluded here rather than by content type.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(UNCOMPRESSED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        await self.gzip(scope, receive, send)
+
+
+# Compress JSON and NDJSON bodies for clients that accept gzip
+app.add_middleware(SelectiveGZip, minimum_size=int(server_settings.get("gzip_minimum_size", 1024)))
+
+
+
+class RequestMetricsMiddleware:
+    """
+    Request latency histogram plus a Server-Timing header
+
+    Plain ASGI rather than @app.middleware("http"), which hides client
+    disconnects from the endpoints (see cancel_on_disconnect).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # For streaming responses this is the time to the first byte
+                elapsed = time.perf_counter() - started
+                message = {**message, "headers": [
+                    *message.get("headers", []),
+                    (b"server-timing", f"total;dur={elapsed * 1000:.1f}".encode("latin-1"))
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status)
+            )
+
+
+class ColdWorkerGate:
+    """
+    Hold requests that reach a worker still warming up
+
+    They wait up to [server] cold_request_wait for the warm-up, then get a
+    503 with Retry-After. Once warm-up has failed they get a 503 at once,
+    without Retry-After: this worker will not become ready. Probe paths and
+    endpoints that do not need Pipelex are always answered.
+    """
+
+    def __init__(self, app, wait_seconds: float = 30.0):
+        self.app = app
+        self.wait_seconds = wait_seconds
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or readiness.ready.is_set()
+            or scope["path"] in PROBE_PATHS
+            or scope["path"].startswith(COLD_SAFE_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+        if warm_up_state["error"] is None:
+            try:
+                await asyncio.wait_for(self._ready_or_failed(), self.wait_seconds)
+            except asyncio.TimeoutError:
+                response = JSONResponse(
+                    status_code=503,
+                    headers={"Retry-After": "5"},
+                    content={
+                        "success": False,
+                        "error": "Server is starting, please retry",
+                        "detail": "Worker is still warming up"
+                    }
+                )
+                await response(scope, receive, send)
+                return
+        if warm_up_state["error"] is not None:
+            response = JSONResponse(
+                status_code=503,
+                content={
+                    "success": False,
+                    "error": "Worker warm-up failed",
+                    "detail": warm_up_state["error"]
+                }
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _ready_or_failed() -> None:
+        """Return once the worker is ready or its warm-up has failed"""
+        waiters = [asyncio.ensure_future(readiness.ready.wait()), asyncio.ensure_future(warm_up_failed.wait())]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+
+app.add_middleware(ColdWorkerGate, wait_seconds=float(server_settings.get("cold_request_wait", 30.0)))
+app.add_middleware(RequestMetricsMiddleware)
+
+
+# Batch generation limits
+batch_settings = get_section("batch")
+BATCH_MAX_ITEMS = int(batch_settings.get("max_items", 500))
+BATCH_DEFAULT_CONCURRENCY = int(batch_settings.get("default_concurrency", 4))
+BATCH_MAX_CONCURRENCY = int(batch_settings.get("max_concurrency", 16))
 
 
 # Request/Response Models
 class AdRequest(BaseModel):
     image_url: str
     product_info: Dict[str, Any]
+    # Latency budget; slow stages fall back to the fast model to meet it,
+    # and stages still running when it passes are aborted (504)
+    deadline_ms: Optional[int] = Field(None, ge=1)
+
+
+class BatchAdRequest(BaseModel):
+    items: List[AdRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(None, ge=1)
+
+
+class ToneVariantsRequest(BaseModel):
+    image_url: str
+    product_info: Dict[str, Any]
+    tones: Optional[List[str]] = None
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    deadline_ms: Optional[int] = Field(None, ge=1)
 
 
 class VideoRequest(BaseModel):
     video_prompt: str
+    deadline_ms: Optional[int] = Field(None, ge=1)
+
+
+class VideoJobRequest(BaseModel):
+    video_prompt: str
+    # Receives the finished job as a JSON POST; public http(s) hosts only
+    webhook_url: Optional[str] = Field(None, pattern=r"^https?://", max_length=2048)
 
 
 class AnalyzeRequest(BaseModel):
     image_url: str
     product_info: Dict[str, Any]
+    deadline_ms: Optional[int] = Field(None, ge=1)
 
 
 # Health check endpoint
@@ -75,111 +470,573 @@ async def health_check():
     }
 
 
+# Liveness probe
+@app.get("/livez")
+async def liveness():
+    """The process is up; only a failed warm-up makes it unhealthy"""
+    if warm_up_state["error"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "failed", "pid": readiness.pid, "error": warm_up_state["error"]}
+        )
+    return {"status": "alive", "pid": readiness.pid}
+
+
+# Readiness probe
+@app.get("/readyz")
+async def readiness_check():
+    """Ready once this worker and every sibling worker have warmed up"""
+    stats = readiness.stats()
+    if readiness.is_ready():
+        return {
+            "status": "ready",
+            **stats,
+            "warm_up_ms": warm_up_state["timings"],
+            "startup": startup_report()
+        }
+    if readiness.draining:
+        status = "draining"
+    elif warm_up_state["error"]:
+        status = "failed"
+    else:
+        status = "warming"
+    return JSONResponse(status_code=503, content={"status": status, **stats, "startup": startup_report()})
+
+
+# Loaded workflow bundles
+@app.get("/api/bundles")
+async def bundle_versions():
+    """Versions of the PLX bundles currently serving requests"""
+    return {
+        "versions": generator.bundles.versions(),
+        "reloads": generator.bundles.reloads
+    }
+
+
+# Live admission control numbers
+@app.get("/api/admission")
+async def admission_stats():
+    """In-flight requests and queue depth per endpoint"""
+    return {name: controller.stats() for name, controller in admission.items()}
+
+
+# Prometheus metrics
+@app.get("/metrics")
+async def metrics():
+    """Stage latency, token, cache, error and admission metrics in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# Model routing state
+@app.get("/api/model-routing")
+async def model_routing_stats():
+    """Recent latency per stage and model, and how often stages fell back to the fast model"""
+    return generator.model_router.stats()
+
+
+# Retry and circuit breaker state
+@app.get("/api/resilience")
+async def resilience_stats():
+    """Retries so far and the circuit state of every model called"""
+    return generator.resilience.stats()
+
+
+# Result cache statistics
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the generate-ad result cache"""
+    return generator.result_cache.stats()
+
+
 # Generate complete ad
 @app.post("/api/generate-ad")
-async def generate_ad(request: AdRequest):
+async def generate_ad(request: AdRequest, http_request: Request):
     """
     Generate complete product ad with analysis, copy, and video prompt
     """
+    async with admission["generate_ad"].admit():
+        return await run_generate_ad(request, http_request)
+
+
+async def run_generate_ad(request: AdRequest, http_request: Request) -> FastJSONResponse:
+    """generate_ad for a request already holding a generate_ad admission slot"""
     try:
         logger.info(f"Generating ad for product: {request.product_info.get('name', 'Unknown')}")
-        
-        result = await generator.generate_complete_ad(
+
+        result = await cancel_on_disconnect(http_request, generator.generate_complete_ad(
             image_url=request.image_url,
-            product_info=request.product_info
-        )
-        
+            product_info=request.product_info,
+            deadline_ms=request.deadline_ms
+        ))
+
         if not result["success"]:
-            raise HTTPException(status_code=500, detail=result["error"])
+            raise HTTPException(status_code=error_status(result), detail=result["error"])
         
         logger.info("Ad generation successful")
-        return result
+        return FastJSONResponse(result)
         
+    except (AdmissionRejected, ClientDisconnected, HTTPException):
+        raise
     except Exception as e:
         logger.error(f"Error generating ad: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Generate complete ad, streaming each stage as it completes
+@app.post("/api/generate-ad/stream")
+async def generate_ad_stream(request: AdRequest):
+    """
+    Generate a complete ad as Server-Sent Events
+
+    Emits one event per pipeline stage (analyze_product, generate_copy,
+    create_video_prompt, combine_ad_content) as soon as it finishes, then a
+    "complete" event with the full result and per-stage timings, or an
+    "error" event.
+    """
+    logger.info(f"Streaming ad generation for product: {request.product_info.get('name', 'Unknown')}")
+
+    # Admit before the response starts so saturation is still a plain 429
+    ticket = await admission["generate_ad"].acquire()
+
+    async def stream_events():
+        try:
+            async for event in generator.stream_ad_stages(
+                image_url=request.image_url,
+                product_info=request.product_info,
+                deadline_ms=request.deadline_ms
+            ):
+                yield f"event: {event['event']}\ndata: {dumps(event)}\n\n"
+        finally:
+            ticket.release()
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also frees the slot if the stream never started
+        background=BackgroundTask(ticket.release)
+    )
+
+
+# Generate ads for many products
+@app.post("/api/generate-ad/batch")
+async def generate_ad_batch(request: BatchAdRequest):
+    """
+    Generate ads for a list of products with bounded concurrency
+
+    Streams one NDJSON line per item as soon as it finishes (in completion
+    order, tagged with its index), then a final summary line. A failed item
+    is reported on its own line and does not stop the rest of the batch.
+
+    Each item is admitted through the generate_ad limits like a single
+    request; an item turned away there fails with "rejected": true.
+    """
+    concurrency = min(request.concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    logger.info(f"Generating batch of {len(request.items)} ads (concurrency {concurrency})")
+
+    async def stream_results():
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+
+        async def run_item(index: int, item: AdRequest):
+            async with semaphore:
+                try:
+                    async with admission["generate_ad"].admit():
+                        result = await generator.generate_complete_ad(
+                            image_url=item.image_url,
+                            product_info=item.product_info,
+                            deadline_ms=item.deadline_ms
+                        )
+                except AdmissionRejected as e:
+                    result = {
+                        "success": False,
+                        "data": None,
+                        "error": f"Server is busy, please retry: {e}",
+                        "rejected": True,
+                        "retry_after": e.retry_after
+                    }
+                except Exception as e:
+                    result = {"success": False, "data": None, "error": str(e)}
+            return index, result
+
+        tasks = [
+            asyncio.create_task(run_item(index, item))
+            for index, item in enumerate(request.items)
+        ]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, result = await next_done
+                succeeded += bool(result["success"])
+                yield dumps({"index": index, **result}) + "\n"
+        finally:
+            # Client went away: stop the items that have not finished
+            for task in tasks:
+                task.cancel()
+
+        yield dumps({
+            "summary": {
+                "total": len(tasks),
+                "succeeded": succeeded,
+                "failed": len(tasks) - succeeded,
+                "elapsed_ms": int((time.perf_counter() - started) * 1000)
+            }
+        }) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+async def receive_upload(http_request: Request) -> Tuple[StoredUpload, Dict[str, str]]:
+    """
+    Store the image in a request body as it streams in
+
+    Accepts a raw image body or a multipart/form-data body with an "image"
+    file field (whose other fields are returned).
+
+    Raises:
+        UploadRejected: If the body is too large, malformed or not an image
+    """
+    uploads.check_declared_size(http_request.headers.get("content-length"))
+    content_type = http_request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        return await uploads.save_multipart(content_type, http_request.stream())
+    return await uploads.save_stream(http_request.stream()), {}
+
+
+# Upload a product image
+@app.post("/api/uploads")
+async def upload_image(http_request: Request):
+    """
+    Store an image sent as the raw request body or as the "image" field of a form
+
+    The returned data.image_url ("upload:<sha256>") can be passed as image_url
+    to the generation endpoints instead of a base64 data URI. Admitted before
+    the body is read, so a saturated server answers 429 without storing it.
+    """
+    async with admission["upload"].admit():
+        stored, _ = await receive_upload(http_request)
+    logger.info(f"Stored upload {stored.sha256} ({stored.size} bytes)")
+    return {"success": True, "data": stored.to_dict(), "error": None}
+
+
+# Generate complete ad for an uploaded image
+@app.post("/api/generate-ad/upload")
+async def generate_ad_upload(http_request: Request):
+    """
+    Generate a complete ad from a multipart/form-data upload
+
+    Form fields: image (file), product_info (JSON object), deadline_ms (optional).
+    The generate_ad slot is taken before the body is read and held through
+    the generation, so a saturated server answers 429 without storing the image.
+    """
+    async with admission["generate_ad"].admit():
+        stored, fields = await receive_upload(http_request)
+        try:
+            request = AdRequest(
+                image_url=stored.reference,
+                product_info=loads(fields.get("product_info") or "{}"),
+                deadline_ms=fields.get("deadline_ms") or None
+            )
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"product_info is not valid JSON: {e}")
+        return await run_generate_ad(request, http_request)
+
+
 # Analyze product image
 @app.post("/api/analyze-image")
-async def analyze_image(request: AnalyzeRequest):
+async def analyze_image(request: AnalyzeRequest, http_request: Request):
     """
     Analyze product image only
     """
     try:
         logger.info("Analyzing product image")
         
-        result = await generator.analyze_product_image(
-            image_url=request.image_url,
-            product_info=request.product_info
-        )
+        async with admission["analyze_image"].admit():
+            result = await cancel_on_disconnect(http_request, generator.analyze_product_image(
+                image_url=request.image_url,
+                product_info=request.product_info,
+                deadline_ms=request.deadline_ms
+            ))
         
         if not result["success"]:
-            raise HTTPException(status_code=500, detail=result["error"])
+            raise HTTPException(status_code=error_status(result), detail=result["error"])
         
         logger.info("Image analysis successful")
-        return result
+        return FastJSONResponse(result)
         
+    except (AdmissionRejected, ClientDisconnected, HTTPException):
+        raise
     except Exception as e:
         logger.error(f"Error analyzing image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Generate ad copy in several tones
+@app.post("/api/generate-tone-variants")
+async def generate_tone_variants(request: ToneVariantsRequest, http_request: Request):
+    """
+    Analyze the image once and generate one ad copy per tone concurrently
+    """
+    try:
+        logger.info(f"Generating tone variants: {request.tones or 'default tones'}")
+
+        async with admission["generate_tone_variants"].admit():
+            result = await cancel_on_disconnect(http_request, generator.generate_tone_variants(
+                image_url=request.image_url,
+                product_info=request.product_info,
+                tones=request.tones,
+                max_concurrency=request.max_concurrency,
+                deadline_ms=request.deadline_ms
+            ))
+
+        if not result["success"]:
+            raise HTTPException(status_code=error_status(result), detail=result["error"])
+
+        logger.info("Tone variant generation successful")
+        return FastJSONResponse(result)
+
+    except (AdmissionRejected, ClientDisconnected, HTTPException):
+        raise
+    except Exception as e:
+        logger.error(f"Error generating tone variants: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # Generate video
 @app.post("/api/generate-video")
-async def generate_video(request: VideoRequest):
+async def generate_video(request: VideoRequest, http_request: Request):
     """
     Generate video from prompt using Veo 3 Fast
     """
     try:
         logger.info("Generating video")
         
-        result = await generator.generate_video(
-            video_prompt=request.video_prompt
-        )
+        async with admission["generate_video"].admit():
+            result = await cancel_on_disconnect(http_request, generator.generate_video(
+                video_prompt=request.video_prompt,
+                deadline_ms=request.deadline_ms
+            ))
         
         if not result["success"]:
-            raise HTTPException(status_code=500, detail=result["error"])
+            raise HTTPException(status_code=error_status(result), detail=result["error"])
         
         logger.info("Video generation successful")
-        return result
+        return FastJSONResponse(result)
         
+    except (AdmissionRejected, ClientDisconnected, HTTPException):
+        raise
     except Exception as e:
         logger.error(f"Error generating video: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Generation history
+@app.get("/api/history")
+async def list_history(
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """
+    Generated ads, newest first, one page per call
+
+    Pass the returned next_cursor to get the following page.
+    """
+    try:
+        page = await asyncio.to_thread(generator.history.list, limit=limit, cursor=cursor, query=q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "data": page, "error": None}
+
+
+@app.get("/api/history/search")
+async def search_history(
+    q: str = Query(..., min_length=1),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None
+):
+    """
+    Generated ads whose product name contains q, newest first
+    """
+    return await list_history(limit=limit, cursor=cursor, q=q)
+
+
+@app.get("/api/history/{generation_id}")
+async def get_history_entry(generation_id: str):
+    """
+    Full stored result of one generated ad
+    """
+    entry = await asyncio.to_thread(generator.history.get, generation_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown generation: {generation_id}")
+    return FastJSONResponse({"success": True, "data": entry, "error": None})
+
+
+@app.delete("/api/history/{generation_id}")
+async def delete_history_entry(generation_id: str):
+    """
+    Remove one generated ad from the history
+    """
+    if not await asyncio.to_thread(generator.history.delete, generation_id):
+        raise HTTPException(status_code=404, detail=f"Unknown generation: {generation_id}")
+    return {"success": True, "data": {"id": generation_id}, "error": None}
+
+
+# Submit a video generation job
+@app.post("/api/video-jobs", status_code=202)
+async def submit_video_job(request: VideoJobRequest):
+    """
+    Queue a video generation job and return immediately with its id
+    """
+    try:
+        job = await video_jobs.submit(
+            video_prompt=request.video_prompt,
+            webhook_url=request.webhook_url
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Queued video job {job['id']}")
+    return {"success": True, "data": job, "error": None}
+
+
+# Poll a video generation job
+@app.get("/api/video-jobs/{job_id}")
+async def get_video_job(job_id: str):
+    """
+    Get the status of a video generation job
+    """
+    job = video_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown video job: {job_id}")
+    return {"success": True, "data": job, "error": None}
+
+
+# Fetch the result of a finished video generation job
+@app.get("/api/video-jobs/{job_id}/result")
+async def get_video_job_result(job_id: str):
+    """
+    Get the video of a finished job (409 while it is still queued or running)
+    """
+    job = video_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown video job: {job_id}")
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "data": job, "error": f"Video job is {job['status']}"}
+        )
+    if job["status"] != "succeeded":
+        return JSONResponse(
+            status_code=500 if job["status"] == "failed" else 410,
+            content={"success": False, "data": None, "error": job["error"] or f"Video job {job['status']}"}
+        )
+    return {"success": True, "data": job["result"], "error": None}
+
+
+# Cancel a video generation job
+@app.delete("/api/video-jobs/{job_id}")
+async def cancel_video_job(job_id: str):
+    """
+    Cancel a queued or running video generation job
+    """
+    job = await video_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown video job: {job_id}")
+    logger.info(f"Video job {job_id} is {job['status']}")
+    return {"success": True, "data": job, "error": None}
+
+
+# Play a stored video
+@app.api_route("/api/videos/{video_id}", methods=["GET", "HEAD"])
+async def get_video(video_id: str, http_request: Request):
+    """
+    Serve a video from the video store
+
+    Supports Range requests (206) for seeking. A video id names a prompt and
+    model, not bytes: after eviction a re-render is stored under the same id,
+    so caches revalidate every use against the ETag (the content hash).
+    """
+    video = await asyncio.to_thread(generator.video_store.get, video_id)
+    if video is None:
+        raise HTTPException(status_code=404, detail=f"Video {video_id} not found")
+
+    etag = f'"{video["sha256"]}"'
+    headers = {"Cache-Control": "public, no-cache", "ETag": etag}
+    if etag in http_request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(video["path"], media_type=video["mime_type"], headers=headers)
+
+
 # Error handlers
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    logger.warning(str(exc))
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "success": False,
+            "error": "Server is busy, please retry",
+            "detail": str(exc)
+        }
+    )
+
+
+@app.exception_handler(UploadRejected)
+async def upload_rejected_handler(request: Request, exc: UploadRejected):
+    logger.warning(f"Upload rejected: {exc}")
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "success": False,
+            "error": "Upload rejected",
+            "detail": str(exc)
+        }
+    )
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    logger.info(str(exc))
+    # Nobody reads this; 499 keeps abandoned requests apart in the latency metrics
+    return JSONResponse(
+        status_code=499,
+        content={
+            "success": False,
+            "error": "Client closed request",
+            "detail": str(exc)
+        }
+    )
+
+
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {
-        "success": False,
-        "error": "Endpoint not found",
-        "detail": str(exc)
-    }
+    return JSONResponse(
+        status_code=404,
+        content={
+            "success": False,
+            "error": "Endpoint not found",
+            "detail": getattr(exc, "detail", str(exc))
+        }
+    )
 
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return {
-        "success": False,
-        "error": "Internal server error",
-        "detail": str(exc)
-    }
+    return JSONResponse(
+        status_code=500,
+        content={
+            "success": False,
+            "error": "Internal server error",
+            "detail": getattr(exc, "detail", str(exc))
+        }
+    )
 
 
 if __name__ == "__main__":
-    import uvicorn
-    
-    port = int(os.getenv("PORT", 8000))
-    
-    logger.info(f"Starting AdFlow AI API on port {port}")
-    
-    uvicorn.run(
-        "railway_api:app",
-        host="0.0.0.0",
-        port=port,
-        log_level="info",
-        reload=False  # Set to True for development
-    )
+    # Same as scripts/serve_api.py, which avoids importing the app in the supervisor
+    from scripts.serve_api import main
 
+    main()
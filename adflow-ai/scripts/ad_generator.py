@@ -8,14 +8,54 @@ import asyncio
 import json
 import sys
 import os
-import base64
 import logging
+import sqlite3
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
+
+_import_started = time.perf_counter()
+
+# First import of the Pipelex packages in the process (recorded as import_pipelex below)
+from pipelex.hub import get_report_delegate, get_required_concept
+from pipelex.reporting.reporting_protocol import ReportingNoOp
 from pipelex.pipeline.execute import execute_pipeline
-from pipelex.pipelex import Pipelex
 from pipelex.core.stuffs.image_content import ImageContent
-from pipelex.core.stuffs.stuff_factory import StuffFactory
+from pipelex.core.stuffs.stuff_factory import StuffContentFactory, StuffFactory
+from pipelex.core.stuffs.text_content import TextContent
+
+_pipelex_imported = time.perf_counter()
+
+try:
+    from .bundle_registry import BundleRegistry
+    from .cassette_backend import CassetteRecorder, CassetteReplayer
+    from .history_store import HistoryStore, thumbnail_for
+    from .image_ingest import ImageIngestor, IngestedImage
+    from .metrics import CANCELLED_WORK, LLM_TOKENS, observe_stage
+    from .model_router import ModelRouter
+    from .near_duplicates import AnalysisIndex
+    from .pipelex_runtime import ensure_pipelex_async, record_phase
+    from .resilience import CircuitOpen, Resilience
+    from .result_cache import ResultCache, make_cache_key
+    from .settings import PROJECT_ROOT, get_section
+    from .single_flight import SingleFlight, canonical_json
+    from .stub_backend import StubBackend
+    from .video_store import VideoStore
+except ImportError:
+    from bundle_registry import BundleRegistry
+    from cassette_backend import CassetteRecorder, CassetteReplayer
+    from history_store import HistoryStore, thumbnail_for
+    from image_ingest import ImageIngestor, IngestedImage
+    from metrics import CANCELLED_WORK, LLM_TOKENS, observe_stage
+    from model_router import ModelRouter
+    from near_duplicates import AnalysisIndex
+    from pipelex_runtime import ensure_pipelex_async, record_phase
+    from resilience import CircuitOpen, Resilience
+    from result_cache import ResultCache, make_cache_key
+    from settings import PROJECT_ROOT, get_section
+    from single_flight import SingleFlight, canonical_json
+    from stub_backend import StubBackend
+    from video_store import VideoStore
 
 # Configure logging to go to stderr instead of stdout
 # This prevents log messages from interfering with JSON output on stdout
@@ -25,42 +65,253 @@ logging.basicConfig(
     stream=sys.stderr
 )
 
-# Also configure Pipelex loggers to use stderr
-for logger_name in ['pipelex', 'pipelex.pipeline', 'pipelex.core']:
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.WARNING)
-    for handler in logger.handlers[:]:
-        logger.removeHandler(handler)
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setLevel(logging.WARNING)
-    logger.addHandler(handler)
+# Pipelex itself is initialized on first use, not at import (see pipelex_runtime)
+record_phase("import_pipelex", _import_started, _pipelex_imported)
+record_phase("import_ad_generator", _pipelex_imported)
+
+# Bundles (file stems under pipelex/) executed by AdGenerator
+PRODUCT_AD_BUNDLE = "product_ad_generator"
+VIDEO_BUNDLE = "video_generator"
+
+# Steps of the generate_ad_content PipeSequence in product_ad_generator.plx
+AD_CONTENT_STAGES = ("analyze_product", "generate_copy", "create_video_prompt", "combine_ad_content")
+
+# Working-memory name each step's result is stored under
+AD_CONTENT_RESULTS = ("product_analysis", "ad_copy", "video_prompt", "ad_content")
+
+# 1x1 PNG run through ingestion (and optionally the models) by AdGenerator.warm_up
+WARM_UP_IMAGE = (
+    "data:image/png;base64,"
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+# How the final AdContent is produced:
+#   "local" - run the first three steps and assemble their typed outputs here
+#   "llm"   - run the full PipeSequence, including the combine_ad_content LLM call
+ASSEMBLY_MODES = ("local", "llm")
+
+# Where pipes run, chosen with the ADFLOW_INFERENCE_BACKEND environment variable:
+#   "pipelex" - real inference through execute_pipeline
+#   "stub"    - canned outputs with simulated latency/failures ([stub_backend])
+#   "record"  - real inference, every call also appended to the cassette ([cassette])
+#   "replay"  - answers and latencies played back from the cassette, offline
+INFERENCE_BACKENDS = ("pipelex", "stub", "record", "replay")
+
+
+async def run_pipelex_pipe(pipe_code: str, inputs: Dict[str, Any]) -> Any:
+    """Execute a pipe loaded in the Pipelex library"""
+    return await execute_pipeline(pipe_code=pipe_code, inputs=inputs)
+
+
+def make_inference_backend(name: str):
+    """
+    Build the callable that executes pipes
+
+    Args:
+        name: One of INFERENCE_BACKENDS
+
+    Returns:
+        Async callable (pipe_code, inputs) -> pipe output
+    """
+    if name == "pipelex":
+        return run_pipelex_pipe
+    if name == "stub":
+        seed = os.getenv("ADFLOW_STUB_SEED")
+        return StubBackend.from_settings(
+            latency_scale=float(os.getenv("ADFLOW_STUB_LATENCY_SCALE", "1.0")),
+            seed=int(seed) if seed else None
+        )
+    if name == "record":
+        return CassetteRecorder.from_settings(run_pipelex_pipe)
+    if name == "replay":
+        return CassetteReplayer.from_settings()
+    raise ValueError(f"Unknown inference backend: {name} (expected one of {INFERENCE_BACKENDS})")
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before its pipeline finished"""
+
+
+def deadline_after(deadline_ms: Optional[int]) -> Optional[float]:
+    """Absolute time.monotonic() deadline from a latency budget (None or 0 = no deadline)"""
+    return time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """Seconds until the deadline (None = no deadline)"""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def stuff_content_to_data(content: Any) -> Any:
+    """Convert a pipe output's content to plain JSON data (text stays a string)"""
+    if isinstance(content, TextContent):
+        return content.text
+    if hasattr(content, 'model_dump'):
+        return content.model_dump()
+    return content
+
+
+# Set once the missing token usage accessor has been reported
+_token_usage_unavailable = False
+
+
+def record_token_usage(stage: str, pipeline_run_id: str) -> None:
+    """
+    Count the LLM tokens Pipelex reported for a pipeline run
 
-# Initialize Pipelex at module level
-# Change to project root so Pipelex can find .pipelex/config.toml
-PROJECT_ROOT = Path(__file__).parent.parent
-os.chdir(PROJECT_ROOT)
+    execute_pipeline opens a usage registry per run and never closes it, so
+    the registry is closed here once read to keep long-lived processes from
+    accumulating one per request.
 
-# Initialize Pipelex (will load libraries from .pipelex/config.toml)
-Pipelex.make()
+    Pipelex has no public accessor for a run's registry: the reporting
+    manager's _get_registry is used when present, and token metrics are
+    skipped (with one warning) when a Pipelex release drops it.
+
+    Args:
+        stage: Stage name used as the metric label
+        pipeline_run_id: Run id of the pipe output
+    """
+    global _token_usage_unavailable
+    report_delegate = get_report_delegate()
+    get_registry = getattr(report_delegate, "_get_registry", None)
+    # With reporting disabled (ReportingNoOp) there is nothing to read, and nothing to warn about
+    if get_registry is None and not _token_usage_unavailable and not isinstance(report_delegate, ReportingNoOp):
+        _token_usage_unavailable = True
+        logging.getLogger(__name__).warning(
+            f"{type(report_delegate).__name__} has no _get_registry: LLM token metrics are disabled"
+        )
+    try:
+        usages = get_registry(pipeline_run_id).get_current_tokens_usage() if get_registry else []
+        report_delegate.close_registry(pipeline_run_id)
+    except Exception:
+        # Reporting disabled or registry already gone: nothing to count
+        return
+
+    for usage in usages:
+        for category, nb_tokens in usage.nb_tokens_by_category.items():
+            LLM_TOKENS.inc(
+                nb_tokens,
+                stage=stage,
+                model=usage.inference_model_name,
+                category=getattr(category, "value", category)
+            )
+
+
+def assemble_ad_content(
+    product_analysis: Any,
+    ad_copy: Any,
+    video_prompt: Any
+) -> Dict[str, Any]:
+    """
+    Build the ad content directly from the typed stage outputs
+
+    Args:
+        product_analysis: Content of the analyze_product output
+        ad_copy: Content of the generate_copy output
+        video_prompt: Content of the create_video_prompt output
+
+    Returns:
+        Dictionary with product_analysis, ad_copy and video_prompt
+    """
+    return {
+        "product_analysis": stuff_content_to_data(product_analysis),
+        "ad_copy": stuff_content_to_data(ad_copy),
+        "video_prompt": stuff_content_to_data(video_prompt)
+    }
+
+
+def parse_ad_content(content_data: Any) -> Dict[str, Any]:
+    """
+    Unpack an AdContent result whose fields are JSON strings
+
+    Args:
+        content_data: Content of the combine_ad_content output
+
+    Returns:
+        Dictionary with product_analysis, ad_copy and video_prompt
+    """
+    # Extract the three fields - they are attributes, not dict keys
+    product_analysis_str = getattr(content_data, 'product_analysis', "{}")
+    ad_copy_str = getattr(content_data, 'ad_copy', "{}")
+    video_prompt_str = getattr(content_data, 'video_prompt', "")
+
+    # Parse JSON strings
+    try:
+        product_analysis = json.loads(product_analysis_str) if isinstance(product_analysis_str, str) else product_analysis_str
+    except:
+        product_analysis = {}
+
+    try:
+        ad_copy = json.loads(ad_copy_str) if isinstance(ad_copy_str, str) else ad_copy_str
+    except:
+        ad_copy = {}
+
+    return {
+        "product_analysis": product_analysis,
+        "ad_copy": ad_copy,
+        "video_prompt": video_prompt_str
+    }
 
 
 class AdGenerator:
     """Ad generator using Pipelex workflows"""
 
     def __init__(self):
-        """Initialize workflow paths"""
-        # Pipelex is already initialized at module level
-        workflow_dir = PROJECT_ROOT / "pipelex"
-        
-        # Store paths
+        """Initialize workflow bundles and shared services"""
+        # Pipelex is initialized lazily by the first bundle load or pipe run
         self.project_root = PROJECT_ROOT
-        self.product_ad_workflow = workflow_dir / "product_ad_generator.plx"
-        self.video_workflow = workflow_dir / "video_generator.plx"
+
+        # Validated PLX bundles, loaded once and hot-reloaded on change
+        self.bundles = BundleRegistry.from_settings()
+
+        # Shared image ingestion (resize, re-encode, dedupe by content hash)
+        self.image_ingestor = ImageIngestor.from_settings()
+
+        # Content-addressed cache for generate_complete_ad results
+        self.result_cache = ResultCache.from_settings()
+
+        # Index of successful generate_complete_ad results
+        self.history = HistoryStore.from_settings()
+
+        # Product analyses by perceptual hash, reused for near-duplicate images
+        self.analysis_index = AnalysisIndex.from_settings()
+
+        # Rendered videos, kept locally by prompt and model
+        self.video_store = VideoStore.from_settings()
+
+        # Identical in-flight requests attach to the run already in progress
+        self.ad_flights = SingleFlight("generate_complete_ad")
+        self.video_flights = SingleFlight("generate_video")
+
+        # Multi-tone variants: tones used when none are requested and the fan-out cap
+        tone_settings = get_section("tone_variants")
+        self.default_tones = list(tone_settings.get(
+            "default_tones", ["professional", "casual", "enthusiastic", "persuasive"]
+        ))
+        self.max_tones = int(tone_settings.get("max_tones", 8))
+        self.tone_concurrency = int(tone_settings.get("max_concurrency", 4))
+
+        # Assemble AdContent locally or with the combine_ad_content LLM step
+        self.ad_assembly = get_section("ad_generation").get("assembly", "local")
+        if self.ad_assembly not in ASSEMBLY_MODES:
+            raise ValueError(f"Unknown ad assembly mode: {self.ad_assembly} (expected one of {ASSEMBLY_MODES})")
+
+        # Per-stage model choice against the request's latency budget
+        self.model_router = ModelRouter.from_settings()
+        self.default_deadline_ms = int(get_section("model_routing").get("default_deadline_ms", 0)) or None
+
+        # Pipe execution: real Pipelex inference or the offline stub
+        self.inference_backend = os.getenv("ADFLOW_INFERENCE_BACKEND", "pipelex")
+        self.execute_pipe = make_inference_backend(self.inference_backend)
+
+        # Transient pipe failures are retried; a failing model's circuit opens
+        self.resilience = Resilience.from_settings()
 
     async def analyze_product_image(
         self,
         image_url: str,
-        product_info: Dict[str, Any]
+        product_info: Dict[str, Any],
+        deadline_ms: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Analyze a product image using Pipelex workflow
@@ -68,41 +319,20 @@ class AdGenerator:
         Args:
             image_url: URL or path to the product image
             product_info: Dictionary containing product information
+            deadline_ms: Time budget; the pipe is aborted when it runs out
 
         Returns:
             Dictionary containing image analysis results
         """
+        deadline = deadline_after(deadline_ms or self.default_deadline_ms)
+        timings: Dict[str, int] = {}
         try:
-            # Convert image to base64 data URI if it's a local file
-            processed_image_url = image_url
-            if not image_url.startswith(('http://', 'https://', 'data:')):
-                # Handle relative paths starting with /
-                if image_url.startswith('/'):
-                    # Convert to absolute path relative to public directory
-                    image_path = self.project_root / "public" / image_url.lstrip('/')
-                else:
-                    image_path = Path(image_url)
-                
-                if image_path.exists():
-                    # Read image and convert to base64
-                    with open(image_path, 'rb') as img_file:
-                        img_data = img_file.read()
-                        img_base64 = base64.b64encode(img_data).decode('utf-8')
-                        
-                        # Determine image type from extension
-                        ext = image_path.suffix.lower()
-                        mime_types = {
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.png': 'image/png',
-                            '.gif': 'image/gif',
-                            '.webp': 'image/webp'
-                        }
-                        mime_type = mime_types.get(ext, 'image/jpeg')
-                        
-                        # Create data URI
-                        processed_image_url = f"data:{mime_type};base64,{img_base64}"
-            
+            # Downscale, re-encode and base64-encode the image once
+            ingested = await self._ingest(image_url, timings)
+
+            # Concepts resolve against the Pipelex library
+            await ensure_pipelex_async()
+
             # Create product info stuff
             product_stuff = StuffFactory.make_from_concept_string(
                 concept_string="adflow.ProductInfo",
@@ -111,12 +341,14 @@ class AdGenerator:
             )
 
             # Execute the image analysis pipeline
-            pipe_output = await execute_pipeline(
-                pipe_code="analyze_product_image",
+            pipe_output = await self._run_pipe(
+                "analyze_product_image",
                 inputs={
-                    "image": ImageContent(url=processed_image_url),
+                    "image": ImageContent(url=ingested.url),
                     "product_info": product_stuff.content
-                }
+                },
+                timings=timings,
+                deadline=deadline
             )
 
             # Extract the analysis results
@@ -125,16 +357,60 @@ class AdGenerator:
             return {
                 "success": True,
                 "data": analysis,
-                "error": None
+                "error": None,
+                "timings": timings
             }
 
         except Exception as e:
             return {
                 "success": False,
                 "data": None,
-                "error": str(e)
+                "error": str(e),
+                "timings": timings,
+                "deadline_exceeded": isinstance(e, DeadlineExceeded),
+                "circuit_open": isinstance(e, CircuitOpen)
             }
 
+    async def warm_up(self, inference: bool = False) -> Dict[str, int]:
+        """
+        Prime per-process state before serving traffic
+
+        Loads the bundles, registers the fast-model variants of the fallback
+        stages and runs a sample image through ingestion.
+
+        Args:
+            inference: Also generate one ad for the sample image (calls the models)
+
+        Returns:
+            Milliseconds spent per warm-up step
+        """
+        timings: Dict[str, int] = {}
+
+        started = time.perf_counter()
+        await self.bundles.load_all()
+        timings["bundles"] = int((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        if self.model_router.enabled:
+            for stage in sorted(self.model_router.fallback_stages):
+                if self.model_router.primary_model(stage) is not None:
+                    self.model_router.pipe_code_for(stage, self.model_router.fast_model)
+        timings["model_variants"] = int((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        ingested = await self.image_ingestor.ingest(WARM_UP_IMAGE)
+        timings["image_ingest"] = int((time.perf_counter() - started) * 1000)
+
+        if inference:
+            started = time.perf_counter()
+            # Bypasses history and request coalescing: not a user generation
+            result = await self._complete_ad(ingested, {"name": "Warm-up"}, {})
+            if not result["success"]:
+                raise RuntimeError(f"Warm-up generation failed: {result['error']}")
+            timings["inference"] = int((time.perf_counter() - started) * 1000)
+
+        return timings
+
     async def generate_ad_copy_variants(
         self,
         product_info: Dict[str, Any],
@@ -151,6 +427,9 @@ class AdGenerator:
             Dictionary containing ad copy variants
         """
         try:
+            # Concepts resolve against the Pipelex library
+            await ensure_pipelex_async()
+
             # Create stuff objects
             product_stuff = StuffFactory.make_from_concept_string(
                 concept_string="adflow.ProductInfo",
@@ -165,8 +444,8 @@ class AdGenerator:
             )
 
             # Execute the ad copy generation pipeline
-            pipe_output = await execute_pipeline(
-                pipe_code="generate_ad_copy_variants",
+            pipe_output = await self._run_pipe(
+                "generate_ad_copy_variants",
                 inputs={
                     "product_info": product_stuff.content,
                     "image_analysis": analysis_stuff.content
@@ -192,109 +471,431 @@ class AdGenerator:
     async def generate_complete_ad(
         self,
         image_url: str,
-        product_info: Dict[str, Any]
+        product_info: Dict[str, Any],
+        deadline_ms: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Complete pipeline using product_ad_generator.plx workflow
         Generates comprehensive product analysis, ad copy, and video prompt
 
+        Identical requests (same image content and product info) arriving
+        while one is running share its result, and its history entry, instead
+        of starting another run.
+
         Args:
             image_url: URL or path to the product image
             product_info: Dictionary containing product information (optional, not used in new workflow)
+            deadline_ms: Latency budget; stages fall back to the fast model to meet it
 
         Returns:
-            Dictionary containing complete ad generation results
+            Dictionary containing complete ad generation results; successful
+            results carry the history_id they were recorded under. data.image_url
+            is the caller's path or URL, or "sha256:<hash>" for a data URI input
         """
+        deadline = deadline_after(deadline_ms or self.default_deadline_ms)
+        timings: Dict[str, int] = {}
         try:
-            # Load the PLX bundle content
-            with open(self.product_ad_workflow, 'r', encoding='utf-8') as f:
-                plx_content = f.read()
-            
-            # Convert image to base64 data URI if it's a local file
-            if not image_url.startswith(('http://', 'https://', 'data:')):
-                # Handle relative paths starting with /
-                if image_url.startswith('/'):
-                    # Convert to absolute path relative to public directory
-                    image_path = self.project_root / "public" / image_url.lstrip('/')
-                else:
-                    image_path = Path(image_url)
-                
-                if image_path.exists():
-                    # Read image and convert to base64
-                    with open(image_path, 'rb') as img_file:
-                        img_data = img_file.read()
-                        img_base64 = base64.b64encode(img_data).decode('utf-8')
-                        
-                        # Determine image type from extension
-                        ext = image_path.suffix.lower()
-                        mime_types = {
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.png': 'image/png',
-                            '.gif': 'image/gif',
-                            '.webp': 'image/webp'
-                        }
-                        mime_type = mime_types.get(ext, 'image/jpeg')
-                        
-                        # Create data URI
-                        image_url = f"data:{mime_type};base64,{img_base64}"
+            # Downscale, re-encode and base64-encode the image once
+            ingested = await self._ingest(image_url, timings)
+        except Exception as e:
+            return {
+                "success": False,
+                "data": None,
+                "error": str(e),
+                "timings": timings
+            }
+
+        flight_key = make_cache_key(ingested.content_hash, canonical_json(product_info))
+        result, coalesced = await self.ad_flights.do(
+            flight_key,
+            lambda: self._generate_complete_ad(ingested, product_info, timings, deadline)
+        )
+        if result["success"]:
+            # A coalesced result names the leader's image; answer with this caller's
+            result = {**result, "data": {**result["data"], "image_url": ingested.reference}}
+        return {**result, "coalesced": coalesced}
+
+    async def _generate_complete_ad(
+        self,
+        ingested: IngestedImage,
+        product_info: Dict[str, Any],
+        timings: Dict[str, int],
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        generate_complete_ad for an already ingested image, run once per flight
+
+        A success is recorded in the history here, once for all the callers
+        coalesced onto it. A result cache hit is recorded too: it answers a
+        separate request, possibly with other product_info.
+        """
+        result = await self._complete_ad(ingested, product_info, timings, deadline)
+        if result["success"]:
+            result = {**result, "history_id": await self._record_history(ingested, product_info, result)}
+        return result
+
+    async def _complete_ad(
+        self,
+        ingested: IngestedImage,
+        product_info: Dict[str, Any],
+        timings: Dict[str, int],
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Serve an ad from the result cache or run the workflow"""
+        if self.ad_assembly == "local":
+            # Three pipes and local assembly instead of the full sequence
+            async for event in self._run_ad_stages(ingested, product_info, timings, deadline):
+                if event["event"] in ("complete", "error"):
+                    return {key: value for key, value in event.items() if key != "event"}
+
+        try:
+            # Get the loaded product_ad_generator.plx bundle
+            bundle = await self.bundles.get(PRODUCT_AD_BUNDLE)
+
+            cache_key = self._ad_cache_key(ingested.content_hash, bundle.sha256)
+            cached = await self.result_cache.get(cache_key)
+            if cached is not None:
+                return {
+                    "success": True,
+                    "data": {
+                        **cached,
+                        "product_info": product_info,
+                        "image_url": ingested.reference
+                    },
+                    "error": None,
+                    "cached": True,
+                    "bundle_version": bundle.version,
+                    "timings": timings
+                }
             
             # Execute the complete ad generation pipeline using product_ad_generator.plx
             # This workflow only needs the product image as input
-            pipe_output = await execute_pipeline(
-                plx_content=plx_content,
+            pipe_output = await self._run_pipe(
+                bundle.main_pipe,
                 inputs={
-                    "product_image": ImageContent(url=image_url)
-                }
+                    "product_image": ImageContent(url=ingested.url)
+                },
+                timings=timings,
+                deadline=deadline
             )
 
-            # Extract the complete results
-            # Access the main_stuff which contains the AdContent
-            ad_content = pipe_output.main_stuff
-            
-            # The content is stored in the .content attribute of the Stuff object
-            content_data = ad_content.content
-            
-            # Extract the three fields - they are attributes, not dict keys
-            product_analysis_str = getattr(content_data, 'product_analysis', "{}")
-            ad_copy_str = getattr(content_data, 'ad_copy', "{}")
-            video_prompt_str = getattr(content_data, 'video_prompt', "")
-            
-            # Parse JSON strings
-            try:
-                product_analysis = json.loads(product_analysis_str) if isinstance(product_analysis_str, str) else product_analysis_str
-            except:
-                product_analysis = {}
-            
-            try:
-                ad_copy = json.loads(ad_copy_str) if isinstance(ad_copy_str, str) else ad_copy_str
-            except:
-                ad_copy = {}
+            # The AdContent is the content of the main stuff
+            ad_content = parse_ad_content(pipe_output.main_stuff.content)
+            await self._cache_ad_content(cache_key, ad_content)
 
             return {
                 "success": True,
                 "data": {
-                    "product_analysis": product_analysis,
-                    "ad_copy": ad_copy,
-                    "video_prompt": video_prompt_str,
+                    **ad_content,
                     "product_info": product_info,
-                    "image_url": image_url
+                    "image_url": ingested.reference
                 },
-                "error": None
+                "error": None,
+                "cached": False,
+                "bundle_version": bundle.version,
+                "timings": timings
             }
 
         except Exception as e:
             return {
                 "success": False,
                 "data": None,
-                "error": str(e)
+                "error": str(e),
+                "timings": timings,
+                "deadline_exceeded": isinstance(e, DeadlineExceeded),
+                "circuit_open": isinstance(e, CircuitOpen)
             }
 
+    async def stream_ad_stages(
+        self,
+        image_url: str,
+        product_info: Dict[str, Any],
+        deadline_ms: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the generate_ad_content sequence one step at a time
+
+        In "local" assembly mode the combine_ad_content LLM step is skipped
+        and the typed outputs are assembled directly.
+
+        Yields one event per stage as soon as it completes
+        ({"event": <stage>, "data": <stage output>, "elapsed_ms": ..., "model": ...}),
+        then a final {"event": "complete", ...} event carrying the same
+        result as generate_complete_ad plus per-stage timings and models,
+        or an {"event": "error", ...} event if a stage fails.
+
+        Args:
+            image_url: URL or path to the product image
+            product_info: Dictionary containing product information
+            deadline_ms: Latency budget; stages fall back to the fast model to meet it
+
+        Yields:
+            Stage events
+        """
+        deadline = deadline_after(deadline_ms or self.default_deadline_ms)
+        timings: Dict[str, int] = {}
+        try:
+            ingested = await self._ingest(image_url, timings)
+        except Exception as e:
+            yield {
+                "event": "error",
+                "success": False,
+                "data": None,
+                "error": str(e),
+                "timings": timings
+            }
+            return
+
+        async for event in self._run_ad_stages(ingested, product_info, timings, deadline):
+            if event["event"] == "complete":
+                event = {**event, "history_id": await self._record_history(ingested, product_info, event)}
+            yield event
+
+    async def _record_history(
+        self,
+        ingested: IngestedImage,
+        product_info: Dict[str, Any],
+        result: Dict[str, Any]
+    ) -> Optional[str]:
+        """Add a successful generation to the history; never fails the request"""
+        try:
+            return await asyncio.to_thread(
+                self.history.record,
+                product_info,
+                ingested.reference,
+                {
+                    "product_info": product_info,
+                    "image_url": thumbnail_for(ingested.reference),
+                    "data": result["data"],
+                    "bundle_version": result.get("bundle_version")
+                }
+            )
+        except sqlite3.Error as e:
+            logging.getLogger(__name__).warning(f"Could not record generation history: {e}")
+            return None
+
+    async def _run_ad_stages(
+        self,
+        ingested: IngestedImage,
+        product_info: Dict[str, Any],
+        timings: Dict[str, int],
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """stream_ad_stages for an already ingested image"""
+        models: Dict[str, Optional[str]] = {}
+        reused: Optional[Dict[str, Any]] = None
+        try:
+            bundle = await self.bundles.get(PRODUCT_AD_BUNDLE)
+
+            cache_key = self._ad_cache_key(ingested.content_hash, bundle.sha256)
+            cached = await self.result_cache.get(cache_key)
+            if cached is not None:
+                for stage, field in zip(AD_CONTENT_STAGES, AD_CONTENT_RESULTS[:3]):
+                    yield {"event": stage, "data": cached[field], "elapsed_ms": 0, "cached": True}
+                ad_content = cached
+            else:
+                inputs: Dict[str, Any] = {"product_image": ImageContent(url=ingested.url)}
+                outputs: Dict[str, Any] = {}
+                stage_count = 3 if self.ad_assembly == "local" else len(AD_CONTENT_STAGES)
+                stages = AD_CONTENT_STAGES[:stage_count]
+
+                # A near-duplicate of an analyzed image continues from generate_copy
+                reused = await self._reuse_analysis(ingested, bundle)
+                if reused is not None:
+                    outputs["product_analysis"] = reused["content"]
+                    inputs = dict(outputs)
+                    yield {
+                        "event": "analyze_product",
+                        "data": reused["analysis"],
+                        "elapsed_ms": 0,
+                        "reused": True,
+                        "distance": reused["distance"]
+                    }
+
+                for index, (stage, result_name) in enumerate(zip(stages, AD_CONTENT_RESULTS)):
+                    if result_name in outputs:
+                        continue
+                    # Primary model, or the fast one if the budget cannot absorb it
+                    model = self.model_router.choose(stage, time_left(deadline), stages[index + 1:])
+                    models[stage] = model
+                    pipe_output = await self._run_pipe(
+                        self.model_router.pipe_code_for(stage, model),
+                        inputs=inputs,
+                        timings=timings,
+                        stage=stage,
+                        model=model,
+                        deadline=deadline
+                    )
+
+                    outputs[result_name] = pipe_output.main_stuff.content
+                    # Later steps take the earlier results, as in the PipeSequence
+                    inputs = dict(outputs)
+                    if stage == "analyze_product":
+                        await self._index_analysis(ingested, bundle, outputs[result_name])
+
+                    yield {
+                        "event": stage,
+                        "data": stuff_content_to_data(outputs[result_name]),
+                        "elapsed_ms": timings[stage],
+                        "model": model
+                    }
+
+                if self.ad_assembly == "local":
+                    ad_content = assemble_ad_content(
+                        outputs["product_analysis"],
+                        outputs["ad_copy"],
+                        outputs["video_prompt"]
+                    )
+                else:
+                    ad_content = parse_ad_content(outputs["ad_content"])
+                await self._cache_ad_content(cache_key, ad_content)
+
+            yield {
+                "event": "complete",
+                "success": True,
+                "data": {
+                    **ad_content,
+                    "product_info": product_info,
+                    "image_url": ingested.reference
+                },
+                "error": None,
+                "cached": cached is not None,
+                "analysis_reused": reused is not None,
+                "bundle_version": bundle.version,
+                "timings": timings,
+                "models": models
+            }
+
+        except Exception as e:
+            yield {
+                "event": "error",
+                "success": False,
+                "data": None,
+                "error": str(e),
+                "timings": timings,
+                "models": models,
+                "deadline_exceeded": isinstance(e, DeadlineExceeded),
+                "circuit_open": isinstance(e, CircuitOpen)
+            }
+
+    async def _reuse_analysis(self, ingested: IngestedImage, bundle: Any) -> Optional[Dict[str, Any]]:
+        """
+        Stored ProductAnalysis of an earlier image that looks the same
+
+        Returns:
+            The analysis data, its pipe input content and the hash distance,
+            or None when analyze_product has to run
+        """
+        try:
+            match = await asyncio.to_thread(self.analysis_index.find, ingested.phash, bundle.sha256)
+            if match is None:
+                return None
+            concept = get_required_concept(concept_string=f"{bundle.blueprint.domain}.ProductAnalysis")
+            content = StuffContentFactory.make_stuff_content_from_concept_required(
+                concept=concept,
+                value=match["analysis"]
+            )
+        except Exception as e:
+            # Index unavailable or the stored analysis no longer fits the concept
+            logging.getLogger(__name__).warning(f"Could not reuse a product analysis: {e}")
+            return None
+        return {**match, "content": content}
+
+    async def _index_analysis(self, ingested: IngestedImage, bundle: Any, content: Any) -> None:
+        """Keep a fresh ProductAnalysis for later near-duplicates; never fails the request"""
+        analysis = stuff_content_to_data(content)
+        if not isinstance(analysis, dict):
+            return
+        try:
+            await asyncio.to_thread(
+                self.analysis_index.add, ingested.phash, bundle.sha256, ingested.content_hash, analysis
+            )
+        except sqlite3.Error as e:
+            logging.getLogger(__name__).warning(f"Could not index the product analysis: {e}")
+
+    async def _ingest(self, image_url: str, timings: Dict[str, int]) -> IngestedImage:
+        """Ingest an image, recording the image_ingest stage"""
+        with observe_stage("image_ingest", timings):
+            return await self.image_ingestor.ingest(image_url)
+
+    async def _run_pipe(
+        self,
+        pipe_code: str,
+        inputs: Dict[str, Any],
+        timings: Optional[Dict[str, int]] = None,
+        stage: Optional[str] = None,
+        model: Optional[str] = None,
+        deadline: Optional[float] = None
+    ) -> Any:
+        """
+        Execute one loaded pipe, recording its latency, errors and tokens
+
+        Transient failures are retried with jittered backoff, within the
+        deadline, and a model whose circuit is open is not called at all.
+        The pipe is aborted when the deadline passes or the calling request
+        is cancelled; both are counted as cancelled work.
+
+        Args:
+            pipe_code: Code of the pipe to run (a routed variant for fast-model runs)
+            inputs: Pipe inputs
+            timings: Per-request timing breakdown to fill in
+            stage: Stage name for metrics and routing (defaults to pipe_code)
+            model: Model the router picked (defaults to the pipe's own model)
+            deadline: time.monotonic() by which the pipe must finish
+
+        Returns:
+            The pipe output
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before or during the pipe
+            CircuitOpen: If the model is failing and was not called
+        """
+        await ensure_pipelex_async()
+        stage = stage or pipe_code
+        model = model or self.model_router.primary_model(stage)
+        remaining = time_left(deadline)
+        if remaining is not None and remaining <= 0:
+            CANCELLED_WORK.inc(stage=stage, reason="deadline")
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+        started = time.perf_counter()
+        try:
+            with observe_stage(stage, timings):
+                pipe_output = await asyncio.wait_for(
+                    self.resilience.call(model or pipe_code, stage, lambda: self.execute_pipe(pipe_code, inputs)),
+                    remaining
+                )
+        except asyncio.TimeoutError:
+            CANCELLED_WORK.inc(stage=stage, reason="deadline")
+            if model:
+                # At least this slow: keeps the router from picking the model again too soon
+                self.model_router.observe(stage, model, time.perf_counter() - started)
+            raise DeadlineExceeded(f"Deadline exceeded during {stage}")
+        except asyncio.CancelledError:
+            CANCELLED_WORK.inc(stage=stage, reason="cancelled")
+            raise
+
+        if model:
+            self.model_router.observe(stage, model, time.perf_counter() - started)
+        record_token_usage(stage, pipe_output.pipeline_run_id)
+        return pipe_output
+
+    @staticmethod
+    def _ad_cache_key(image_hash: str, bundle_hash: str) -> str:
+        """Same image + same workflow definition => same ad content"""
+        return make_cache_key(image_hash, bundle_hash)
+
+    async def _cache_ad_content(self, cache_key: str, ad_content: Dict[str, Any]) -> None:
+        """Only cache complete results, never the parse fallbacks"""
+        if ad_content["product_analysis"] and ad_content["ad_copy"] and ad_content["video_prompt"]:
+            await self.result_cache.set(cache_key, ad_content)
+
     async def generate_single_tone_ad(
         self,
         product_info: Dict[str, Any],
         image_analysis: Dict[str, Any],
-        tone: str
+        tone: str,
+        deadline: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Generate a single ad copy with specific tone
@@ -303,11 +904,15 @@ class AdGenerator:
             product_info: Dictionary containing product information
             image_analysis: Dictionary containing image analysis results
             tone: Desired tone (professional, casual, enthusiastic, persuasive)
+            deadline: time.monotonic() by which the copy must be written
 
         Returns:
             Dictionary containing single ad copy variant
         """
         try:
+            # Concepts resolve against the Pipelex library
+            await ensure_pipelex_async()
+
             # Create stuff objects
             product_stuff = StuffFactory.make_from_concept_string(
                 concept_string="adflow.ProductInfo",
@@ -322,13 +927,14 @@ class AdGenerator:
             )
 
             # Execute the single tone ad generation pipeline
-            pipe_output = await execute_pipeline(
-                pipe_code="generate_single_tone_ad",
+            pipe_output = await self._run_pipe(
+                "generate_single_tone_ad",
                 inputs={
                     "product_info": product_stuff.content,
                     "image_analysis": analysis_stuff.content,
                     "tone": tone
-                }
+                },
+                deadline=deadline
             )
 
             # Extract the ad variant
@@ -344,36 +950,141 @@ class AdGenerator:
             return {
                 "success": False,
                 "data": None,
-                "error": str(e)
+                "error": str(e),
+                "deadline_exceeded": isinstance(e, DeadlineExceeded),
+                "circuit_open": isinstance(e, CircuitOpen)
             }
 
+    async def generate_tone_variants(
+        self,
+        image_url: str,
+        product_info: Dict[str, Any],
+        tones: Optional[List[str]] = None,
+        max_concurrency: Optional[int] = None,
+        deadline_ms: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze the image once, then write one ad per tone concurrently
+
+        Args:
+            image_url: URL or path to the product image
+            product_info: Dictionary containing product information
+            tones: Tones to generate (defaults to [tone_variants] default_tones)
+            max_concurrency: Concurrent tone generations, capped by [tone_variants] max_concurrency
+            deadline_ms: Time budget shared by the analysis and every tone
+
+        Returns:
+            Dictionary with the shared image analysis and one entry per tone;
+            succeeds if at least one tone was generated
+        """
+        # Keep the first occurrence of each tone, in request order
+        tones = list(dict.fromkeys(tones or self.default_tones))
+        if len(tones) > self.max_tones:
+            return {
+                "success": False,
+                "data": None,
+                "error": f"Too many tones requested ({len(tones)}), the limit is {self.max_tones}"
+            }
+
+        deadline = deadline_after(deadline_ms or self.default_deadline_ms)
+        analysis = await self.analyze_product_image(
+            image_url=image_url,
+            product_info=product_info,
+            deadline_ms=max(1, int(time_left(deadline) * 1000)) if deadline is not None else None
+        )
+        if not analysis["success"]:
+            return analysis
+
+        concurrency = min(max_concurrency or self.tone_concurrency, self.tone_concurrency)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def generate_tone(tone: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.generate_single_tone_ad(
+                    product_info=product_info,
+                    image_analysis=analysis["data"],
+                    tone=tone,
+                    deadline=deadline
+                )
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(generate_tone(tone) for tone in tones))
+        timings = {**analysis["timings"], "tone_variants": int((time.perf_counter() - started) * 1000)}
+        variants = [
+            {"tone": tone, "success": result["success"], "data": result["data"], "error": result["error"]}
+            for tone, result in zip(tones, results)
+        ]
+        succeeded = any(variant["success"] for variant in variants)
+
+        return {
+            "success": succeeded,
+            "data": {
+                "image_analysis": analysis["data"],
+                "variants": variants
+            },
+            "error": None if succeeded else "All tone variants failed",
+            "timings": timings,
+            "deadline_exceeded": not succeeded and all(result.get("deadline_exceeded") for result in results),
+            "circuit_open": not succeeded and all(result.get("circuit_open") for result in results)
+        }
+
     async def generate_video(
         self,
-        video_prompt: str
+        video_prompt: str,
+        deadline_ms: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Generate a product video using Veo 3 Fast
 
         Args:
             video_prompt: Detailed video generation prompt (max 2000 chars)
+            deadline_ms: Time budget; the render is aborted when it runs out
 
         Returns:
-            Dictionary containing video URL and generation results
+            Dictionary containing video URL and generation results. A video
+            already rendered for the same prompt and model is served from the
+            video store; data.video_url is then its local playback URL
         """
+        # Truncate prompt to 2000 characters
+        truncated_prompt = video_prompt[:2000]
+        deadline = deadline_after(deadline_ms)
+
+        # A resubmitted prompt attaches to the render already in progress
+        # (and to its deadline, set by the caller that started it)
+        result, coalesced = await self.video_flights.do(
+            make_cache_key(canonical_json(truncated_prompt)),
+            lambda: self._generate_video(truncated_prompt, deadline)
+        )
+        return {**result, "coalesced": coalesced}
+
+    async def _generate_video(self, truncated_prompt: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """generate_video for an already truncated prompt"""
+        timings: Dict[str, int] = {}
         try:
-            # Load the PLX bundle content
-            with open(self.video_workflow, 'r', encoding='utf-8') as f:
-                plx_content = f.read()
-            
-            # Truncate prompt to 2000 characters
-            truncated_prompt = video_prompt[:2000]
+            # Get the loaded video_generator.plx bundle
+            bundle = await self.bundles.get(VIDEO_BUNDLE)
+
+            # Rendered before with this model (or, if the pipe names none, this bundle): no new render
+            model = self.model_router.primary_model(bundle.main_pipe) or bundle.sha256
+            stored = await self.video_store.lookup(truncated_prompt, model)
+            if stored is not None:
+                return {
+                    "success": True,
+                    "data": self._video_data(truncated_prompt, stored["source_url"], stored),
+                    "error": None,
+                    "cached": True,
+                    "bundle_version": bundle.version,
+                    "timings": timings
+                }
 
             # Execute the video generation pipeline
-            pipe_output = await execute_pipeline(
-                plx_content=plx_content,
+            pipe_output = await self._run_pipe(
+                bundle.main_pipe,
                 inputs={
                     "prompt": truncated_prompt
-                }
+                },
+                timings=timings,
+                deadline=deadline
             )
 
             # Extract the video results
@@ -393,22 +1104,44 @@ class AdGenerator:
             else:
                 video_url = None
 
+            # Keep our own copy; the provider's URL is still returned if that fails
+            stored = await self.video_store.save(truncated_prompt, model, video_url)
+
             return {
                 "success": True,
-                "data": {
-                    "video_url": video_url,
-                    "prompt": truncated_prompt
-                },
-                "error": None
+                "data": self._video_data(truncated_prompt, video_url, stored),
+                "error": None,
+                "cached": False,
+                "bundle_version": bundle.version,
+                "timings": timings
             }
 
         except Exception as e:
             return {
                 "success": False,
                 "data": None,
-                "error": str(e)
+                "error": str(e),
+                "timings": timings,
+                "deadline_exceeded": isinstance(e, DeadlineExceeded),
+                "circuit_open": isinstance(e, CircuitOpen)
             }
 
+    def _video_data(
+        self,
+        prompt: str,
+        source_url: Optional[str],
+        stored: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """generate_video data, pointing at the stored copy when there is one"""
+        if stored is None:
+            return {"video_url": source_url, "prompt": prompt, "video_id": None, "source_url": source_url}
+        return {
+            "video_url": self.video_store.playback_url(stored["video_id"]),
+            "prompt": prompt,
+            "video_id": stored["video_id"],
+            "source_url": source_url
+        }
+
 
 async def main():
     """Main function for CLI usage"""
@@ -0,0 +1,195 @@
+"""
+AdFlow AI - Admission Control
+Per-endpoint concurrency limits with a bounded FIFO wait queue
+
+When an endpoint is saturated, requests wait in a short queue for at most
+queue_timeout seconds; when the queue is full (or the wait times out) they
+are rejected immediately with a Retry-After estimate instead of piling up
+on the provider.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Any, AsyncIterator
+
+try:
+    from .settings import get_section
+except ImportError:
+    from settings import get_section
+
+# Weight of the newest sample in the moving average of service time
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """The endpoint is saturated; the client should retry later"""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        super().__init__(f"{endpoint} is overloaded ({reason}), retry in {retry_after}s")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """A held slot; release() is idempotent"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """Concurrency limit + bounded wait queue for one endpoint"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float
+    ):
+        """
+        Args:
+            name: Endpoint name used in errors and stats
+            max_concurrent: Requests served at the same time
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Seconds a request may wait before being rejected
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_time = 0.0
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to be free for a new request"""
+        if not self._service_time:
+            return 1
+        waves = (self.queued + 1) / self.max_concurrent
+        return max(1, math.ceil(self._service_time * waves))
+
+    async def acquire(self) -> AdmissionTicket:
+        """
+        Wait for a slot
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return AdmissionTicket(self)
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(self.name, "queue full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # A released slot is handed over directly by _release()
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.rejected_timeout += 1
+            raise AdmissionRejected(self.name, "queue timeout", self.retry_after())
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the client went away
+                self._release(0.0, record=False)
+            raise
+
+        self.admitted += 1
+        return AdmissionTicket(self)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block"""
+        ticket = await self.acquire()
+        try:
+            yield
+        finally:
+            ticket.release()
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self, service_time: float, record: bool = True) -> None:
+        """Hand the slot to the oldest waiter, or free it"""
+        if record:
+            if self._service_time:
+                self._service_time += SERVICE_TIME_ALPHA * (service_time - self._service_time)
+            else:
+                self._service_time = service_time
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Live load numbers for monitoring"""
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_service_time": round(self._service_time, 3)
+        }
+
+
+# Limits used for endpoints missing from [admission.<endpoint>]
+DEFAULT_LIMITS = {"max_concurrent": 8, "max_queue": 32, "queue_timeout": 10.0}
+
+
+def controllers_from_settings(*endpoints: str) -> Dict[str, AdmissionController]:
+    """
+    Build one controller per endpoint from the [admission.<endpoint>] sections
+
+    Args:
+        endpoints: Endpoint names, e.g. "generate_ad"
+
+    Returns:
+        Controllers keyed by endpoint name
+    """
+    section = get_section("admission")
+    controllers = {}
+    for endpoint in endpoints:
+        limits = {**DEFAULT_LIMITS, **section.get(endpoint, {})}
+        controllers[endpoint] = AdmissionController(
+            name=endpoint,
+            max_concurrent=int(limits["max_concurrent"]),
+            max_queue=int(limits["max_queue"]),
+            queue_timeout=float(limits["queue_timeout"])
+        )
+    return controllers
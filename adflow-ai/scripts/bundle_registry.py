@@ -0,0 +1,275 @@
+"""
+AdFlow AI - Bundle Registry
+Loads and validates the PLX bundles under pipelex/ once, keeps them loaded
+in the Pipelex library and hot-reloads a bundle when its file changes
+
+Pipes are then executed by pipe_code, so requests no longer pay for reading,
+parsing and dry-run validating the bundle on every call.
+
+The Pipelex library is global to the process, so a changed bundle is
+validated (and dry run) in a separate process while the loaded version
+keeps serving; only a valid bundle is swapped in, in one step.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pipelex.core.interpreter import PipelexInterpreter
+from pipelex.hub import get_library_manager
+from pipelex.pipeline.validate_plx import validate_plx
+
+try:
+    from .pipelex_runtime import ensure_pipelex, ensure_pipelex_async, enter_project_root
+    from .settings import PROJECT_ROOT, get_section
+except ImportError:
+    from pipelex_runtime import ensure_pipelex, ensure_pipelex_async, enter_project_root
+    from settings import PROJECT_ROOT, get_section
+
+logger = logging.getLogger(__name__)
+
+
+class BundleError(Exception):
+    """A bundle is missing or failed validation"""
+
+
+async def validate_isolated(content: str, timeout: float) -> None:
+    """
+    Validate and dry run PLX content in a child process
+
+    Raises:
+        BundleError: If the content is invalid or validation timed out
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, str(Path(__file__).resolve()), "--validate",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(content.encode("utf-8")), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise BundleError(f"Validation timed out after {timeout:.0f}s")
+    if process.returncode != 0:
+        lines = stdout.decode("utf-8", errors="replace").strip().splitlines()
+        raise BundleError(lines[-1] if lines else f"Validation exited with code {process.returncode}")
+
+
+@dataclass
+class Bundle:
+    """A validated bundle loaded in the Pipelex library"""
+
+    name: str           # file stem, e.g. "product_ad_generator"
+    path: Path
+    sha256: str
+    mtime_ns: int
+    main_pipe: Optional[str]
+    pipe_codes: List[str]
+    blueprint: Any
+    loaded_at: float
+
+    @property
+    def version(self) -> str:
+        """Short identifier of the bundle content that served a request"""
+        return f"{self.name}@{self.sha256[:12]}"
+
+
+class BundleRegistry:
+    """In-memory registry of validated PLX bundles"""
+
+    def __init__(
+        self,
+        bundle_dir: Path,
+        exclude: Optional[List[str]] = None,
+        reload_check_interval: float = 1.0,
+        validation_timeout: float = 120.0
+    ):
+        """
+        Args:
+            bundle_dir: Directory holding the .plx files
+            exclude: File names under bundle_dir that are not loaded
+            reload_check_interval: Minimum seconds between two file change checks of a bundle
+            validation_timeout: Seconds a changed bundle's validation may take
+        """
+        self.bundle_dir = Path(bundle_dir)
+        self.exclude = set(exclude or [])
+        self.reload_check_interval = reload_check_interval
+        self.validation_timeout = validation_timeout
+
+        self._bundles: Dict[str, Bundle] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.reloads = 0
+
+    @classmethod
+    def from_settings(cls) -> "BundleRegistry":
+        """Build the registry from the [bundles] section of pipelex_config.toml"""
+        section = get_section("bundles")
+        return cls(
+            bundle_dir=PROJECT_ROOT / "pipelex",
+            exclude=list(section.get("exclude", [])),
+            reload_check_interval=float(section.get("reload_check_interval", 1.0)),
+            validation_timeout=float(section.get("validation_timeout", 120.0))
+        )
+
+    def bundle_paths(self) -> List[Path]:
+        """All bundle files served by the registry"""
+        return sorted(
+            path for path in self.bundle_dir.glob("*.plx")
+            if path.name not in self.exclude
+        )
+
+    async def load_all(self) -> List[Bundle]:
+        """
+        Load and validate every bundle (call at startup)
+
+        Raises:
+            BundleError: If any bundle fails validation
+        """
+        return [await self.get(path.stem) for path in self.bundle_paths()]
+
+    async def get(self, name: str) -> Bundle:
+        """
+        Get a loaded bundle, reloading it first if its file changed
+
+        A changed file that fails validation is logged and the previously
+        loaded version keeps serving requests, as it does while the change
+        is being validated.
+
+        Args:
+            name: Bundle file stem, e.g. "product_ad_generator"
+
+        Raises:
+            BundleError: If the bundle has never loaded successfully
+        """
+        bundle = self._bundles.get(name)
+        now = time.monotonic()
+        if bundle is not None and now - self._checked_at.get(name, 0.0) < self.reload_check_interval:
+            return bundle
+
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        if bundle is not None and lock.locked():
+            # A reload is being validated: the current version serves meanwhile
+            return bundle
+        async with lock:
+            bundle = self._bundles.get(name)
+            self._checked_at[name] = time.monotonic()
+            path = self.bundle_dir / f"{name}.plx"
+            try:
+                mtime_ns = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                if bundle is None:
+                    raise BundleError(f"Bundle not found: {path}")
+                logger.error(f"Bundle file {path} disappeared, still serving {bundle.version}")
+                return bundle
+
+            if bundle is not None and bundle.mtime_ns == mtime_ns:
+                return bundle
+
+            content = path.read_text(encoding='utf-8')
+            sha256 = hashlib.sha256(content.encode('utf-8')).hexdigest()
+            if bundle is not None and bundle.sha256 == sha256:
+                # Touched but unchanged: nothing to reload
+                bundle.mtime_ns = mtime_ns
+                return bundle
+
+            try:
+                new_bundle = await self._load(name, path, content, sha256, mtime_ns, previous=bundle)
+            except Exception as e:
+                if bundle is None:
+                    raise BundleError(f"Bundle {path.name} failed validation: {e}") from e
+                logger.error(f"Reload of {path.name} failed, still serving {bundle.version}: {e}")
+                bundle.mtime_ns = mtime_ns
+                return bundle
+
+            if bundle is not None:
+                self.reloads += 1
+                logger.info(f"Reloaded bundle {bundle.version} -> {new_bundle.version}")
+            self._bundles[name] = new_bundle
+            return new_bundle
+
+    async def _load(
+        self,
+        name: str,
+        path: Path,
+        content: str,
+        sha256: str,
+        mtime_ns: int,
+        previous: Optional[Bundle]
+    ) -> Bundle:
+        """Validate a bundle and put its definitions in the Pipelex library"""
+        await ensure_pipelex_async()
+        if previous is None:
+            # Nothing of this bundle is served yet: validate it in place and keep it loaded
+            blueprint, pipes = await validate_plx(plx_content=content, remove_after_validation=False)
+        else:
+            await validate_isolated(content, self.validation_timeout)
+            blueprint = PipelexInterpreter(file_content=content).make_pipelex_bundle_blueprint()
+            pipes = self._swap(previous.blueprint, blueprint)
+
+        return Bundle(
+            name=name,
+            path=path,
+            sha256=sha256,
+            mtime_ns=mtime_ns,
+            main_pipe=blueprint.main_pipe,
+            pipe_codes=[pipe.code for pipe in pipes],
+            blueprint=blueprint,
+            loaded_at=time.time()
+        )
+
+    @staticmethod
+    def _swap(old_blueprint: Any, new_blueprint: Any) -> List[Any]:
+        """
+        Replace one bundle's definitions with another's
+
+        Runs without awaiting, so no request on the event loop sees the
+        library between the two versions.
+        """
+        library_manager = get_library_manager()
+        library_manager.remove_from_blueprint(blueprint=old_blueprint)
+        try:
+            return library_manager.load_from_blueprint(blueprint=new_blueprint)
+        except Exception:
+            library_manager.remove_from_blueprint(blueprint=new_blueprint)
+            library_manager.load_from_blueprint(blueprint=old_blueprint)
+            raise
+
+    def versions(self) -> Dict[str, str]:
+        """Currently served version of each loaded bundle"""
+        return {name: bundle.version for name, bundle in self._bundles.items()}
+
+
+def main() -> int:
+    """Validate PLX content read from stdin; print "ok" or the error (see validate_isolated)"""
+    content = sys.stdin.read()
+    enter_project_root()
+    # Pipelex logs to stdout: keep it on stderr so the last stdout line is the verdict
+    stdout_fd = os.dup(1)
+    os.dup2(2, 1)
+    try:
+        ensure_pipelex()
+        asyncio.run(validate_plx(plx_content=content))
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}".replace("\n", " ")
+    finally:
+        sys.stdout.flush()
+        os.dup2(stdout_fd, 1)
+        os.close(stdout_fd)
+    print(error or "ok", flush=True)
+    return 1 if error else 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--validate"]:
+        sys.exit(main())
+    sys.exit("usage: bundle_registry.py --validate < bundle.plx")
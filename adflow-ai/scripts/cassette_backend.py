@@ -0,0 +1,298 @@
+"""
+AdFlow AI - Record/Replay Inference Backend
+Captures real pipe calls to a cassette file and plays them back offline
+
+With ADFLOW_INFERENCE_BACKEND=record every pipe call still goes through
+execute_pipeline, and its inputs fingerprint, output (or error) and latency
+are appended to the cassette, one gzip-compressed JSON line per call. With
+ADFLOW_INFERENCE_BACKEND=replay no provider is called: each pipe call is
+answered from the cassette after the recorded latency times latency_scale.
+
+A replayed call is matched on its pipe code and inputs fingerprint. Calls
+with inputs never recorded (another image, say) get the recordings of the
+same pipe in turn unless [cassette] strict is set, so a cassette recorded
+from a few real requests can drive load tests of any size. Recorded errors
+are replayed as errors, with their transient/permanent classification.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pipelex.core.stuffs.text_content import TextContent
+
+try:
+    from .model_router import VARIANT_SEPARATOR
+    from .resilience import is_transient
+    from .settings import DATA_DIR, get_section
+    from .single_flight import canonical_json
+    from .stub_backend import StubContent, StubPipeOutput
+except ImportError:
+    from model_router import VARIANT_SEPARATOR
+    from resilience import is_transient
+    from settings import DATA_DIR, get_section
+    from single_flight import canonical_json
+    from stub_backend import StubContent, StubPipeOutput
+
+DEFAULT_CASSETTE = DATA_DIR / "cassettes" / "pipes.jsonl.gz"
+
+# Longest input string kept verbatim in a recording's input summary
+SUMMARY_CHARS = 200
+
+
+class CassetteMiss(LookupError):
+    """No recording answers a replayed pipe call"""
+
+    transient = False
+
+
+class ReplayedFailure(RuntimeError):
+    """A recorded pipe failure, raised again on replay"""
+
+    def __init__(self, message: str, transient: bool):
+        super().__init__(message)
+        self.transient = transient
+
+
+def cassette_settings() -> Dict[str, Any]:
+    """[cassette] section, with ADFLOW_CASSETTE / ADFLOW_CASSETTE_LATENCY_SCALE overrides"""
+    section = get_section("cassette")
+    return {
+        "path": Path(os.getenv("ADFLOW_CASSETTE") or section.get("path") or DEFAULT_CASSETTE),
+        "latency_scale": float(os.getenv("ADFLOW_CASSETTE_LATENCY_SCALE") or section.get("latency_scale", 1.0)),
+        "strict": bool(section.get("strict", False))
+    }
+
+
+def plain_data(value: Any) -> Any:
+    """Pipe inputs/outputs as JSON data (Stuff objects reduce to their content)"""
+    if hasattr(value, "stuff_code") and hasattr(value, "content"):
+        return plain_data(value.content)
+    if isinstance(value, TextContent):
+        return value.text
+    if hasattr(value, "model_dump"):
+        try:
+            return value.model_dump(mode="json")
+        except TypeError:
+            return plain_data(value.model_dump())
+    if isinstance(value, dict):
+        return {str(key): plain_data(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain_data(item) for item in value]
+    return value
+
+
+def inputs_key(data: Any) -> str:
+    """Fingerprint of a pipe call's inputs (as plain_data)"""
+    return hashlib.sha256(canonical_json(data).encode("utf-8")).hexdigest()
+
+
+def summarize(value: Any) -> Any:
+    """Readable excerpt of pipe inputs (data URIs and long text are cut)"""
+    if isinstance(value, str):
+        return value if len(value) <= SUMMARY_CHARS else f"{value[:SUMMARY_CHARS]}... ({len(value)} chars)"
+    if isinstance(value, dict):
+        return {key: summarize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [summarize(item) for item in value]
+    return value
+
+
+def encode_output(content: Any) -> Dict[str, Any]:
+    """Main stuff content of a pipe output as cassette data"""
+    if isinstance(content, TextContent):
+        return {"text": content.text}
+    return {"fields": plain_data(content)}
+
+
+def decode_output(data: Dict[str, Any]) -> Any:
+    """Main stuff content rebuilt from cassette data"""
+    if "text" in data:
+        return TextContent(text=data["text"])
+    fields = data.get("fields")
+    return StubContent(**fields) if isinstance(fields, dict) else TextContent(text=str(fields))
+
+
+def read_cassette(path: Path) -> List[Dict[str, Any]]:
+    """Recordings in a cassette, oldest first (a torn last line is skipped)"""
+    opener = gzip.open if path.suffix == ".gz" else open
+    recordings = []
+    try:
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    recordings.append(json.loads(line))
+                except ValueError:
+                    continue
+    except EOFError:
+        # Recording still in progress: the last gzip member is incomplete
+        pass
+    return recordings
+
+
+class CassetteRecorder:
+    """Wraps a pipe executor, appending every call to a cassette"""
+
+    def __init__(self, execute: Callable[[str, Dict[str, Any]], Awaitable[Any]], path: Path):
+        """
+        Args:
+            execute: The real pipe executor (pipe_code, inputs) -> pipe output
+            path: Cassette file; a .gz suffix compresses each recording
+        """
+        self.execute = execute
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    @classmethod
+    def from_settings(cls, execute: Callable[[str, Dict[str, Any]], Awaitable[Any]]) -> "CassetteRecorder":
+        return cls(execute, cassette_settings()["path"])
+
+    async def __call__(self, pipe_code: str, inputs: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            pipe_output = await self.execute(pipe_code, inputs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._record(pipe_code, inputs, started, error={
+                "type": type(e).__name__,
+                "message": str(e),
+                "transient": is_transient(e)
+            })
+            raise
+        await self._record(pipe_code, inputs, started, output=encode_output(pipe_output.main_stuff.content))
+        return pipe_output
+
+    async def _record(
+        self,
+        pipe_code: str,
+        inputs: Dict[str, Any],
+        started: float,
+        output: Optional[Dict[str, Any]] = None,
+        error: Optional[Dict[str, Any]] = None
+    ) -> None:
+        latency = time.perf_counter() - started
+        data = plain_data(inputs)
+        recording = {
+            "pipe": pipe_code,
+            "key": inputs_key(data),
+            "inputs": summarize(data),
+            "latency": round(latency, 4),
+            "recorded_at": time.time()
+        }
+        if error is not None:
+            recording["error"] = error
+        else:
+            recording["output"] = output
+        line = (json.dumps(recording, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: bytes) -> None:
+        """Append one recording in a single write, so concurrent workers do not interleave"""
+        payload = gzip.compress(line) if self.path.suffix == ".gz" else line
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, payload)
+            finally:
+                os.close(fd)
+            self.recorded += 1
+
+
+class CassetteReplayer:
+    """Answers pipe calls from a cassette, with the recorded latencies"""
+
+    def __init__(self, recordings: List[Dict[str, Any]], latency_scale: float = 1.0, strict: bool = False):
+        """
+        Args:
+            recordings: Cassette contents (see read_cassette)
+            latency_scale: Multiplier on recorded latencies (0 answers at once)
+            strict: Only answer calls whose exact inputs were recorded
+        """
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.by_key: Dict[tuple, List[Dict[str, Any]]] = {}
+        self.by_pipe: Dict[str, List[Dict[str, Any]]] = {}
+        for recording in recordings:
+            self.by_key.setdefault((recording["pipe"], recording["key"]), []).append(recording)
+            self.by_pipe.setdefault(recording["pipe"], []).append(recording)
+        self._turns: Dict[Any, int] = {}
+
+        self.calls = 0
+        self.exact = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls) -> "CassetteReplayer":
+        """
+        Load the cassette named by [cassette] path (or ADFLOW_CASSETTE)
+
+        Raises:
+            ValueError: If the cassette is missing or empty
+        """
+        settings = cassette_settings()
+        path = settings["path"]
+        if not path.exists():
+            raise ValueError(f"No cassette at {path}: record one with ADFLOW_INFERENCE_BACKEND=record")
+        recordings = read_cassette(path)
+        if not recordings:
+            raise ValueError(f"Cassette {path} has no recordings")
+        return cls(recordings, latency_scale=settings["latency_scale"], strict=settings["strict"])
+
+    def _next(self, turn_key: Any, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Recordings for the same call are played in the order they were recorded"""
+        turn = self._turns.get(turn_key, 0)
+        self._turns[turn_key] = turn + 1
+        return candidates[turn % len(candidates)]
+
+    def find(self, pipe_code: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Recording that answers a pipe call
+
+        Raises:
+            CassetteMiss: If nothing was recorded for the call (or, when strict, for its inputs)
+        """
+        key = (pipe_code, inputs_key(plain_data(inputs)))
+        if key in self.by_key:
+            self.exact += 1
+            return self._next(key, self.by_key[key])
+        if not self.strict:
+            # Model-routed variants fall back to their stage's recordings
+            for code in (pipe_code, pipe_code.partition(VARIANT_SEPARATOR)[0]):
+                if code in self.by_pipe:
+                    return self._next(code, self.by_pipe[code])
+        self.misses += 1
+        raise CassetteMiss(f"No recording of pipe {pipe_code} for these inputs")
+
+    async def __call__(self, pipe_code: str, inputs: Dict[str, Any]) -> StubPipeOutput:
+        """
+        Replay a pipe call after its recorded latency
+
+        Raises:
+            CassetteMiss: If the cassette cannot answer the call
+            ReplayedFailure: If the recorded call failed
+        """
+        self.calls += 1
+        recording = self.find(pipe_code, inputs)
+        await asyncio.sleep(recording.get("latency", 0.0) * self.latency_scale)
+        error = recording.get("error")
+        if error is not None:
+            raise ReplayedFailure(f"{error['type']}: {error['message']}", bool(error.get("transient")))
+        return StubPipeOutput(decode_output(recording["output"]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recordings": sum(len(recordings) for recordings in self.by_pipe.values()),
+            "pipes": sorted(self.by_pipe),
+            "calls": self.calls,
+            "exact": self.exact,
+            "misses": self.misses
+        }
@@ -0,0 +1,279 @@
+"""
+AdFlow AI - Generation History
+SQLite index of generated ads, listed newest first with keyset pagination
+
+Each successful generation adds one compact index row (id, product name,
+thumbnail URL, created_at, size) plus its full result in a side table, so
+listing or searching a page of history is one indexed query and never
+touches the stored results.
+
+Product names are searched through an FTS5 trigram index, which finds any
+substring of 3 or more characters without scanning the table. Shorter
+queries, and SQLite builds without FTS5, fall back to a LIKE scan.
+"""
+
+import base64
+import binascii
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .settings import DATA_DIR, get_section
+except ImportError:
+    from settings import DATA_DIR, get_section
+
+SUMMARY_COLUMNS = "id, product_name, thumbnail_url, created_at, size"
+
+# Shortest query the trigram index can answer
+MIN_INDEXED_QUERY = 3
+
+# Trigram index of product names, kept in step with generations by triggers
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS generations_fts USING fts5("
+    "search_name, content='generations', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_insert AFTER INSERT ON generations BEGIN "
+    "INSERT INTO generations_fts (rowid, search_name) VALUES (new.rowid, new.search_name); END",
+    "CREATE TRIGGER IF NOT EXISTS generations_fts_delete AFTER DELETE ON generations BEGIN "
+    "INSERT INTO generations_fts (generations_fts, rowid, search_name) "
+    "VALUES ('delete', old.rowid, old.search_name); END",
+)
+
+
+def encode_cursor(created_at: float, generation_id: str) -> str:
+    """Opaque cursor pointing just after a row"""
+    return base64.urlsafe_b64encode(f"{created_at!r}|{generation_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """
+    Position encoded by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, _, generation_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").partition("|")
+        return float(created_at), generation_id
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid history cursor: {cursor}")
+
+
+def thumbnail_for(image_url: Optional[str]) -> Optional[str]:
+    """
+    URL the history list can show
+
+    Only http(s) URLs and "/public" paths; data URIs are too big to list and
+    "upload:" / "sha256:" references cannot be displayed.
+    """
+    if not image_url or not image_url.startswith(("http://", "https://", "/")):
+        return None
+    return image_url
+
+
+class HistoryStore:
+    """
+    SQLite-backed list of generated ads
+
+    Every method blocks on SQLite (up to its 5 s busy timeout when another
+    process writes), so async code runs them with asyncio.to_thread.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        enabled: bool = True,
+        default_page_size: int = 20,
+        max_page_size: int = 100
+    ):
+        """
+        Args:
+            db_path: SQLite file holding the history
+            enabled: When False nothing is recorded and lists are empty
+            default_page_size: Rows per page when the caller does not say
+            max_page_size: Largest page a caller may ask for
+        """
+        self.db_path = Path(db_path)
+        self.enabled = enabled
+        self.default_page_size = default_page_size
+        self.max_page_size = max_page_size
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.full_text = False
+
+    @classmethod
+    def from_settings(cls) -> "HistoryStore":
+        """Build the store from the [history] section of pipelex_config.toml"""
+        section = get_section("history")
+        return cls(
+            db_path=DATA_DIR / "history.sqlite3",
+            enabled=bool(section.get("enabled", True)),
+            default_page_size=int(section.get("default_page_size", 20)),
+            max_page_size=int(section.get("max_page_size", 100))
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the database lazily"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "id TEXT PRIMARY KEY, product_name TEXT NOT NULL, search_name TEXT NOT NULL, "
+                "thumbnail_url TEXT, created_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS generations_newest ON generations (created_at DESC, id DESC)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_results (id TEXT PRIMARY KEY, result TEXT NOT NULL)"
+            )
+            self._conn.commit()
+            self.full_text = self._create_full_text_index(self._conn)
+        return self._conn
+
+    @staticmethod
+    def _create_full_text_index(db: sqlite3.Connection) -> bool:
+        """Add the trigram index (filling it from existing rows); False if SQLite lacks FTS5"""
+        try:
+            with db:
+                existed = db.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'generations_fts'"
+                ).fetchone() is not None
+                for statement in FTS_SCHEMA:
+                    db.execute(statement)
+                if not existed:
+                    db.execute("INSERT INTO generations_fts (generations_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def record(
+        self,
+        product_info: Dict[str, Any],
+        image_url: Optional[str],
+        result: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Add a successful generation
+
+        Args:
+            product_info: Product the ad was generated for
+            image_url: Image reference the caller passed in
+            result: The generation result to keep
+
+        Returns:
+            Id of the new history entry (None when history is disabled)
+        """
+        if not self.enabled:
+            return None
+
+        generation_id = f"ad_{uuid.uuid4().hex[:16]}"
+        product_name = str((product_info or {}).get("name") or "Unknown Product")
+        payload = json.dumps(result, default=str)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                f"INSERT INTO generations ({SUMMARY_COLUMNS}, search_name) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    generation_id,
+                    product_name,
+                    thumbnail_for(image_url),
+                    time.time(),
+                    len(payload),
+                    product_name.lower()
+                )
+            )
+            db.execute("INSERT INTO generation_results (id, result) VALUES (?, ?)", (generation_id, payload))
+            db.commit()
+        return generation_id
+
+    def list(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        query: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of history, newest first
+
+        Args:
+            limit: Rows per page (capped by max_page_size)
+            cursor: next_cursor of the previous page
+            query: Only products whose name contains this text (case-insensitive;
+                queries under MIN_INDEXED_QUERY characters scan the table)
+
+        Returns:
+            {"items": [...], "next_cursor": str or None}
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        if not self.enabled:
+            return {"items": [], "next_cursor": None}
+
+        limit = max(1, min(limit or self.default_page_size, self.max_page_size))
+        clauses: List[str] = []
+        params: List[Any] = []
+        if cursor:
+            created_at, generation_id = decode_cursor(cursor)
+            clauses.append("(created_at < ? OR (created_at = ? AND id < ?))")
+            params += [created_at, created_at, generation_id]
+        query = (query or "").strip().lower()
+        with self._lock:
+            db = self._db()
+            if query and self.full_text and len(query) >= MIN_INDEXED_QUERY:
+                clauses.append("rowid IN (SELECT rowid FROM generations_fts WHERE generations_fts MATCH ?)")
+                params.append('"' + query.replace('"', '""') + '"')
+            elif query:
+                pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                clauses.append("search_name LIKE ? ESCAPE '\\'")
+                params.append(f"%{pattern}%")
+
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            rows = db.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM generations {where} "
+                f"ORDER BY created_at DESC, id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+
+        items = [
+            {
+                "id": row[0],
+                "productName": row[1],
+                "imageUrl": row[2],
+                "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(row[3])),
+                "size": row[4]
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = encode_cursor(rows[limit - 1][3], rows[limit - 1][0]) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def get(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        """Stored result of one generation (None if unknown)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._db().execute(
+                "SELECT result FROM generation_results WHERE id = ?", (generation_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def delete(self, generation_id: str) -> bool:
+        """Remove one generation; False if it did not exist"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            db = self._db()
+            deleted = db.execute("DELETE FROM generations WHERE id = ?", (generation_id,)).rowcount
+            db.execute("DELETE FROM generation_results WHERE id = ?", (generation_id,))
+            db.commit()
+        return deleted > 0
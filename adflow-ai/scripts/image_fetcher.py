@@ -0,0 +1,342 @@
+"""
+AdFlow AI - Remote Image Fetcher
+Downloads http(s) product images over a shared connection pool
+
+Downloads are bounded in size and time, and kept in an on-disk cache keyed
+by URL. A cached copy is served without any request while it is fresh, and
+revalidated with If-None-Match / If-Modified-Since afterwards, so a
+re-analyzed product image costs at most a 304 instead of a full download.
+
+Only public hosts are fetched (see url_guard): every URL, including each
+redirect target, is checked before it is requested.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+try:
+    from .metrics import REGISTRY
+    from .settings import DATA_DIR, get_section
+    from .single_flight import SingleFlight
+    from .url_guard import MAX_REDIRECTS, check_public_url
+except ImportError:
+    from metrics import REGISTRY
+    from settings import DATA_DIR, get_section
+    from single_flight import SingleFlight
+    from url_guard import MAX_REDIRECTS, check_public_url
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FETCHES = REGISTRY.counter(
+    "adflow_image_fetches_total",
+    "Remote image lookups by outcome (fresh, revalidated, downloaded, error)",
+    ["result"]
+)
+IMAGE_FETCH_BYTES = REGISTRY.counter(
+    "adflow_image_fetch_bytes_total",
+    "Bytes downloaded for remote images",
+    []
+)
+
+# Bytes read per chunk while streaming a download
+CHUNK_SIZE = 64 * 1024
+
+
+def cache_max_age(cache_control: Optional[str]) -> Optional[float]:
+    """
+    Freshness lifetime from a Cache-Control header
+
+    Returns:
+        max-age in seconds, 0 for no-cache/no-store, None when not stated
+    """
+    if not cache_control:
+        return None
+    directives = cache_control.lower()
+    if "no-store" in directives or "no-cache" in directives:
+        return 0.0
+    match = re.search(r"max-age=(\d+)", directives)
+    return float(match.group(1)) if match else None
+
+
+class ImageFetcher:
+    """Pooled async downloader with an ETag/Last-Modified revalidating disk cache"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        timeout: float = 30.0,
+        max_bytes: int = 25 * 1024 * 1024,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        fresh_seconds: float = 300.0,
+        max_cache_bytes: int = 512 * 1024 * 1024
+    ):
+        """
+        Args:
+            cache_dir: Directory of the disk cache (None disables it)
+            timeout: Connect/read timeout in seconds
+            max_bytes: Largest image downloaded
+            max_connections: Connections open at once across all hosts
+            max_keepalive: Idle connections kept for reuse
+            fresh_seconds: Seconds a cached copy is served without revalidation
+                when the server does not send Cache-Control max-age
+            max_cache_bytes: Disk cache size; least recently used files go first
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.fresh_seconds = fresh_seconds
+        self.max_cache_bytes = max_cache_bytes
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flights = SingleFlight("image_fetch")
+        self._evict_lock = threading.Lock()
+
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.errors = 0
+
+    @classmethod
+    def from_settings(cls) -> "ImageFetcher":
+        """Build the fetcher from the [image_ingestion] section of pipelex_config.toml"""
+        section = get_section("image_ingestion")
+        return cls(
+            cache_dir=DATA_DIR / "image_fetch" if section.get("fetch_cache", True) else None,
+            timeout=float(section.get("fetch_timeout", 30.0)),
+            max_bytes=int(section.get("max_source_mb", 25)) * 1024 * 1024,
+            max_connections=int(section.get("fetch_max_connections", 20)),
+            max_keepalive=int(section.get("fetch_max_keepalive", 10)),
+            fresh_seconds=float(section.get("fetch_fresh_seconds", 300)),
+            max_cache_bytes=int(section.get("fetch_cache_mb", 512)) * 1024 * 1024
+        )
+
+    async def _http(self) -> httpx.AsyncClient:
+        """Shared client, recreated (and the old one closed) if the event loop has changed"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            if self._client is not None:
+                try:
+                    await self._client.aclose()
+                except Exception as e:
+                    # Its connections belong to the old, possibly closed, loop
+                    logger.debug(f"Could not close the previous HTTP client: {e}")
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive
+                ),
+                # Redirects are followed in _fetch, checking each target
+                follow_redirects=False
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, url: str) -> bytes:
+        """
+        Get the bytes of a remote image
+
+        Concurrent fetches of the same URL share one download.
+
+        Args:
+            url: http(s) URL
+
+        Returns:
+            The image bytes
+
+        Raises:
+            ValueError: If the download fails or exceeds max_bytes
+            UnsafeURL: If the URL, or a redirect, leads to a non-public host
+        """
+        data, _ = await self._flights.do(url, lambda: self._fetch(url))
+        return data
+
+    async def _fetch(self, url: str) -> bytes:
+        entry = await asyncio.to_thread(self._read_cache, url)
+        if entry is not None and time.time() < entry["fresh_until"]:
+            self.fresh_hits += 1
+            IMAGE_FETCHES.inc(result="fresh")
+            await asyncio.to_thread(self._touch, url)
+            return entry["data"]
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            target = url
+            for _ in range(MAX_REDIRECTS + 1):
+                await check_public_url(target)
+                client = await self._http()
+                async with client.stream("GET", target, headers=headers) as response:
+                    if response.next_request is not None:
+                        target = str(response.next_request.url)
+                        continue
+                    if response.status_code == 304 and entry is not None:
+                        self.revalidated += 1
+                        IMAGE_FETCHES.inc(result="revalidated")
+                        await asyncio.to_thread(self._store_meta, url, entry, response.headers)
+                        return entry["data"]
+                    response.raise_for_status()
+                    data = await self._read_body(url, response)
+                    break
+            else:
+                raise ValueError(f"Could not fetch image {url}: more than {MAX_REDIRECTS} redirects")
+        except httpx.HTTPError as e:
+            self.errors += 1
+            IMAGE_FETCHES.inc(result="error")
+            raise ValueError(f"Could not fetch image {url}: {e}")
+        except ValueError:
+            self.errors += 1
+            IMAGE_FETCHES.inc(result="error")
+            raise
+
+        self.downloads += 1
+        IMAGE_FETCHES.inc(result="downloaded")
+        IMAGE_FETCH_BYTES.inc(len(data))
+        await asyncio.to_thread(self._write_cache, url, data, response.headers)
+        return data
+
+    async def _read_body(self, url: str, response: httpx.Response) -> bytes:
+        """Stream the body, refusing anything over max_bytes"""
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise ValueError(f"Remote image larger than {self.max_bytes} bytes: {url}")
+
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise ValueError(f"Remote image larger than {self.max_bytes} bytes: {url}")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    # Disk cache: <sha256(url)>.bin holds the bytes, <sha256(url)>.json the validators
+
+    def _paths(self, url: str):
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{name}.bin", self.cache_dir / f"{name}.json"
+
+    def _read_cache(self, url: str) -> Optional[Dict[str, Any]]:
+        if self.cache_dir is None:
+            return None
+        data_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            data = data_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or len(data) != meta.get("size"):
+            return None
+        return {**meta, "data": data}
+
+    def _fresh_until(self, headers: httpx.Headers) -> float:
+        max_age = cache_max_age(headers.get("cache-control"))
+        return time.time() + (self.fresh_seconds if max_age is None else max_age)
+
+    def _write_cache(self, url: str, data: bytes, headers: httpx.Headers) -> None:
+        if self.cache_dir is None or "no-store" in headers.get("cache-control", "").lower():
+            return
+        data_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "size": len(data),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "fresh_until": self._fresh_until(headers)
+        }
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename so readers never see a partial file
+            for path, content in ((data_path, data), (meta_path, json.dumps(meta).encode("utf-8"))):
+                tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache image {url}: {e}")
+            return
+        self._evict()
+
+    def _store_meta(self, url: str, entry: Dict[str, Any], headers: httpx.Headers) -> None:
+        """Extend a revalidated entry's freshness (and pick up new validators)"""
+        meta = {key: value for key, value in entry.items() if key != "data"}
+        meta["etag"] = headers.get("etag") or meta.get("etag")
+        meta["last_modified"] = headers.get("last-modified") or meta.get("last_modified")
+        meta["fresh_until"] = self._fresh_until(headers)
+        _, meta_path = self._paths(url)
+        tmp_path = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+            os.replace(tmp_path, meta_path)
+        except OSError as e:
+            logger.warning(f"Could not update cached image {url}: {e}")
+        self._touch(url)
+
+    def _touch(self, url: str) -> None:
+        """Mark an entry as recently used for eviction"""
+        data_path, _ = self._paths(url)
+        try:
+            os.utime(data_path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Delete least recently used entries beyond max_cache_bytes"""
+        with self._evict_lock:
+            try:
+                files = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".bin")]
+            except OSError:
+                return
+            stats = []
+            for entry in files:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Evicted meanwhile by a sibling worker
+                    continue
+                stats.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in stats)
+            for _, size, path in sorted(stats):
+                if total <= self.max_cache_bytes:
+                    break
+                for victim in (path, path[:-len(".bin")] + ".json"):
+                    try:
+                        os.remove(victim)
+                    except OSError:
+                        pass
+                total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Fetch counters for monitoring"""
+        return {
+            "fresh_hits": self.fresh_hits,
+            "revalidated": self.revalidated,
+            "downloads": self.downloads,
+            "errors": self.errors,
+            "in_flight": self._flights.in_flight,
+            "disk_cache": self.cache_dir is not None
+        }
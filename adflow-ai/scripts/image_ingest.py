@@ -0,0 +1,304 @@
+"""
+AdFlow AI - Image Ingestion
+Single path from an image reference (local path, data URI, http(s) URL or
+"upload:<sha256>" from UploadStore) to the data URI sent to the vision model
+
+Images are bounded in resolution and re-encoded before base64 encoding,
+and the encoded result is cached by content hash so the same upload is
+only processed once per process. Remote images come from ImageFetcher and
+then take the same path as local files.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: images are then sent as-is
+    Image = None
+    ImageOps = None
+
+try:
+    from .image_fetcher import ImageFetcher
+    from .near_duplicates import dhash
+    from .settings import PROJECT_ROOT, get_section
+    from .upload_store import UPLOAD_DIR, image_mime_type, upload_path
+except ImportError:
+    from image_fetcher import ImageFetcher
+    from near_duplicates import dhash
+    from settings import PROJECT_ROOT, get_section
+    from upload_store import UPLOAD_DIR, image_mime_type, upload_path
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+# Pillow format name -> MIME type of the re-encoded image
+OUTPUT_FORMATS = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png'
+}
+
+
+@dataclass
+class IngestedImage:
+    """An image ready to be sent to the model"""
+
+    url: str            # data URI passed to ImageContent
+    content_hash: str   # sha256 of the original image bytes
+    mime_type: str
+    source: str         # reference the caller passed in
+    original_bytes: int
+    encoded_bytes: int
+    phash: Optional[int] = None     # perceptual hash (None if the image was not decoded or is flat)
+
+    @property
+    def reference(self) -> str:
+        """
+        Short way to refer to the image in responses
+
+        The caller's path or URL, or "sha256:<hash>" for inline data URIs,
+        which would otherwise be echoed back in full.
+        """
+        if self.source.startswith('data:'):
+            return f"sha256:{self.content_hash}"
+        return self.source
+
+
+def is_remote_url(image_url: str) -> bool:
+    return image_url.startswith(('http://', 'https://'))
+
+
+def sniff_mime_type(data: bytes, fallback: str = 'image/jpeg') -> str:
+    """Guess the MIME type from the file signature"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return fallback
+
+
+class ImageIngestor:
+    """Resolves, downscales, re-encodes and caches product images"""
+
+    def __init__(
+        self,
+        project_root: Path = PROJECT_ROOT,
+        max_dimension: int = 1568,
+        output_format: str = 'JPEG',
+        quality: int = 85,
+        cache_entries: int = 64,
+        fetch_timeout: float = 30.0,
+        max_source_bytes: int = 25 * 1024 * 1024,
+        fetcher: Optional[ImageFetcher] = None,
+        upload_dir: Path = UPLOAD_DIR
+    ):
+        """
+        Args:
+            project_root: Root used to resolve "/..." paths into public/
+            max_dimension: Longest edge in pixels after downscaling
+            output_format: Pillow format for re-encoding (JPEG, WEBP or PNG)
+            quality: Encoder quality for lossy formats
+            cache_entries: Number of encoded images kept in memory
+            fetch_timeout: Timeout in seconds for remote images
+            max_source_bytes: Largest source image accepted
+            fetcher: Downloader for http(s) images (default: pooled, no disk cache)
+            upload_dir: Where "upload:<sha256>" references are stored
+        """
+        self.project_root = Path(project_root)
+        self.max_dimension = max_dimension
+        self.output_format = output_format.upper()
+        self.quality = quality
+        self.cache_entries = cache_entries
+        self.fetch_timeout = fetch_timeout
+        self.max_source_bytes = max_source_bytes
+        self.fetcher = fetcher or ImageFetcher(timeout=fetch_timeout, max_bytes=max_source_bytes)
+        self.upload_dir = Path(upload_dir)
+
+        self._cache: "OrderedDict[str, Tuple[str, str, int, Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_settings(cls) -> "ImageIngestor":
+        """Build the ingestor from the [image_ingestion] section of pipelex_config.toml"""
+        section = get_section("image_ingestion")
+        return cls(
+            max_dimension=int(section.get("max_dimension", 1568)),
+            output_format=str(section.get("output_format", "JPEG")),
+            quality=int(section.get("quality", 85)),
+            cache_entries=int(section.get("cache_entries", 64)),
+            fetch_timeout=float(section.get("fetch_timeout", 30.0)),
+            max_source_bytes=int(section.get("max_source_mb", 25)) * 1024 * 1024,
+            fetcher=ImageFetcher.from_settings()
+        )
+
+    def resolve_path(self, image_url: str) -> Path:
+        """
+        Map a local reference to a file under public/ or the upload directory
+
+        "/x.jpg" lives under public/; other paths are taken relative to the
+        project root.
+
+        Raises:
+            ValueError: If the path leads anywhere else
+        """
+        uploaded = upload_path(self.upload_dir, image_url)
+        if uploaded is not None:
+            return uploaded
+        public_dir = (self.project_root / "public").resolve()
+        if image_url.startswith('/'):
+            candidate = public_dir / image_url.lstrip('/')
+            if not candidate.exists() and Path(image_url).exists():
+                candidate = Path(image_url)
+        else:
+            candidate = self.project_root / image_url
+        resolved = candidate.resolve()
+        if not any(resolved.is_relative_to(root) for root in (public_dir, self.upload_dir.resolve())):
+            raise ValueError(f"Image path is outside public/ and the upload directory: {image_url}")
+        return resolved
+
+    async def ingest(self, image_url: str) -> IngestedImage:
+        """
+        Turn any supported image reference into a compact data URI
+
+        Args:
+            image_url: Path under public/ (or "/public-relative"), data URI, http(s) URL
+                or "upload:<sha256>"
+
+        Returns:
+            IngestedImage with the data URI and the content hash of the source
+
+        Raises:
+            ValueError: If the image cannot be found or read, is not an image or is too large
+        """
+        data, mime_type = await self._load(image_url)
+        if len(data) > self.max_source_bytes:
+            raise ValueError(
+                f"Image is {len(data)} bytes, larger than the {self.max_source_bytes} byte limit"
+            )
+
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            cached = self._cache.get(content_hash)
+            if cached is not None:
+                self._cache.move_to_end(content_hash)
+                self.cache_hits += 1
+        if cached is None:
+            encoded, encoded_mime, phash = await asyncio.to_thread(self._encode, data, mime_type)
+            cached = (
+                f"data:{encoded_mime};base64,{base64.b64encode(encoded).decode('ascii')}",
+                encoded_mime,
+                len(encoded),
+                phash
+            )
+            with self._lock:
+                self.cache_misses += 1
+                self._cache[content_hash] = cached
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+
+        data_uri, encoded_mime, encoded_size, phash = cached
+        return IngestedImage(
+            url=data_uri,
+            content_hash=content_hash,
+            mime_type=encoded_mime,
+            source=image_url,
+            original_bytes=len(data),
+            encoded_bytes=encoded_size,
+            phash=phash
+        )
+
+    async def _load(self, image_url: str) -> Tuple[bytes, str]:
+        """Read the raw bytes and best-guess MIME type of the source image"""
+        if image_url.startswith('data:'):
+            header, _, payload = image_url.partition(',')
+            try:
+                data = base64.b64decode(payload, validate=False)
+            except (binascii.Error, ValueError) as e:
+                raise ValueError(f"Invalid image data URI: {e}")
+            declared = header[5:].split(';')[0] or 'image/jpeg'
+            return data, sniff_mime_type(data, declared)
+
+        if is_remote_url(image_url):
+            data = await self.fetcher.fetch(image_url)
+            mime_type = image_mime_type(data[:16])
+            if mime_type is None:
+                raise ValueError(f"Not a JPEG, PNG, GIF or WEBP image: {image_url}")
+            return data, mime_type
+
+        image_path = self.resolve_path(image_url)
+        if not image_path.is_file():
+            raise ValueError(f"Image not found: {image_url}")
+        data = await asyncio.to_thread(image_path.read_bytes)
+        mime_type = image_mime_type(data[:16])
+        if mime_type is None:
+            raise ValueError(f"Not a JPEG, PNG, GIF or WEBP image: {image_url}")
+        return data, mime_type
+
+    def _encode(self, data: bytes, mime_type: str) -> Tuple[bytes, str, Optional[int]]:
+        """
+        Downscale and re-encode an image, and take its perceptual hash
+
+        Falls back to the original bytes when Pillow is unavailable, the
+        image cannot be decoded, or re-encoding would not make it smaller.
+        """
+        if Image is None:
+            return data, mime_type, None
+
+        try:
+            with Image.open(io.BytesIO(data)) as source:
+                image = ImageOps.exif_transpose(source)
+                resized = max(image.size) > self.max_dimension
+                if resized:
+                    image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+                phash = dhash(image)
+
+                output_format = self.output_format if self.output_format in OUTPUT_FORMATS else 'JPEG'
+                if output_format == 'JPEG' and image.mode != 'RGB':
+                    # JPEG has no alpha channel: flatten onto white
+                    rgba = image.convert('RGBA')
+                    image = Image.new('RGB', rgba.size, (255, 255, 255))
+                    image.paste(rgba, mask=rgba.split()[-1])
+
+                buffer = io.BytesIO()
+                save_options: Dict[str, Any] = {'optimize': True}
+                if output_format in ('JPEG', 'WEBP'):
+                    save_options['quality'] = self.quality
+                image.save(buffer, format=output_format, **save_options)
+                encoded = buffer.getvalue()
+        except Exception:
+            return data, mime_type, None
+
+        if not resized and len(encoded) >= len(data) and mime_type in MIME_TYPES.values():
+            return data, mime_type, phash
+        return encoded, OUTPUT_FORMATS[output_format], phash
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_entries": len(self._cache),
+            "pillow_available": Image is not None,
+            "remote": self.fetcher.stats()
+        }
@@ -0,0 +1,41 @@
+"""
+AdFlow AI - JSON Encoding
+Serializes responses once, with orjson when it is installed
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is optional: the standard library encoder is used instead
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """
+    Compact UTF-8 JSON for a response
+
+    Values JSON cannot represent are written as their str().
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=str, option=ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits: let the standard library handle them
+            pass
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(value: Any) -> str:
+    """dumps_bytes() as text, for line-oriented output"""
+    return dumps_bytes(value).decode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from bytes or text"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,222 @@
+"""
+AdFlow AI - Metrics
+Minimal in-process metrics registry rendered in the Prometheus text format
+
+Counters and histograms are kept per process (each uvicorn worker exposes
+its own numbers). Gauges are read from callbacks at scrape time.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache hits to multi-minute video renders
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative histogram with labels"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        lines = []
+        bounds = [f'le="{bound:g}"' for bound in self.buckets] + ['le="+Inf"']
+        for key, series in items:
+            for bound, count in zip(bounds, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, bound)} {count:g}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]:g}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose labelled values are read from a callback at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[LabelValues, float]],
+        kind: str = "gauge"
+    ):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value:g}"
+            for key, value in sorted(self.callback().items())
+        ]
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them for scraping"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        # Registering a name twice returns the existing metric
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[LabelValues, float]],
+        kind: str = "gauge"
+    ) -> CallbackMetric:
+        """Expose values owned elsewhere (queue depths, cache hit counts)"""
+        metric = CallbackMetric(name, help_text, labelnames, callback, kind)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "adflow_stage_duration_seconds",
+    "Latency of each pipeline stage (image ingestion, individual pipes, video generation)",
+    ["stage"]
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "adflow_stage_errors_total",
+    "Failed pipeline stages by error type",
+    ["stage", "error_type"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "adflow_llm_tokens_total",
+    "LLM tokens reported by Pipelex per stage, model and token category",
+    ["stage", "model", "category"]
+)
+CANCELLED_WORK = REGISTRY.counter(
+    "adflow_cancelled_stages_total",
+    "Pipeline stages aborted before finishing, by reason (deadline, cancelled)",
+    ["stage", "reason"]
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "adflow_http_request_duration_seconds",
+    "End-to-end API request latency",
+    ["method", "route", "status"]
+)
+
+
+@contextmanager
+def observe_stage(stage: str, timings: Optional[Dict[str, int]] = None) -> Iterator[None]:
+    """
+    Time a pipeline stage
+
+    Records the latency histogram and, on failure, the error counter. When a
+    timings dict is given, the elapsed milliseconds are also stored in it so
+    they can be returned with the response.
+
+    Args:
+        stage: Stage name, e.g. "analyze_product" or "image_ingest"
+        timings: Per-request timing breakdown to fill in
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        STAGE_ERRORS.inc(stage=stage, error_type=type(e).__name__)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = int(elapsed * 1000)
@@ -0,0 +1,231 @@
+"""
+AdFlow AI - Model Router
+Picks the model for each pipeline stage so a request's latency budget is met
+
+Every PipeLLM stage normally runs on the model declared in its bundle. The
+router keeps a moving average of recent latency per stage and model; when
+the remaining budget cannot absorb the primary model's expected latency for
+the stages left, stages listed in fallback_stages run on the fast model
+instead. Fast-model runs use a copy of the pipe registered in the Pipelex
+library under a derived pipe code.
+
+A primary model that is never chosen is never observed again, so its
+average would stay at its slowest. Once probe_interval seconds pass
+without a sample, the next request that would fall back runs the primary
+model instead, and its latency updates the average.
+"""
+
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from pipelex.hub import get_pipe_library
+
+try:
+    from .settings import get_section
+except ImportError:
+    from settings import get_section
+
+logger = logging.getLogger(__name__)
+
+# Separates a stage's pipe code from the model in a routed variant's pipe code
+VARIANT_SEPARATOR = "__"
+
+
+def variant_pipe_code(pipe_code: str, model: str) -> str:
+    """Pipe code of `pipe_code` running on `model`, e.g. generate_copy__gpt_4o_mini"""
+    return f"{pipe_code}{VARIANT_SEPARATOR}{re.sub(r'[^a-z0-9]+', '_', model.lower()).strip('_')}"
+
+
+def pipe_model(pipe: Any) -> Optional[str]:
+    """Model handle declared by a PipeLLM or PipeImgGen (None for other pipes)"""
+    llm_choices = getattr(pipe, "llm_choices", None)
+    choice = getattr(llm_choices, "for_text", None) or getattr(pipe, "img_gen", None)
+    if choice is None:
+        return None
+    return choice if isinstance(choice, str) else getattr(choice, "model", None)
+
+
+class ModelRouter:
+    """Latency-aware choice between each stage's primary model and the fast model"""
+
+    def __init__(
+        self,
+        fast_model: str,
+        fallback_stages: Sequence[str],
+        enabled: bool = True,
+        latency_alpha: float = 0.3,
+        initial_latency: float = 5.0,
+        fast_speedup: float = 2.0,
+        probe_interval: float = 60.0
+    ):
+        """
+        Args:
+            fast_model: Model handle used when a stage falls back
+            fallback_stages: Pipe codes allowed to run on the fast model
+            enabled: Route at all (False always uses the primary model)
+            latency_alpha: Weight of the newest sample in the latency averages
+            initial_latency: Seconds assumed for a stage/model never observed
+            fast_speedup: Assumed primary/fast latency ratio until the fast model is observed
+            probe_interval: Seconds without a sample after which one request probes
+                the primary model despite the budget (0 = never probe)
+        """
+        self.fast_model = fast_model
+        self.fallback_stages = set(fallback_stages)
+        self.enabled = enabled
+        self.latency_alpha = latency_alpha
+        self.initial_latency = initial_latency
+        self.fast_speedup = fast_speedup
+        self.probe_interval = probe_interval
+
+        self._latency: Dict[Tuple[str, str], float] = {}
+        self._samples: Dict[Tuple[str, str], int] = {}
+        # time.monotonic() of the last sample (or probe) per stage and model
+        self._observed_at: Dict[Tuple[str, str], float] = {}
+        self._variants: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+        self.probes = 0
+
+    @classmethod
+    def from_settings(cls) -> "ModelRouter":
+        """Build the router from [model_routing] (fast model from [models] fast_model)"""
+        section = get_section("model_routing")
+        return cls(
+            fast_model=section.get("fast_model") or get_section("models").get("fast_model", "gpt-4o-mini"),
+            fallback_stages=list(section.get("fallback_stages", ["generate_copy", "create_video_prompt"])),
+            enabled=bool(section.get("enabled", True)),
+            latency_alpha=float(section.get("latency_alpha", 0.3)),
+            initial_latency=float(section.get("initial_latency", 5.0)),
+            fast_speedup=float(section.get("fast_speedup", 2.0)),
+            probe_interval=float(section.get("probe_interval", 60.0))
+        )
+
+    def primary_model(self, stage: str) -> Optional[str]:
+        """Model declared for a stage in its bundle"""
+        return pipe_model(get_pipe_library().get_optional_pipe(stage))
+
+    def estimate(self, stage: str, model: str) -> float:
+        """Expected latency in seconds of a stage on a model"""
+        with self._lock:
+            latency = self._latency.get((stage, model))
+            if latency is not None:
+                return latency
+            primary = self._latency.get((stage, self.primary_model(stage) or ""))
+        base = primary if primary is not None else self.initial_latency
+        return base / self.fast_speedup if model == self.fast_model else base
+
+    def observe(self, stage: str, model: str, seconds: float) -> None:
+        """Record a finished (or timed-out) stage run"""
+        key = (stage, model)
+        with self._lock:
+            previous = self._latency.get(key)
+            if previous is None:
+                self._latency[key] = seconds
+            else:
+                self._latency[key] = previous + self.latency_alpha * (seconds - previous)
+            self._samples[key] = self._samples.get(key, 0) + 1
+            self._observed_at[key] = time.monotonic()
+
+    def choose(
+        self,
+        stage: str,
+        remaining: Optional[float],
+        later_stages: Sequence[str] = ()
+    ) -> Optional[str]:
+        """
+        Pick the model for a stage
+
+        Args:
+            stage: Pipe code about to run
+            remaining: Seconds left in the request's budget (None = no deadline)
+            later_stages: Pipe codes that still run after this one
+
+        Returns:
+            Model handle, or None for pipes without a model
+        """
+        primary = self.primary_model(stage)
+        if primary is None or remaining is None or not self.enabled or stage not in self.fallback_stages:
+            return primary
+
+        # Later stages are counted at their cheapest allowed option
+        needed = self.estimate(stage, primary) + sum(
+            min(self.estimate(later, self.primary_model(later) or ""), self.estimate(later, self.fast_model))
+            if later in self.fallback_stages else self.estimate(later, self.primary_model(later) or "")
+            for later in later_stages
+        )
+        if needed <= remaining or self._probe_due(stage, primary):
+            return primary
+
+        self.fallbacks += 1
+        logger.info(f"Routing {stage} to {self.fast_model}: needs ~{needed:.1f}s, {remaining:.1f}s left")
+        return self.fast_model
+
+    def _probe_due(self, stage: str, model: str) -> bool:
+        """Claim the probe of a model not observed for probe_interval (one per interval)"""
+        if self.probe_interval <= 0:
+            return False
+        key = (stage, model)
+        now = time.monotonic()
+        with self._lock:
+            observed_at = self._observed_at.get(key)
+            if observed_at is not None and now - observed_at < self.probe_interval:
+                return False
+            self._observed_at[key] = now
+            self.probes += 1
+        logger.info(f"Probing {model} for {stage}: no latency sample for {self.probe_interval:.0f}s")
+        return True
+
+    def pipe_code_for(self, stage: str, model: Optional[str]) -> str:
+        """
+        Pipe code that runs `stage` on `model`
+
+        The variant copy is (re)registered whenever the stage's pipe was
+        reloaded since the copy was made.
+        """
+        library = get_pipe_library()
+        pipe = library.get_required_pipe(stage)
+        if model is None or model == pipe_model(pipe):
+            return stage
+
+        code = variant_pipe_code(stage, model)
+        with self._lock:
+            if self._variants.get(code) != id(pipe) or library.get_optional_pipe(code) is None:
+                library.remove_pipes_by_codes([code])
+                library.add_new_pipe(self._make_variant(pipe, code, model))
+                self._variants[code] = id(pipe)
+        return code
+
+    @staticmethod
+    def _make_variant(pipe: Any, code: str, model: str) -> Any:
+        """Copy of a PipeLLM with every LLM setting switched to `model`"""
+        def switch(choice: Any) -> Any:
+            if choice is None:
+                return None
+            return model if isinstance(choice, str) else choice.model_copy(update={"model": model})
+
+        llm_choices = pipe.llm_choices.model_copy(update={
+            "for_text": switch(pipe.llm_choices.for_text),
+            "for_object": switch(pipe.llm_choices.for_object)
+        })
+        return pipe.model_copy(update={"code": code, "llm_choices": llm_choices})
+
+    def stats(self) -> Dict[str, Any]:
+        """Latency averages per stage and model, plus the number of fallbacks and probes"""
+        with self._lock:
+            latency: Dict[str, Dict[str, Any]] = {}
+            for (stage, model), seconds in sorted(self._latency.items()):
+                latency.setdefault(stage, {})[model] = {
+                    "avg_seconds": round(seconds, 3),
+                    "samples": self._samples[(stage, model)]
+                }
+        return {
+            "enabled": self.enabled,
+            "fast_model": self.fast_model,
+            "fallback_stages": sorted(self.fallback_stages),
+            "fallbacks": self.fallbacks,
+            "probes": self.probes,
+            "latency": latency
+        }
@@ -0,0 +1,284 @@
+"""
+AdFlow AI - Near-Duplicate Images
+Perceptual hashes of analyzed product images, for reusing their analysis
+
+The same product photo often comes back resized, recompressed or lightly
+edited, which changes its bytes (and content hash) but hardly its look. A
+64-bit difference hash (dHash) of every analyzed image is kept with its
+ProductAnalysis in SQLite and, per process, in a multi-index hash table,
+so an incoming image is matched by Hamming distance against the few
+stored hashes that share a bit segment with it rather than all of them.
+An image within [near_duplicates] max_distance bits of one analyzed
+before reuses that analysis instead of running analyze_product.
+
+Flat and low-contrast images (blank uploads, solid fills, the 1x1 warm-up
+image) all hash to nearly the same value whatever they show, so they get
+no hash and are never indexed or matched.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional: images are then never hashed
+    Image = None
+
+try:
+    from .metrics import REGISTRY
+    from .settings import DATA_DIR, get_section
+except ImportError:
+    from metrics import REGISTRY
+    from settings import DATA_DIR, get_section
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_LOOKUPS = REGISTRY.counter(
+    "adflow_near_duplicate_lookups_total",
+    "Perceptual-hash lookups of a product analysis by outcome (hit, miss)",
+    ["result"]
+)
+
+# dHash grid: HASH_SIZE x HASH_SIZE comparisons of horizontally adjacent pixels
+HASH_SIZE = 8
+
+# Images whose reduced grayscale pixels span fewer levels than this are not hashed
+MIN_CONTRAST = 8
+
+# Hashes with fewer set (or unset) bits than this describe a flat or plain-gradient image
+MIN_HASH_BITS = 8
+
+
+def informative(value: Optional[int]) -> bool:
+    """Whether a hash tells images apart (see MIN_HASH_BITS)"""
+    return value is not None and MIN_HASH_BITS <= value.bit_count() <= 64 - MIN_HASH_BITS
+
+
+def dhash(image: Any) -> Optional[int]:
+    """
+    64-bit difference hash of a Pillow image
+
+    The image is reduced to 9x8 grayscale pixels and each bit records
+    whether a pixel is brighter than its right neighbour, which survives
+    scaling, recompression and small colour changes.
+
+    Returns:
+        The hash, or None for a flat or low-contrast image
+    """
+    # reducing_gap shrinks large images by box-averaging first: ~4x faster, same hash in practice
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS, reducing_gap=3.0)
+    # One byte per pixel in "L" mode
+    pixels = small.tobytes()
+    if max(pixels) - min(pixels) < MIN_CONTRAST:
+        return None
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value if informative(value) else None
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    """
+    Multi-index hashing of 64-bit hashes for radius-bounded Hamming search
+
+    Hashes are split into max_distance + 1 bit segments, each with its own
+    lookup table. Two hashes within max_distance bits differ in at most
+    max_distance segments, so they share at least one segment exactly: a
+    search only compares the query against hashes found under one of its
+    own segment values instead of every stored hash.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        segments = min(64, max_distance + 1)
+        width, extra = divmod(64, segments)
+        self._segments: List[Tuple[int, int]] = []
+        shift = 0
+        for index in range(segments):
+            bits = width + (1 if index < extra else 0)
+            self._segments.append((shift, (1 << bits) - 1))
+            shift += bits
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._segments]
+        self._hashes: Dict[int, int] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self._hashes)
+
+    def add(self, value: int, item_id: int) -> None:
+        self._hashes[item_id] = value
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            table.setdefault((value >> shift) & mask, []).append(item_id)
+
+    def search(self, value: int) -> List[Tuple[int, int]]:
+        """(distance, id) of every stored hash within max_distance, closest first"""
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            candidates.update(table.get((value >> shift) & mask, ()))
+        matches = []
+        for item_id in candidates:
+            distance = hamming_distance(value, self._hashes[item_id])
+            if distance <= self.max_distance:
+                matches.append((distance, item_id))
+        return sorted(matches)
+
+
+class AnalysisIndex:
+    """
+    Product analyses of earlier images, looked up by perceptual hash
+
+    find and add query SQLite; AdGenerator calls them from worker threads.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        enabled: bool = True,
+        max_distance: int = 6,
+        max_entries: int = 100000
+    ):
+        """
+        Args:
+            db_path: SQLite file holding the hashes and analyses
+            enabled: When False nothing is stored or reused
+            max_distance: Largest Hamming distance (of 64 bits) still counted as the same image
+            max_entries: Analyses kept; the oldest are dropped beyond this
+        """
+        self.db_path = Path(db_path)
+        self.enabled = enabled
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # One index per bundle hash: an analysis is only reused by the workflow that produced it
+        self._indexes: Dict[str, HashIndex] = {}
+        self._loaded_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    @classmethod
+    def from_settings(cls) -> "AnalysisIndex":
+        """Build the index from the [near_duplicates] section of pipelex_config.toml"""
+        section = get_section("near_duplicates")
+        return cls(
+            db_path=DATA_DIR / "analysis_index.sqlite3",
+            enabled=bool(section.get("enabled", True)),
+            max_distance=int(section.get("max_distance", 6)),
+            max_entries=int(section.get("max_entries", 100000))
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the database lazily"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, phash TEXT NOT NULL, bundle_hash TEXT NOT NULL, "
+                "content_hash TEXT NOT NULL, analysis TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _sync(self, db: sqlite3.Connection) -> None:
+        """Add rows written since the last sync (by this or a sibling worker) to the indexes"""
+        rows = db.execute(
+            "SELECT id, phash, bundle_hash FROM analyses WHERE id > ? ORDER BY id", (self._loaded_id,)
+        ).fetchall()
+        for row_id, phash, bundle_hash in rows:
+            self._loaded_id = row_id
+            if not informative(int(phash, 16)):
+                # Stored before degenerate hashes were rejected
+                continue
+            index = self._indexes.get(bundle_hash)
+            if index is None:
+                index = self._indexes[bundle_hash] = HashIndex(self.max_distance)
+            index.add(int(phash, 16), row_id)
+
+    def find(self, phash: Optional[int], bundle_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Analysis of the closest earlier image within max_distance
+
+        Args:
+            phash: dHash of the incoming image (None when it could not be decoded or is flat)
+            bundle_hash: sha256 of the workflow bundle that would analyze it
+
+        Returns:
+            {"analysis", "distance", "content_hash"} or None if no image is close enough
+        """
+        if not self.enabled or not informative(phash):
+            return None
+        with self._lock:
+            db = self._db()
+            self._sync(db)
+            index = self._indexes.get(bundle_hash)
+            row = None
+            distance = 0
+            for distance, row_id in index.search(phash) if index else []:
+                row = db.execute("SELECT content_hash, analysis FROM analyses WHERE id = ?", (row_id,)).fetchone()
+                if row is not None:
+                    break
+        if row is None:
+            self.misses += 1
+            NEAR_DUPLICATE_LOOKUPS.inc(result="miss")
+            return None
+        self.hits += 1
+        NEAR_DUPLICATE_LOOKUPS.inc(result="hit")
+        return {"analysis": json.loads(row[1]), "distance": distance, "content_hash": row[0]}
+
+    def add(self, phash: Optional[int], bundle_hash: str, content_hash: str, analysis: Dict[str, Any]) -> None:
+        """Keep the analysis of a newly analyzed image"""
+        if not self.enabled or not informative(phash) or not analysis:
+            return
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO analyses (phash, bundle_hash, content_hash, analysis, created_at) VALUES (?, ?, ?, ?, ?)",
+                (f"{phash:016x}", bundle_hash, content_hash, json.dumps(analysis, default=str), time.time())
+            )
+            db.commit()
+            self.stored += 1
+            self._sync(db)
+            if self.stored % 1000 == 0:
+                self._prune(db)
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        """Drop the oldest analyses beyond max_entries and rebuild the indexes"""
+        (count,) = db.execute("SELECT COUNT(*) FROM analyses").fetchone()
+        if count <= self.max_entries:
+            return
+        db.execute(
+            "DELETE FROM analyses WHERE id IN (SELECT id FROM analyses ORDER BY id LIMIT ?)",
+            (count - self.max_entries,)
+        )
+        db.commit()
+        logger.info(f"Dropped {count - self.max_entries} old product analyses from the near-duplicate index")
+        self._indexes = {}
+        self._loaded_id = 0
+        self._sync(db)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_distance": self.max_distance,
+            "indexed": sum(index.size for index in self._indexes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored
+        }
@@ -0,0 +1,105 @@
+"""
+AdFlow AI - Pipelex Runtime
+Initializes Pipelex once per process, on first use, and times cold start
+
+Importing the AdFlow modules no longer initializes Pipelex, so a process can
+parse and validate its arguments (and reject a bad request) before paying
+for it. The Pipelex packages themselves are imported, and timed as
+"import_pipelex", by the first import of ad_generator. The first caller that needs the Pipelex library runs Pipelex.make();
+concurrent callers wait for that one initialization.
+
+Pipelex reads its configuration relative to the working directory, so
+entry points call enter_project_root() at process start: the directory
+never changes under requests already running.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    from .settings import PROJECT_ROOT
+except ImportError:
+    from settings import PROJECT_ROOT
+
+# Milliseconds spent per startup phase (imports, Pipelex initialization, warm-up)
+STARTUP_TIMINGS: Dict[str, int] = {}
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def record_phase(name: str, started: float, finished: Optional[float] = None) -> None:
+    """Record a startup phase between time.perf_counter() values `started` and `finished` (default: now)"""
+    STARTUP_TIMINGS[name] = int(((time.perf_counter() if finished is None else finished) - started) * 1000)
+
+
+def configure_pipelex_logging() -> None:
+    """Send Pipelex loggers to stderr so they never interfere with JSON output on stdout"""
+    for logger_name in ['pipelex', 'pipelex.pipeline', 'pipelex.core']:
+        logger = logging.getLogger(logger_name)
+        logger.setLevel(logging.WARNING)
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setLevel(logging.WARNING)
+        logger.addHandler(handler)
+
+
+def enter_project_root() -> None:
+    """Make the project root the working directory (call once, at process start)"""
+    os.chdir(PROJECT_ROOT)
+
+
+def ensure_pipelex() -> None:
+    """
+    Initialize Pipelex unless this process already has
+
+    Thread-safe: concurrent callers block until the single initialization
+    finishes. Loads the libraries listed in .pipelex/config.toml.
+
+    Raises:
+        RuntimeError: If the working directory is not the project root
+    """
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        # Pipelex finds .pipelex/config.toml relative to the working directory
+        if Path.cwd().resolve() != Path(PROJECT_ROOT).resolve():
+            raise RuntimeError(
+                f"Pipelex needs {PROJECT_ROOT} as working directory: call enter_project_root() at process start"
+            )
+
+        # Timed with make(): the Pipelex class pulls in its own modules on top of import_pipelex
+        started = time.perf_counter()
+        from pipelex.pipelex import Pipelex
+        configure_pipelex_logging()
+        Pipelex.make()
+        record_phase("pipelex_init", started)
+        _initialized = True
+
+
+async def ensure_pipelex_async() -> None:
+    """ensure_pipelex() without blocking the event loop during initialization"""
+    if not _initialized:
+        await asyncio.to_thread(ensure_pipelex)
+
+
+def is_initialized() -> bool:
+    return _initialized
+
+
+def startup_report() -> Dict[str, Any]:
+    """Cold-start timings of this process for monitoring"""
+    return {
+        "pipelex_initialized": _initialized,
+        "phases_ms": dict(STARTUP_TIMINGS)
+    }
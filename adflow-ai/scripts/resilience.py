@@ -0,0 +1,281 @@
+"""
+AdFlow AI - Resilience
+Retries transient pipe failures with jittered backoff, behind a per-model
+circuit breaker
+
+A failure is transient when the provider may well succeed on the next try
+(connection errors, timeouts, 429 and 5xx responses). Those are retried up
+to [optimization] max_retries times, sleeping a random delay of up to
+retry_delay * 2**attempt (capped by max_retry_delay) between attempts so
+that callers failing together do not retry together. Anything else fails
+at once.
+
+Consecutive transient failures of one model open its circuit: calls then
+fail immediately with CircuitOpen instead of waiting out the provider's
+timeouts. After circuit_reset_timeout one probe call is let through; its
+success closes the circuit again, its failure keeps it open.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+try:
+    from .metrics import REGISTRY
+    from .settings import get_section
+except ImportError:
+    from metrics import REGISTRY
+    from settings import get_section
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PIPE_RETRIES = REGISTRY.counter(
+    "adflow_pipe_retries_total",
+    "Pipe calls retried after a transient failure, by stage",
+    ["stage"]
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    "adflow_circuit_rejections_total",
+    "Pipe calls failed fast because the model's circuit was open",
+    ["model"]
+)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+TRANSIENT_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+# Provider SDK exceptions (matched by name, so no SDK has to be imported) that are transient
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "OverloadedError",
+    "ConnectError",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "RemoteProtocolError",
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """A model's circuit is open: the call was not attempted"""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"{model} is failing, not calling it for another {retry_after:.0f}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+def error_chain(error: BaseException) -> Iterator[BaseException]:
+    """The error and the errors it was raised from (Pipelex wraps SDK errors)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether retrying the call that raised `error` may succeed
+
+    An exception can decide for itself with a boolean `transient` attribute;
+    otherwise an HTTP status_code, the exception type or its name decides.
+    """
+    for cause in error_chain(error):
+        marked = getattr(cause, "transient", None)
+        if isinstance(marked, bool):
+            return marked
+        status = getattr(cause, "status_code", None)
+        if isinstance(status, int):
+            return status in TRANSIENT_STATUSES
+        if isinstance(cause, (ConnectionError, TimeoutError)):
+            return True
+        if type(cause).__name__ in TRANSIENT_ERROR_NAMES:
+            return True
+    return False
+
+
+class CircuitBreaker:
+    """Closed / open / half-open state of one model"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Model the breaker guards (used in errors and metrics)
+            failure_threshold: Consecutive transient failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe call
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.times_opened = 0
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            CircuitOpen: If the circuit is open, or half-open with a probe already running
+        """
+        if self.state == OPEN:
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                CIRCUIT_REJECTIONS.inc(model=self.name)
+                raise CircuitOpen(self.name, self.reset_timeout - waited)
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == HALF_OPEN:
+            if self.probing:
+                CIRCUIT_REJECTIONS.inc(model=self.name)
+                raise CircuitOpen(self.name, self.reset_timeout)
+            self.probing = True
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"Circuit for {self.name} closed: probe succeeded")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.probing = False
+
+    def record_failure(self, transient: bool) -> None:
+        """Count a failed call; only transient failures say anything about upstream health"""
+        was_probe = self.state == HALF_OPEN and self.probing
+        self.probing = False
+        if not transient:
+            if was_probe:
+                # The upstream answered: let the next call probe again
+                self.state = HALF_OPEN
+            return
+        self.consecutive_failures += 1
+        if was_probe or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+                logger.warning(
+                    f"Circuit for {self.name} opened after {self.consecutive_failures} transient failures"
+                )
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """A call was cancelled before it finished: free the probe slot"""
+        self.probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened
+        }
+
+
+class Resilience:
+    """Retry policy plus one circuit breaker per model"""
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Args:
+            max_retries: Retries of a transient failure (0 disables retrying)
+            retry_delay: Base backoff in seconds; attempt n waits up to retry_delay * 2**n
+            max_retry_delay: Upper bound of a single backoff
+            failure_threshold: Consecutive transient failures that open a model's circuit
+            reset_timeout: Seconds a circuit stays open before a probe call
+            rng: Random source for the jitter
+        """
+        self.max_retries = max(0, max_retries)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.rng = rng or random.Random()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+        self.retries = 0
+
+    @classmethod
+    def from_settings(cls) -> "Resilience":
+        """Build from the [optimization] section of pipelex_config.toml"""
+        section = get_section("optimization")
+        return cls(
+            max_retries=int(section.get("max_retries", 3)),
+            retry_delay=float(section.get("retry_delay", 1.0)),
+            max_retry_delay=float(section.get("max_retry_delay", 10.0)),
+            failure_threshold=int(section.get("circuit_failure_threshold", 5)),
+            reset_timeout=float(section.get("circuit_reset_timeout", 30.0))
+        )
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self.breakers.get(model)
+        if breaker is None:
+            breaker = self.breakers[model] = CircuitBreaker(model, self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt` (0-based)"""
+        return self.rng.uniform(0, min(self.max_retry_delay, self.retry_delay * 2 ** attempt))
+
+    async def call(self, model: str, stage: str, attempt_call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `attempt_call`, retrying transient failures
+
+        Args:
+            model: Circuit the call belongs to (model handle, or pipe code)
+            stage: Stage name for logs and metrics
+            attempt_call: Makes one attempt; called again for every retry
+
+        Returns:
+            The result of the first successful attempt
+
+        Raises:
+            CircuitOpen: If the model's circuit is open
+            Exception: The last error, once it is permanent or retries are exhausted
+        """
+        breaker = self.breaker(model)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                result = await attempt_call()
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                transient = is_transient(e)
+                breaker.record_failure(transient)
+                if not transient or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self.retries += 1
+                PIPE_RETRIES.inc(stage=stage)
+                logger.warning(f"{stage} on {model} failed ({e}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "circuits": {model: breaker.stats() for model, breaker in sorted(self.breakers.items())}
+        }
@@ -0,0 +1,185 @@
+"""
+AdFlow AI - Result Cache
+Content-addressed cache for generated ad content
+
+Two tiers: an in-memory LRU for the hot set and a SQLite file shared by
+every process on the box. Entries expire after the configured TTL.
+
+The disk tier runs in worker threads: a write lock held by a sibling
+process can then stall that one lookup (for up to the 5 s busy timeout),
+not every request on the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    from .settings import DATA_DIR, get_section
+except ImportError:
+    from settings import DATA_DIR, get_section
+
+# Expired disk rows are purged once every this many writes
+PURGE_EVERY_WRITES = 100
+
+
+def make_cache_key(*parts: str) -> str:
+    """Combine content hashes / identifiers into one cache key"""
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + SQLite) cache with TTL eviction"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        ttl: float = 3600,
+        max_memory_entries: int = 256,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            db_path: SQLite file for the disk tier
+            ttl: Seconds an entry stays valid
+            max_memory_entries: Size of the in-memory LRU tier
+            enabled: When False every lookup misses and nothing is stored
+        """
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.enabled = enabled
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # Memory tier only, never held during disk I/O
+        self._lock = threading.Lock()
+        # The SQLite connection, used from worker threads
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls) -> "ResultCache":
+        """Build the cache from the [optimization] section of pipelex_config.toml"""
+        optimization = get_section("optimization")
+        return cls(
+            db_path=DATA_DIR / "result_cache.sqlite3",
+            ttl=float(optimization.get("cache_ttl", 3600)),
+            enabled=bool(optimization.get("enable_caching", True))
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the disk tier lazily"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            The cached value, or None on a miss or expired entry
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        row = await asyncio.to_thread(self._read_disk, key)
+        with self._lock:
+            if row is not None and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+            self.misses += 1
+            return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a result in both tiers
+
+        Args:
+            key: Cache key from make_cache_key
+            value: JSON-serializable result
+        """
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        await asyncio.to_thread(self._write_disk, key, json.dumps(value), expires_at)
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        with self._db_lock:
+            return self._db().execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _write_disk(self, key: str, value: str, expires_at: float) -> None:
+        with self._db_lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY_WRITES == 0:
+                db.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+
+    def _remember(self, key: str, expires_at: float, value: Dict[str, Any]) -> None:
+        """Insert into the memory tier, evicting the least recently used entry"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "ttl": self.ttl
+        }
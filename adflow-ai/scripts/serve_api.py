@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+AdFlow AI - API Server
+Runs railway_api.py under uvicorn with one worker process per CPU core
+
+    python scripts/serve_api.py
+
+Each worker imports the app, initializes Pipelex and warms up on its own;
+/readyz answers 200 only once all of them are warm. This supervisor does not
+import the app itself, so it starts instantly and holds no Pipelex state.
+"""
+
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import uvicorn
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.settings import get_section  # noqa: E402
+from scripts.worker_readiness import prune_stale_servers  # noqa: E402
+
+
+def worker_count() -> int:
+    """WEB_CONCURRENCY, else [server] workers, else one per CPU core"""
+    configured = os.getenv("WEB_CONCURRENCY") or get_section("server").get("workers", 0)
+    return max(1, int(configured) or os.cpu_count() or 1)
+
+
+def main() -> None:
+    workers = worker_count()
+    # Readiness markers of earlier runs whose workers are all gone
+    prune_stale_servers()
+    # Read by scripts/worker_readiness.py in every worker
+    os.environ["ADFLOW_WORKERS"] = str(workers)
+    os.environ["ADFLOW_SERVER_ID"] = uuid.uuid4().hex
+
+    uvicorn.run(
+        "railway_api:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+        workers=workers,
+        log_level="info",
+        # Let in-flight requests finish when a rollout stops this instance
+        timeout_graceful_shutdown=30
+    )
+
+
+if __name__ == "__main__":
+    main()
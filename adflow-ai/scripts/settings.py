@@ -0,0 +1,43 @@
+"""
+AdFlow AI - Settings
+Reads the AdFlow sections of pipelex/pipelex_config.toml
+"""
+
+import os
+import tomllib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CONFIG_PATH = PROJECT_ROOT / "pipelex" / "pipelex_config.toml"
+
+# Local state (caches, stores) lives here unless ADFLOW_DATA_DIR overrides it
+DATA_DIR = Path(os.getenv("ADFLOW_DATA_DIR", PROJECT_ROOT / ".cache"))
+
+
+@lru_cache(maxsize=1)
+def load_config() -> Dict[str, Any]:
+    """
+    Load pipelex_config.toml once per process
+
+    Returns:
+        Parsed configuration, or an empty dict if the file is missing
+    """
+    if not CONFIG_PATH.exists():
+        return {}
+    with open(CONFIG_PATH, 'rb') as f:
+        return tomllib.load(f)
+
+
+def get_section(name: str) -> Dict[str, Any]:
+    """
+    Get one top-level section of the configuration
+
+    Args:
+        name: Section name, e.g. "optimization"
+
+    Returns:
+        The section's key/value pairs (empty if the section is absent)
+    """
+    return dict(load_config().get(name, {}))
@@ -0,0 +1,110 @@
+"""
+AdFlow AI - Single-Flight
+Coalesces identical in-flight requests onto one running pipeline
+
+The first caller for a key starts the work; callers arriving while it runs
+await the same task and get the same result. The work is only cancelled
+once every caller waiting on it has gone away.
+"""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "adflow_single_flight_calls_total",
+    "Calls that started work (leader) or attached to identical in-flight work (coalesced)",
+    ["operation", "role"]
+)
+
+
+def canonical_json(value: Any) -> str:
+    """Stable JSON form of request inputs: sorted keys, trimmed strings"""
+    def normalize(item: Any) -> Any:
+        if isinstance(item, str):
+            return item.strip()
+        if isinstance(item, dict):
+            return {str(key): normalize(val) for key, val in item.items()}
+        if isinstance(item, (list, tuple)):
+            return [normalize(val) for val in item]
+        return item
+
+    return json.dumps(normalize(value), sort_keys=True, separators=(",", ":"), default=str)
+
+
+class _Flight:
+    """One running call and the number of callers waiting on it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Per-operation registry of in-flight calls keyed by normalized inputs"""
+
+    def __init__(self, operation: str):
+        """
+        Args:
+            operation: Name used in metrics, e.g. "generate_complete_ad"
+        """
+        self.operation = operation
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run `work` once per key at a time
+
+        Args:
+            key: Normalized request key
+            work: Coroutine factory started by the first caller
+
+        Returns:
+            (result, coalesced) where coalesced is True for callers that
+            attached to work started by another caller
+        """
+        flight = self._flights.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(work()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        SINGLE_FLIGHT_CALLS.inc(operation=self.operation, role="coalesced" if coalesced else "leader")
+
+        flight.waiters += 1
+        try:
+            # Shielded so one caller going away does not cancel the others' result
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting for the result any more
+                flight.task.cancel()
+            raise
+        flight.waiters -= 1
+        return result, coalesced
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
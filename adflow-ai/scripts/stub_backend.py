@@ -0,0 +1,205 @@
+"""
+AdFlow AI - Stub Inference Backend
+Offline stand-in for execute_pipeline used by load tests and benchmarks
+
+Each pipe answers with canned content of the right shape after a sampled
+latency, and fails at a configured rate, so the API, queues and caches can
+be exercised at any concurrency without calling Blackbox AI.
+"""
+
+import asyncio
+import json
+import math
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from pipelex.core.stuffs.text_content import TextContent
+
+try:
+    from .model_router import VARIANT_SEPARATOR
+    from .settings import get_section
+except ImportError:
+    from model_router import VARIANT_SEPARATOR
+    from settings import get_section
+
+# z-score of the 95th percentile of a standard normal distribution
+Z_95 = 1.6449
+
+PRODUCT_ANALYSIS = {
+    "product_type": "Wireless headphones",
+    "key_features": "Over-ear cushions, matte finish, folding hinges",
+    "target_audience": "Commuters and remote workers aged 25-40",
+    "use_case": "Focused listening on the go",
+    "selling_points": "Noise cancelling, all-day comfort, 30h battery",
+    "brand_vibe": "tech",
+    "dominant_colors": "black, silver",
+    "style_aesthetic": "Minimal studio product shot"
+}
+
+AD_COPY = {
+    "headline": "Shut out the noise and hear every detail of your day",
+    "tagline": "Your focus, amplified",
+    "body_text": "Premium sound meets all-day comfort. Thirty hours of battery keeps you going.",
+    "call_to_action": "Shop now",
+    "tone": "professional"
+}
+
+VIDEO_PROMPT = (
+    "Slow dolly shot around matte black headphones on a reflective surface, soft studio "
+    "lighting, the camera rises as the ear cups fold, 8 seconds, cinematic product ad."
+)
+
+VIDEO_URL = "https://example.com/stub/video.mp4"
+
+
+class StubFailure(RuntimeError):
+    """Injected failure of a stub pipe call"""
+
+    # Stands in for a provider outage, so it is retried like one
+    transient = True
+
+
+class StubContent:
+    """Structured pipe output: fields as attributes plus model_dump()"""
+
+    def __init__(self, **fields: Any):
+        self.__dict__.update(fields)
+
+    def model_dump(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+@dataclass
+class StubStuff:
+    content: Any
+
+
+class StubPipeOutput:
+    """The parts of a Pipelex PipeOutput that AdGenerator reads"""
+
+    def __init__(self, content: Any):
+        self.main_stuff = StubStuff(content)
+        self.pipeline_run_id = f"stub-{uuid.uuid4().hex}"
+
+    def main_stuff_as_dict(self) -> Any:
+        content = self.main_stuff.content
+        if isinstance(content, TextContent):
+            return content.text
+        return content.model_dump()
+
+
+# Canned main stuff content per pipe code
+STUB_OUTPUTS: Dict[str, Callable[[], Any]] = {
+    "analyze_product": lambda: StubContent(**PRODUCT_ANALYSIS),
+    "generate_copy": lambda: StubContent(**AD_COPY),
+    "create_video_prompt": lambda: TextContent(text=VIDEO_PROMPT),
+    "combine_ad_content": lambda: StubContent(
+        product_analysis=json.dumps(PRODUCT_ANALYSIS),
+        ad_copy=json.dumps(AD_COPY),
+        video_prompt=VIDEO_PROMPT
+    ),
+    "generate_ad_content": lambda: STUB_OUTPUTS["combine_ad_content"](),
+    "generate_video": lambda: StubContent(url=VIDEO_URL),
+    "analyze_product_image": lambda: StubContent(**PRODUCT_ANALYSIS),
+    "generate_single_tone_ad": lambda: StubContent(**AD_COPY),
+    "generate_ad_copy_variants": lambda: StubContent(variants=[AD_COPY])
+}
+
+
+@dataclass
+class StubPipeProfile:
+    """Latency distribution and failure rate of one pipe"""
+
+    latency_median: float   # seconds
+    latency_p95: float      # seconds
+    failure_rate: float = 0.0
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Draw a log-normal latency matching the median and p95"""
+        if self.latency_median <= 0:
+            return 0.0
+        sigma = max(0.0, math.log(max(self.latency_p95, self.latency_median) / self.latency_median) / Z_95)
+        return rng.lognormvariate(math.log(self.latency_median), sigma)
+
+
+class StubBackend:
+    """Drop-in replacement for execute_pipeline(pipe_code=..., inputs=...)"""
+
+    def __init__(
+        self,
+        profiles: Dict[str, StubPipeProfile],
+        default_profile: StubPipeProfile,
+        model_latency_factor: Optional[Dict[str, float]] = None,
+        latency_scale: float = 1.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            profiles: Profile per pipe code
+            default_profile: Profile of pipes missing from profiles
+            model_latency_factor: Latency multiplier of routed model variants, by model suffix
+            latency_scale: Multiplier applied to every sampled latency
+            seed: Random seed, for reproducible runs
+        """
+        self.profiles = profiles
+        self.default_profile = default_profile
+        self.model_latency_factor = model_latency_factor or {}
+        self.latency_scale = latency_scale
+        self._rng = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls, latency_scale: float = 1.0, seed: Optional[int] = None) -> "StubBackend":
+        """Build the backend from the [stub_backend.<pipe>] sections of pipelex_config.toml"""
+        section = dict(get_section("stub_backend"))
+        default = section.pop("default", {})
+        model_latency_factor = {
+            model: float(factor) for model, factor in section.pop("model_latency_factor", {}).items()
+        }
+        default_profile = StubPipeProfile(
+            latency_median=float(default.get("latency_median", 1.0)),
+            latency_p95=float(default.get("latency_p95", 3.0)),
+            failure_rate=float(default.get("failure_rate", 0.0))
+        )
+        profiles = {
+            pipe_code: StubPipeProfile(
+                latency_median=float(values.get("latency_median", default_profile.latency_median)),
+                latency_p95=float(values.get("latency_p95", default_profile.latency_p95)),
+                failure_rate=float(values.get("failure_rate", default_profile.failure_rate))
+            )
+            for pipe_code, values in section.items()
+        }
+        return cls(
+            profiles,
+            default_profile,
+            model_latency_factor=model_latency_factor,
+            latency_scale=latency_scale,
+            seed=seed
+        )
+
+    def profile(self, pipe_code: str) -> StubPipeProfile:
+        return self.profiles.get(pipe_code, self.default_profile)
+
+    async def __call__(self, pipe_code: str, inputs: Dict[str, Any]) -> StubPipeOutput:
+        """
+        Answer a pipe call after a sampled delay
+
+        Raises:
+            StubFailure: At the pipe's configured failure rate
+        """
+        # Model-routed variants (generate_copy__gpt_4o_mini) answer like their stage
+        stage, _, model = pipe_code.partition(VARIANT_SEPARATOR)
+        profile = self.profile(stage)
+        self.calls[pipe_code] = self.calls.get(pipe_code, 0) + 1
+
+        latency = profile.sample_latency(self._rng) * self.model_latency_factor.get(model, 1.0)
+        await asyncio.sleep(latency * self.latency_scale)
+        if self._rng.random() < profile.failure_rate:
+            self.failures[pipe_code] = self.failures.get(pipe_code, 0) + 1
+            raise StubFailure(f"Injected failure in stub pipe {pipe_code}")
+
+        factory = STUB_OUTPUTS.get(stage, lambda: TextContent(text=f"stub output of {pipe_code}"))
+        return StubPipeOutput(factory())
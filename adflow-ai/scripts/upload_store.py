@@ -0,0 +1,393 @@
+"""
+AdFlow AI - Image Uploads
+Streams uploaded image bodies to disk, hashing and size-checking each chunk
+
+An upload is never held in memory as a whole: each received chunk is
+hashed and appended to a temporary file, and a body over the size limit is
+refused as soon as it crosses it. The finished file is stored under its
+sha256 and referred to as "upload:<sha256>", which ImageIngestor accepts
+wherever an image_url is expected.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+try:
+    from .settings import DATA_DIR, get_section
+except ImportError:
+    from settings import DATA_DIR, get_section
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = DATA_DIR / "uploads"
+UPLOAD_PREFIX = "upload:"
+
+# Largest non-file form field accepted alongside an upload (e.g. product_info JSON)
+MAX_FIELD_BYTES = 64 * 1024
+
+# Limits on the rest of a multipart body: all parts other than the image together
+# (fields, part headers, files in other fields), and the number of parts
+MAX_FORM_BYTES = 256 * 1024
+MAX_FORM_PARTS = 32
+
+SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# Leading bytes of the image formats accepted for upload
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+
+class UploadRejected(Exception):
+    """An upload was refused; status_code is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class StoredUpload:
+    """An image upload saved on disk"""
+
+    reference: str      # "upload:<sha256>", usable as an image_url
+    path: Path
+    sha256: str
+    size: int
+    mime_type: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "image_url": self.reference,
+            "sha256": self.sha256,
+            "size": self.size,
+            "mime_type": self.mime_type
+        }
+
+
+def upload_path(upload_dir: Path, reference: str) -> Optional[Path]:
+    """File behind an "upload:<sha256>" reference (None if it is not one)"""
+    if not reference.startswith(UPLOAD_PREFIX):
+        return None
+    sha256 = reference[len(UPLOAD_PREFIX):]
+    if not SHA256_PATTERN.fullmatch(sha256):
+        return None
+    return Path(upload_dir) / sha256
+
+
+def image_mime_type(head: bytes) -> Optional[str]:
+    """MIME type from an image's leading bytes (None if not a supported image)"""
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+class UploadWriter:
+    """One upload being spooled to a temporary file"""
+
+    def __init__(self, upload_dir: Path, max_bytes: int):
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self._hash = hashlib.sha256()
+        handle, name = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+        self._file = os.fdopen(handle, "wb")
+        self._tmp_path = Path(name)
+
+    def write(self, chunk: bytes) -> None:
+        """
+        Append one chunk
+
+        Raises:
+            UploadRejected: (413) As soon as the upload exceeds max_bytes
+        """
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejected(f"Upload larger than {self.max_bytes} bytes", status_code=413)
+        if len(self.head) < 16:
+            self.head += chunk[:16 - len(self.head)]
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def finish(self) -> StoredUpload:
+        """
+        Move the complete upload to its content-addressed name
+
+        Raises:
+            UploadRejected: (400) If nothing was uploaded, (415) if it is not an image
+        """
+        self._file.close()
+        mime_type = image_mime_type(self.head)
+        if self.size == 0 or mime_type is None:
+            self.abort()
+            if self.size == 0:
+                raise UploadRejected("Empty upload")
+            raise UploadRejected("Upload is not a JPEG, PNG, GIF or WEBP image", status_code=415)
+
+        sha256 = self._hash.hexdigest()
+        path = self.upload_dir / sha256
+        # Same content uploaded before: keep one copy
+        os.replace(self._tmp_path, path)
+        return StoredUpload(
+            reference=f"{UPLOAD_PREFIX}{sha256}",
+            path=path,
+            sha256=sha256,
+            size=self.size,
+            mime_type=mime_type
+        )
+
+    def abort(self) -> None:
+        """Discard a partial or refused upload"""
+        self._file.close()
+        try:
+            self._tmp_path.unlink()
+        except OSError:
+            pass
+
+
+class UploadStore:
+    """Directory of uploaded images, written by streaming request bodies"""
+
+    def __init__(
+        self,
+        upload_dir: Path = UPLOAD_DIR,
+        max_bytes: int = 25 * 1024 * 1024,
+        max_age: float = 24 * 3600.0,
+        sweep_interval: float = 600.0
+    ):
+        """
+        Args:
+            upload_dir: Where uploads are stored
+            max_bytes: Largest upload accepted
+            max_age: Seconds an upload is kept after it was last written
+            sweep_interval: Minimum seconds between two sweeps of old uploads
+        """
+        self.upload_dir = Path(upload_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+
+        self._swept_at = 0.0
+        self._sweep_lock = threading.Lock()
+
+        self.uploads = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_settings(cls) -> "UploadStore":
+        """Build the store from the [uploads] section of pipelex_config.toml"""
+        section = get_section("uploads")
+        max_mb = section.get("max_upload_mb", get_section("image_ingestion").get("max_source_mb", 25))
+        return cls(
+            upload_dir=UPLOAD_DIR,
+            max_bytes=int(max_mb) * 1024 * 1024,
+            max_age=float(section.get("retention_hours", 24)) * 3600
+        )
+
+    def check_declared_size(self, content_length: Optional[str]) -> None:
+        """
+        Refuse a body whose Content-Length is already over the limit
+
+        Raises:
+            UploadRejected: (413) Before any of the body is read
+        """
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes + MAX_FORM_BYTES:
+            self.rejected += 1
+            raise UploadRejected(f"Upload larger than {self.max_bytes} bytes", status_code=413)
+
+    async def save_stream(self, chunks: AsyncIterator[bytes]) -> StoredUpload:
+        """
+        Store a raw image body
+
+        Args:
+            chunks: The request body as it arrives
+
+        Raises:
+            UploadRejected: If the body is too large, empty or not an image
+        """
+        writer = await asyncio.to_thread(UploadWriter, self.upload_dir, self.max_bytes)
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    await asyncio.to_thread(writer.write, chunk)
+            stored = await asyncio.to_thread(writer.finish)
+        except BaseException as e:
+            writer.abort()
+            if isinstance(e, UploadRejected):
+                self.rejected += 1
+            raise
+        self._stored()
+        return stored
+
+    async def save_multipart(
+        self,
+        content_type: str,
+        chunks: AsyncIterator[bytes],
+        file_field: str = "image"
+    ) -> Tuple[StoredUpload, Dict[str, str]]:
+        """
+        Store the image part of a multipart/form-data body
+
+        Parts are parsed as the body arrives; the file part is streamed to
+        disk and the other (small) fields are kept as text. Everything but
+        the image counts against MAX_FORM_BYTES and MAX_FORM_PARTS, so
+        extra parts cannot make a request unbounded.
+
+        Args:
+            content_type: The request's Content-Type header (carries the boundary)
+            chunks: The request body as it arrives
+            file_field: Name of the form field holding the image
+
+        Returns:
+            The stored image and the other form fields
+
+        Raises:
+            UploadRejected: If the body is malformed, too large, or has no image
+        """
+        _, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if not boundary:
+            self.rejected += 1
+            raise UploadRejected("multipart/form-data body without a boundary")
+
+        # The parser's callbacks only collect events; they are applied between chunks
+        events: List[Tuple[str, bytes, bool]] = []
+        header: Dict[str, bytes] = {"field": b"", "value": b""}
+        part_headers: Dict[bytes, bytes] = {}
+
+        def on_header_field(data: bytes, start: int, end: int) -> None:
+            header["field"] += data[start:end]
+
+        def on_header_value(data: bytes, start: int, end: int) -> None:
+            header["value"] += data[start:end]
+
+        def on_header_end() -> None:
+            part_headers[header["field"].lower()] = header["value"]
+            header["field"] = header["value"] = b""
+
+        def on_headers_finished() -> None:
+            _, disposition = parse_options_header(part_headers.get(b"content-disposition", b""))
+            events.append(("part", disposition.get(b"name", b""), b"filename" in disposition))
+            part_headers.clear()
+
+        def on_part_data(data: bytes, start: int, end: int) -> None:
+            events.append(("data", data[start:end], False))
+
+        parser = MultipartParser(boundary, {
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+        })
+
+        writer: Optional[UploadWriter] = None
+        stored: Optional[StoredUpload] = None
+        fields: Dict[str, str] = {}
+        current: Optional[str] = None
+        skipping = False
+        field_value = bytearray()
+        parts = 0
+        body_bytes = 0
+        image_bytes = 0
+        try:
+            async for chunk in chunks:
+                body_bytes += len(chunk)
+                parser.write(chunk)
+                for kind, data, is_file in events:
+                    if kind == "part":
+                        parts += 1
+                        if parts > MAX_FORM_PARTS:
+                            raise UploadRejected(f"More than {MAX_FORM_PARTS} parts in the form", status_code=413)
+                        if current is not None and current != file_field and not skipping:
+                            fields[current] = field_value.decode("utf-8", errors="replace")
+                        current = data.decode("latin-1")
+                        # Files in other fields are not needed: drop them unread
+                        skipping = is_file and current != file_field
+                        field_value = bytearray()
+                        if current == file_field:
+                            if writer is not None:
+                                raise UploadRejected(f"More than one '{file_field}' part")
+                            writer = await asyncio.to_thread(UploadWriter, self.upload_dir, self.max_bytes)
+                    elif current == file_field:
+                        image_bytes += len(data)
+                        await asyncio.to_thread(writer.write, data)
+                    elif not skipping:
+                        field_value += data
+                        if len(field_value) > MAX_FIELD_BYTES:
+                            raise UploadRejected(f"Form field '{current}' is too large", status_code=413)
+                events.clear()
+                # Bytes outside the image part (headers, boundaries, other parts) are bounded as a whole
+                if body_bytes - image_bytes > MAX_FORM_BYTES:
+                    raise UploadRejected(
+                        f"Form data besides '{file_field}' larger than {MAX_FORM_BYTES} bytes", status_code=413
+                    )
+            parser.finalize()
+            if current is not None and current != file_field and not skipping:
+                fields[current] = field_value.decode("utf-8", errors="replace")
+            if writer is None:
+                raise UploadRejected(f"No '{file_field}' file in the form")
+            stored = await asyncio.to_thread(writer.finish)
+        except BaseException as e:
+            if writer is not None and stored is None:
+                writer.abort()
+            if isinstance(e, UploadRejected):
+                self.rejected += 1
+            elif isinstance(e, ValueError):
+                self.rejected += 1
+                raise UploadRejected(f"Malformed multipart body: {e}") from e
+            raise
+        self._stored()
+        return stored, fields
+
+    def _stored(self) -> None:
+        self.uploads += 1
+        if time.monotonic() - self._swept_at >= self.sweep_interval:
+            self._swept_at = time.monotonic()
+            threading.Thread(target=self.sweep, daemon=True).start()
+
+    def sweep(self) -> int:
+        """Delete uploads (and abandoned partial files) older than max_age"""
+        removed = 0
+        cutoff = time.time() - self.max_age
+        with self._sweep_lock:
+            try:
+                entries = list(os.scandir(self.upload_dir))
+            except OSError:
+                return 0
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        if removed:
+            logger.info(f"Removed {removed} expired uploads")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "uploads": self.uploads,
+            "rejected": self.rejected,
+            "max_bytes": self.max_bytes
+        }
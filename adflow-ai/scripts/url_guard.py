@@ -0,0 +1,59 @@
+"""
+AdFlow AI - Outbound URL Guard
+Keeps server-side requests to caller-supplied URLs on the public internet
+
+Image URLs and video webhooks come from API callers, and the server fetches
+or posts to them itself. Without a check any caller could reach loopback,
+private-network, link-local or cloud-metadata addresses through the server.
+A URL is only requested when it is http(s) and every address its host
+resolves to is globally routable; clients check again before each redirect.
+"""
+
+import asyncio
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+# Redirects followed for one outbound request
+MAX_REDIRECTS = 5
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class UnsafeURL(ValueError):
+    """A URL the server must not request"""
+
+
+def is_public_address(address: str) -> bool:
+    """Whether an IP address is globally routable (not private, loopback, link-local, ...)"""
+    try:
+        ip = ipaddress.ip_address(address.split("%")[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_public_url(url: str) -> None:
+    """
+    Refuse a URL that is not http(s) or whose host resolves to a non-public address
+
+    Raises:
+        UnsafeURL: If the URL must not be requested
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in DEFAULT_PORTS or not parts.hostname:
+        raise UnsafeURL(f"Only http(s) URLs are allowed: {url}")
+    try:
+        port = parts.port or DEFAULT_PORTS[parts.scheme]
+    except ValueError:
+        raise UnsafeURL(f"Invalid port in URL: {url}")
+
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise UnsafeURL(f"Cannot resolve host {parts.hostname}: {e}")
+    for *_, sockaddr in addresses:
+        if not is_public_address(sockaddr[0]):
+            raise UnsafeURL(f"Host {parts.hostname} resolves to a non-public address ({sockaddr[0]})")
@@ -0,0 +1,324 @@
+"""
+AdFlow AI - Video Jobs
+In-process job queue for Veo video generation
+
+Jobs are persisted in SQLite so queued and interrupted work is resumed
+after a restart. A semaphore bounds how many videos render at once.
+
+Several API worker processes can share the database: each job is owned by
+the worker that renders it, jobs of dead workers are claimed by the next
+worker to start, and a cancel handled by another worker is picked up by
+the owner while it renders.
+
+Webhooks are only delivered to public http(s) hosts (see url_guard): the
+URL is checked when the job is submitted and again before each delivery.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, Set, Tuple, Union
+
+import httpx
+
+try:
+    from .settings import DATA_DIR, get_section
+    from .url_guard import check_public_url
+    from .worker_readiness import pid_alive
+except ImportError:
+    from settings import DATA_DIR, get_section
+    from url_guard import check_public_url
+    from worker_readiness import pid_alive
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Timeout in seconds for delivering webhook callbacks
+WEBHOOK_TIMEOUT = 10
+
+
+class VideoJobQueue:
+    """Bounded, persistent queue of video generation jobs"""
+
+    def __init__(
+        self,
+        generator,
+        db_path: Path,
+        max_concurrent: int = 2,
+        cancel_poll_seconds: float = 2.0
+    ):
+        """
+        Args:
+            generator: AdGenerator used to render the videos
+            db_path: SQLite file holding job state
+            max_concurrent: Number of videos generated at the same time
+            cancel_poll_seconds: How often a rendering job checks whether
+                another worker cancelled it
+        """
+        self.generator = generator
+        self.db_path = Path(db_path)
+        self.max_concurrent = max_concurrent
+        self.cancel_poll_seconds = cancel_poll_seconds
+        self.pid = os.getpid()
+
+        # Binds to the running loop on first use, so it can be made before start()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._notifications: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS video_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, video_prompt TEXT NOT NULL, "
+            "webhook_url TEXT, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_video_jobs_status ON video_jobs (status)")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(video_jobs)")}
+        if "worker_pid" not in columns:
+            # Databases created before jobs had an owning worker
+            self._conn.execute("ALTER TABLE video_jobs ADD COLUMN worker_pid INTEGER")
+        self._conn.commit()
+
+    @classmethod
+    def from_settings(cls, generator) -> "VideoJobQueue":
+        """Build the queue from the [video_jobs] section of pipelex_config.toml"""
+        section = get_section("video_jobs")
+        return cls(
+            generator,
+            db_path=DATA_DIR / "video_jobs.sqlite3",
+            max_concurrent=int(section.get("max_concurrent", 2)),
+            cancel_poll_seconds=float(section.get("cancel_poll_seconds", 2.0))
+        )
+
+    async def start(self) -> None:
+        """Resume jobs that were queued or running when their worker stopped"""
+        with self._lock:
+            # IMMEDIATE takes the write lock, so two workers starting together
+            # cannot both claim the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, worker_pid FROM video_jobs WHERE status IN (?, ?) ORDER BY created_at",
+                    (QUEUED, RUNNING)
+                ).fetchall()
+                orphans = [
+                    row["id"] for row in rows
+                    if row["worker_pid"] is None or row["worker_pid"] == self.pid or not pid_alive(row["worker_pid"])
+                ]
+                self._conn.executemany(
+                    "UPDATE video_jobs SET status = ?, worker_pid = ?, updated_at = ? WHERE id = ?",
+                    [(QUEUED, self.pid, time.time(), job_id) for job_id in orphans]
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        for job_id in orphans:
+            self._schedule(job_id)
+        if orphans:
+            logger.info(f"Resumed {len(orphans)} video job(s)")
+
+    async def shutdown(self) -> None:
+        """
+        Stop running jobs without marking them cancelled
+
+        They stay queued/running in the database and are resumed by start().
+        Webhooks of jobs cancelled earlier are still delivered.
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *self._notifications, return_exceptions=True)
+
+    async def submit(self, video_prompt: str, webhook_url: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a new video job
+
+        Args:
+            video_prompt: Prompt passed to AdGenerator.generate_video
+            webhook_url: Optional URL that receives the finished job as a JSON POST
+
+        Returns:
+            The job record
+
+        Raises:
+            UnsafeURL: If the webhook URL is not http(s) or leads to a non-public host
+        """
+        if webhook_url:
+            await check_public_url(webhook_url)
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO video_jobs (id, status, video_prompt, webhook_url, created_at, updated_at, worker_pid) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, video_prompt, webhook_url, now, now, self.pid)
+            )
+            self._conn.commit()
+        self._schedule(job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if the id is unknown"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM video_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "video_prompt": row["video_prompt"],
+            "webhook_url": row["webhook_url"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a queued or running job
+
+        The job's webhook, if any, receives the cancelled job. A job that
+        finishes first keeps its state and result.
+
+        Returns:
+            The job record as it now stands, or None if the id is unknown
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] in FINISHED_STATES:
+            return job
+
+        # A job rendering in another worker sees this on its next poll
+        if not self._update(job_id, status=CANCELLED, expected=(QUEUED, RUNNING)):
+            # Finished between the read and the update
+            return self.get(job_id)
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        # Delivered in the background so the caller is not held by a slow webhook
+        notification = asyncio.create_task(self._notify(job_id))
+        self._notifications.add(notification)
+        notification.add_done_callback(self._notifications.discard)
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts by status plus the number of videos rendering right now"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM video_jobs GROUP BY status"
+            ).fetchall()
+        counts = {row["status"]: row["n"] for row in rows}
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active_tasks": len(self._tasks),
+            "jobs": counts
+        }
+
+    def _schedule(self, job_id: str) -> None:
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str) -> None:
+        """Render one job once a slot is free"""
+        try:
+            async with self._semaphore:
+                job = self.get(job_id)
+                if job is None or job["status"] != QUEUED:
+                    return
+                if not self._update(job_id, status=RUNNING, expected=QUEUED):
+                    return
+                result = await self._render(job_id, job["video_prompt"])
+                if result is None:
+                    return
+
+            # Unless it was cancelled meanwhile
+            if result["success"]:
+                self._update(job_id, status=SUCCEEDED, result=result["data"], expected=RUNNING)
+            else:
+                self._update(job_id, status=FAILED, error=result["error"], expected=RUNNING)
+        except asyncio.CancelledError:
+            # Either cancel() (which records the state) or shutdown()
+            raise
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=str(e), expected=(QUEUED, RUNNING))
+
+        await self._notify(job_id)
+
+    async def _render(self, job_id: str, video_prompt: str) -> Optional[Dict[str, Any]]:
+        """Generate the video, or return None if the job is cancelled from another worker"""
+        render = asyncio.ensure_future(self.generator.generate_video(video_prompt=video_prompt))
+        try:
+            while True:
+                done, _ = await asyncio.wait({render}, timeout=self.cancel_poll_seconds)
+                if done:
+                    return render.result()
+                job = self.get(job_id)
+                if job is None or job["status"] == CANCELLED:
+                    return None
+        finally:
+            if not render.done():
+                render.cancel()
+
+    def _update(
+        self,
+        job_id: str,
+        status: str,
+        result: Any = None,
+        error: Optional[str] = None,
+        expected: Union[str, Tuple[str, ...], None] = None
+    ) -> bool:
+        """
+        Set a job's state
+
+        Args:
+            expected: Only update if the job is currently in this state (or one of these states)
+
+        Returns:
+            Whether the job was updated
+        """
+        query = "UPDATE video_jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?"
+        params = [status, json.dumps(result) if result is not None else None, error, time.time(), job_id]
+        if expected is not None:
+            states = (expected,) if isinstance(expected, str) else tuple(expected)
+            query += f" AND status IN ({', '.join('?' * len(states))})"
+            params.extend(states)
+        with self._lock:
+            updated = self._conn.execute(query, params).rowcount
+            self._conn.commit()
+        return updated > 0
+
+    async def _notify(self, job_id: str) -> None:
+        """POST the finished job to its webhook, if any (best effort)"""
+        job = self.get(job_id)
+        if job is None or not job["webhook_url"]:
+            return
+        try:
+            # The host may resolve elsewhere by now
+            await check_public_url(job["webhook_url"])
+            # Redirects are not followed: their targets were never checked
+            async with httpx.AsyncClient(timeout=WEBHOOK_TIMEOUT, follow_redirects=False) as client:
+                response = await client.post(job["webhook_url"], json=job)
+                response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Webhook delivery failed for video job {job_id}: {e}")
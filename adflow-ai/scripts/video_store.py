@@ -0,0 +1,245 @@
+"""
+AdFlow AI - Video Artifact Store
+Keeps every rendered video on local disk, keyed by prompt and model
+
+A Veo render is expensive and the provider's URL is not ours to keep, so
+the finished video is downloaded once and stored under a hash of the
+(truncated) prompt and the model that rendered it. A later request for the
+same prompt and model is answered from the store without rendering again,
+and playback is served from here (see /api/videos/{video_id}).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+try:
+    from .metrics import REGISTRY
+    from .settings import DATA_DIR, get_section
+    from .single_flight import canonical_json
+except ImportError:
+    from metrics import REGISTRY
+    from settings import DATA_DIR, get_section
+    from single_flight import canonical_json
+
+logger = logging.getLogger(__name__)
+
+VIDEO_STORE_LOOKUPS = REGISTRY.counter(
+    "adflow_video_store_lookups_total",
+    "Video store lookups by outcome (hit, miss)",
+    ["result"]
+)
+
+# Bytes read per chunk while downloading a video
+CHUNK_SIZE = 256 * 1024
+
+VIDEO_MIME_TYPES = ("video/mp4", "video/webm", "video/quicktime")
+
+
+def video_key(prompt: str, model: Optional[str]) -> str:
+    """Store key of a video: sha256 of the prompt and the rendering model"""
+    return hashlib.sha256(canonical_json([prompt, model or ""]).encode("utf-8")).hexdigest()
+
+
+class VideoStore:
+    """Content store of rendered videos with an LRU size bound"""
+
+    def __init__(
+        self,
+        store_dir: Path,
+        enabled: bool = True,
+        url_prefix: str = "/api/videos/",
+        download_timeout: float = 120.0,
+        max_video_bytes: int = 200 * 1024 * 1024,
+        max_store_bytes: int = 20 * 1024 * 1024 * 1024
+    ):
+        """
+        Args:
+            store_dir: Directory holding the videos and their metadata
+            enabled: When False nothing is stored or looked up
+            url_prefix: Playback URL of a stored video is url_prefix + video id
+            download_timeout: Connect/read timeout in seconds for the provider download
+            max_video_bytes: Largest video downloaded
+            max_store_bytes: Store size; least recently played videos go first
+        """
+        self.store_dir = Path(store_dir)
+        self.enabled = enabled
+        self.url_prefix = url_prefix
+        self.download_timeout = download_timeout
+        self.max_video_bytes = max_video_bytes
+        self.max_store_bytes = max_store_bytes
+        self._evict_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.download_errors = 0
+
+    @classmethod
+    def from_settings(cls) -> "VideoStore":
+        """Build the store from the [video_store] section of pipelex_config.toml"""
+        section = get_section("video_store")
+        return cls(
+            store_dir=DATA_DIR / "videos",
+            enabled=bool(section.get("enabled", True)),
+            url_prefix=str(section.get("url_prefix", "/api/videos/")),
+            download_timeout=float(section.get("download_timeout", 120.0)),
+            max_video_bytes=int(section.get("max_video_mb", 200)) * 1024 * 1024,
+            max_store_bytes=int(float(section.get("max_store_gb", 20)) * 1024 * 1024 * 1024)
+        )
+
+    def _paths(self, video_id: str):
+        return self.store_dir / f"{video_id}.bin", self.store_dir / f"{video_id}.json"
+
+    def playback_url(self, video_id: str) -> str:
+        return f"{self.url_prefix}{video_id}"
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Metadata of a stored video (None if it is not stored), marked as recently played
+
+        The result carries "path", the file to serve.
+        """
+        if not self.enabled or len(video_id) != 64 or not all(c in "0123456789abcdef" for c in video_id):
+            return None
+        data_path, meta_path = self._paths(video_id)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            size = data_path.stat().st_size
+        except (OSError, ValueError):
+            return None
+        if size != meta.get("size"):
+            return None
+        self._touch(data_path)
+        return {**meta, "path": data_path}
+
+    async def lookup(self, prompt: str, model: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Stored video for this prompt and model, marked as recently used (see get)"""
+        if not self.enabled:
+            return None
+        meta = await asyncio.to_thread(self.get, video_key(prompt, model))
+        if meta is None:
+            self.misses += 1
+            VIDEO_STORE_LOOKUPS.inc(result="miss")
+            return None
+        self.hits += 1
+        VIDEO_STORE_LOOKUPS.inc(result="hit")
+        return meta
+
+    async def save(self, prompt: str, model: Optional[str], source_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Download a finished render into the store
+
+        Never raises: a failed download is logged and the caller keeps the
+        provider's URL.
+
+        Args:
+            prompt: The (truncated) prompt the video was rendered from
+            model: Model that rendered it
+            source_url: The provider's http(s) URL of the video
+
+        Returns:
+            Metadata of the stored video, or None if it could not be stored
+        """
+        if not self.enabled or not source_url or not source_url.startswith(("http://", "https://")):
+            return None
+
+        video_id = video_key(prompt, model)
+        data_path, meta_path = self._paths(video_id)
+        tmp_path = data_path.with_name(f"{data_path.name}.{os.getpid()}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            await asyncio.to_thread(self.store_dir.mkdir, parents=True, exist_ok=True)
+            async with httpx.AsyncClient(timeout=httpx.Timeout(self.download_timeout), follow_redirects=True) as client:
+                async with client.stream("GET", source_url) as response:
+                    response.raise_for_status()
+                    mime_type = response.headers.get("content-type", "").split(";")[0].strip()
+                    if mime_type not in VIDEO_MIME_TYPES:
+                        mime_type = "video/mp4"
+                    with open(tmp_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                            size += len(chunk)
+                            if size > self.max_video_bytes:
+                                raise ValueError(f"Video larger than {self.max_video_bytes} bytes")
+                            digest.update(chunk)
+                            await asyncio.to_thread(f.write, chunk)
+        except (httpx.HTTPError, OSError, ValueError) as e:
+            self.download_errors += 1
+            logger.warning(f"Could not store video from {source_url}: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return None
+
+        meta = {
+            "video_id": video_id,
+            "prompt": prompt,
+            "model": model,
+            "size": size,
+            "mime_type": mime_type,
+            "sha256": digest.hexdigest(),
+            "source_url": source_url,
+            "created_at": time.time()
+        }
+        await asyncio.to_thread(self._commit, tmp_path, data_path, meta_path, meta)
+        self.stored += 1
+        return {**meta, "path": data_path}
+
+    def _commit(self, tmp_path: Path, data_path: Path, meta_path: Path, meta: Dict[str, Any]) -> None:
+        """Publish a downloaded video: data first, then the metadata that makes it visible"""
+        os.replace(tmp_path, data_path)
+        meta_tmp = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        meta_tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(meta_tmp, meta_path)
+        self._evict()
+
+    def _touch(self, data_path: Path) -> None:
+        try:
+            os.utime(data_path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Delete least recently used videos beyond max_store_bytes"""
+        with self._evict_lock:
+            try:
+                files = [entry for entry in os.scandir(self.store_dir) if entry.name.endswith(".bin")]
+            except OSError:
+                return
+            stats = []
+            for entry in files:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Evicted meanwhile by a sibling worker
+                    continue
+                stats.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in stats)
+            for _, size, path in sorted(stats):
+                if total <= self.max_store_bytes:
+                    break
+                for victim in (path[:-len(".bin")] + ".json", path):
+                    try:
+                        os.remove(victim)
+                    except OSError:
+                        pass
+                total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "download_errors": self.download_errors
+        }
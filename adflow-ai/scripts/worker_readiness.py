@@ -0,0 +1,136 @@
+"""
+AdFlow AI - Worker Readiness
+Tracks which API worker processes are warm
+
+Every uvicorn worker warms up on its own. A worker that finished drops a
+marker file named after its pid in a directory shared by the server's
+workers, so a readiness probe answered by any one of them can tell whether
+all of them are ready.
+"""
+
+import asyncio
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List
+
+try:
+    from .settings import DATA_DIR
+except ImportError:
+    from settings import DATA_DIR
+
+# One subdirectory per server run, holding a marker per ready worker
+WORKERS_DIR = DATA_DIR / "workers"
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this pid is running on this machine"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def prune_stale_servers(workers_dir: Path = WORKERS_DIR) -> int:
+    """
+    Delete the state directories of server runs with no live worker left
+
+    Returns:
+        Number of directories removed
+    """
+    try:
+        server_dirs = [entry for entry in os.scandir(workers_dir) if entry.is_dir()]
+    except OSError:
+        return 0
+    removed = 0
+    for server_dir in server_dirs:
+        try:
+            names = os.listdir(server_dir.path)
+        except OSError:
+            continue
+        if any(name.isdigit() and pid_alive(int(name)) for name in names):
+            continue
+        shutil.rmtree(server_dir.path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+class WorkerReadiness:
+    """Readiness of this worker and of its sibling workers"""
+
+    def __init__(self, state_dir: Path, expected_workers: int = 1):
+        """
+        Args:
+            state_dir: Directory shared by the workers of one server run
+            expected_workers: Workers the server was started with
+        """
+        self.state_dir = Path(state_dir)
+        self.expected_workers = max(1, expected_workers)
+        self.pid = os.getpid()
+        self.ready = asyncio.Event()
+        self.draining = False
+
+    @classmethod
+    def from_environment(cls) -> "WorkerReadiness":
+        """
+        Build from ADFLOW_SERVER_ID and ADFLOW_WORKERS, set by serve_api.main()
+
+        Without them (e.g. a plain `uvicorn railway_api:app`) only this
+        worker is considered, and state left by earlier runs is pruned here
+        rather than by serve_api.main().
+        """
+        server_id = os.getenv("ADFLOW_SERVER_ID")
+        if not server_id:
+            prune_stale_servers()
+            server_id = f"standalone-{os.getpid()}"
+        return cls(
+            state_dir=WORKERS_DIR / server_id,
+            expected_workers=int(os.getenv("ADFLOW_WORKERS", "1"))
+        )
+
+    @property
+    def marker(self) -> Path:
+        return self.state_dir / str(self.pid)
+
+    def mark_ready(self) -> None:
+        """This worker is warm and can take traffic"""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.marker.touch()
+        self.ready.set()
+
+    def mark_draining(self) -> None:
+        """This worker is shutting down: stop advertising it"""
+        self.draining = True
+        self.ready.clear()
+        try:
+            self.marker.unlink()
+        except OSError:
+            pass
+
+    def ready_workers(self) -> List[int]:
+        """Pids of live workers that finished warming up"""
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            return []
+        return [int(name) for name in names if name.isdigit() and pid_alive(int(name))]
+
+    def is_ready(self) -> bool:
+        """This worker and every expected sibling are warm"""
+        return (
+            self.ready.is_set()
+            and not self.draining
+            and len(self.ready_workers()) >= self.expected_workers
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": self.pid,
+            "worker_ready": self.ready.is_set(),
+            "draining": self.draining,
+            "ready_workers": len(self.ready_workers()),
+            "expected_workers": self.expected_workers
+        }
@@ -2,15 +2,33 @@
 """
 Workflow Executor
 Generic script for executing any Pipelex workflow via API calls
+
+Modes:
+    python workflow_executor.py            # one-shot: one JSON request on stdin
+    python workflow_executor.py --worker   # warm worker: NDJSON requests on stdin
+
+Requests may carry inputs.deadline_ms; pipeline stages still running when it
+passes are aborted. Requests naming an unknown workflow or missing a required
+input are rejected before AdGenerator and Pipelex are loaded.
+
+Pass --startup-report to print the cold-start timings of the process to stderr.
 """
 
+import argparse
 import asyncio
 import json
 import sys
 import logging
+import re
+import time
 from pathlib import Path
-from typing import Dict, Any
-from ad_generator import AdGenerator
+from typing import TYPE_CHECKING, Dict, Any, Optional, TextIO
+
+from json_codec import dumps, loads
+from pipelex_runtime import enter_project_root, record_phase, startup_report
+
+if TYPE_CHECKING:
+    from ad_generator import AdGenerator
 
 # Configure logging to stderr to prevent interference with JSON output
 logging.basicConfig(
@@ -20,23 +38,84 @@ logging.basicConfig(
 )
 
 
-async def execute_workflow(workflow_name: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+# Default number of requests a warm worker runs at the same time
+DEFAULT_WORKER_CONCURRENCY = 4
+
+# Largest NDJSON request line accepted by a warm worker (inputs may carry data URIs)
+MAX_REQUEST_LINE_BYTES = 64 * 1024 * 1024
+
+# Leading '{"id": ...' of a request line, to answer one that is too long to parse
+REQUEST_ID_PATTERN = re.compile(rb'\s*\{\s*"id"\s*:\s*(-?\d+|"[^"\\]{0,256}")')
+
+# Workflows this executor runs, with the inputs each one requires
+WORKFLOWS = {
+    "analyze_product_image": ("image_url", "product_info"),
+    "generate_ad_copy_variants": ("product_info", "image_analysis"),
+    "generate_complete_ad": ("image_url",),
+    "generate_single_tone_ad": ("product_info", "image_analysis"),
+    "generate_tone_variants": ("image_url", "product_info"),
+    "generate_video": ("video_prompt",),
+}
+
+
+def validate_request(workflow_name: Any, inputs: Any) -> Optional[str]:
+    """
+    Check a request without loading any workflow code
+
+    Returns:
+        Error message, or None if the request can be executed
+    """
+    if workflow_name not in WORKFLOWS:
+        return f"Unknown workflow: {workflow_name}"
+    if not isinstance(inputs, dict):
+        return "inputs must be a JSON object"
+    missing = [name for name in WORKFLOWS[workflow_name] if inputs.get(name) in (None, "")]
+    if missing:
+        return f"Missing required input(s) for {workflow_name}: {', '.join(missing)}"
+    return None
+
+
+def load_generator() -> "AdGenerator":
+    """Import and build the AdGenerator (Pipelex itself initializes on first use)"""
+    started = time.perf_counter()
+    from ad_generator import AdGenerator
+    generator = AdGenerator()
+    record_phase("load_generator", started)
+    return generator
+
+
+async def execute_workflow(
+    workflow_name: str,
+    inputs: Dict[str, Any],
+    generator: Optional["AdGenerator"] = None
+) -> Dict[str, Any]:
     """
     Execute a Pipelex workflow
 
     Args:
         workflow_name: Name of the workflow to execute
         inputs: Input data for the workflow
+        generator: Shared AdGenerator to reuse (a new one is created if omitted)
 
     Returns:
         Execution results
     """
-    generator = AdGenerator()
+    error = validate_request(workflow_name, inputs)
+    if error:
+        return {
+            "success": False,
+            "data": None,
+            "error": error
+        }
+
+    if generator is None:
+        generator = load_generator()
 
     if workflow_name == "analyze_product_image":
         return await generator.analyze_product_image(
             image_url=inputs.get("image_url"),
-            product_info=inputs.get("product_info")
+            product_info=inputs.get("product_info"),
+            deadline_ms=inputs.get("deadline_ms")
         )
 
     elif workflow_name == "generate_ad_copy_variants":
@@ -48,7 +127,8 @@ async def execute_workflow(workflow_name: str, inputs: Dict[str, Any]) -> Dict[s
     elif workflow_name == "generate_complete_ad":
         return await generator.generate_complete_ad(
             image_url=inputs.get("image_url"),
-            product_info=inputs.get("product_info")
+            product_info=inputs.get("product_info"),
+            deadline_ms=inputs.get("deadline_ms")
         )
 
     elif workflow_name == "generate_single_tone_ad":
@@ -58,9 +138,19 @@ async def execute_workflow(workflow_name: str, inputs: Dict[str, Any]) -> Dict[s
             tone=inputs.get("tone", "professional")
         )
 
+    elif workflow_name == "generate_tone_variants":
+        return await generator.generate_tone_variants(
+            image_url=inputs.get("image_url"),
+            product_info=inputs.get("product_info"),
+            tones=inputs.get("tones"),
+            max_concurrency=inputs.get("max_concurrency"),
+            deadline_ms=inputs.get("deadline_ms")
+        )
+
     elif workflow_name == "generate_video":
         return await generator.generate_video(
-            video_prompt=inputs.get("video_prompt")
+            video_prompt=inputs.get("video_prompt"),
+            deadline_ms=inputs.get("deadline_ms")
         )
 
     else:
@@ -71,10 +161,154 @@ async def execute_workflow(workflow_name: str, inputs: Dict[str, Any]) -> Dict[s
         }
 
 
-async def main():
-    """Main function for API integration"""
+class WorkerServer:
+    """
+    Long-lived worker that serves NDJSON requests from stdin
+
+    Each request line is ``{"id": ..., "workflow_name": ..., "inputs": {...}}``
+    and produces exactly one response line ``{"id": ..., "success": ..., ...}``
+    on stdout. Requests run concurrently on one event loop and share a single
+    AdGenerator, so the interpreter start, imports and Pipelex initialization
+    are paid once per worker instead of once per request.
+
+    A ``{"id": ..., "cancel": true}`` line aborts the running request with
+    that id, which then answers ``{"id": ..., "success": false, "cancelled": true}``.
+    A line longer than MAX_REQUEST_LINE_BYTES is skipped and answered with an
+    error (with its id when the line starts with it).
+    """
+
+    def __init__(
+        self,
+        output: TextIO,
+        max_concurrency: int = DEFAULT_WORKER_CONCURRENCY,
+        generator: Optional["AdGenerator"] = None
+    ):
+        self.output = output
+        self.generator = generator or load_generator()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.write_lock = asyncio.Lock()
+        self.tasks: set = set()
+        self.running: Dict[Any, asyncio.Task] = {}
+
+    async def write(self, message: Dict[str, Any]) -> None:
+        """Write one response line to stdout"""
+        async with self.write_lock:
+            self.output.write(dumps(message) + "\n")
+            self.output.flush()
+
+    async def handle_line(self, line: bytes) -> None:
+        """Parse and execute one request line, always answering with one response"""
+        request_id = None
+        try:
+            request = loads(line)
+            request_id = request.get("id")
+            if request.get("cancel"):
+                self.cancel(request_id)
+                return
+            if request_id is not None:
+                self.running[request_id] = asyncio.current_task()
+            async with self.semaphore:
+                result = await execute_workflow(
+                    request.get("workflow_name"),
+                    request.get("inputs", {}),
+                    generator=self.generator
+                )
+        except asyncio.CancelledError:
+            result = {
+                "success": False,
+                "data": None,
+                "error": "Request cancelled",
+                "cancelled": True
+            }
+        except Exception as e:
+            result = {
+                "success": False,
+                "data": None,
+                "error": f"Workflow execution failed: {str(e)}"
+            }
+        finally:
+            if self.running.get(request_id) is asyncio.current_task():
+                del self.running[request_id]
+        await self.write({"id": request_id, **result})
+
+    def cancel(self, request_id: Any) -> None:
+        """Abort a running request (unknown or finished ids are ignored)"""
+        task = self.running.get(request_id)
+        if task is not None:
+            task.cancel()
+
+    async def serve(self) -> None:
+        """Read requests until stdin closes, then drain in-flight work"""
+        loop = asyncio.get_running_loop()
+        # Validate and load every bundle before accepting work
+        await self.generator.bundles.load_all()
+
+        reader = asyncio.StreamReader(limit=MAX_REQUEST_LINE_BYTES)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        # Tell the parent process the worker is warm and accepting requests
+        await self.write({"id": None, "event": "ready", "startup": startup_report()})
+        await self.read_requests(reader)
+
+    async def read_requests(self, reader: asyncio.StreamReader) -> None:
+        """Start a task per request line until the reader ends, then wait for them"""
+        while True:
+            try:
+                line = await reader.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                # Input ended, possibly after a last line without a newline
+                line = e.partial
+                if not line:
+                    break
+            except asyncio.LimitOverrunError as e:
+                await self.skip_long_line(reader, e.consumed)
+                continue
+            if not line.strip():
+                continue
+            task = asyncio.create_task(self.handle_line(line))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def skip_long_line(self, reader: asyncio.StreamReader, consumed: int) -> None:
+        """Discard the rest of an over-long request line and answer it with an error"""
+        head = b""
+        while True:
+            chunk = await reader.readexactly(consumed)
+            head = head or chunk[:512]
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+            except asyncio.IncompleteReadError:
+                break
+        match = REQUEST_ID_PATTERN.match(head)
+        await self.write({
+            "id": loads(match.group(1)) if match else None,
+            "success": False,
+            "data": None,
+            "error": f"Request line longer than {MAX_REQUEST_LINE_BYTES} bytes"
+        })
+
+
+async def run_worker(max_concurrency: int) -> None:
+    """Run the warm worker loop with stdout reserved for responses"""
+    original_stdout = sys.stdout
+    # Everything else printed while the worker runs goes to stderr
+    sys.stdout = sys.stderr
+    try:
+        await WorkerServer(original_stdout, max_concurrency=max_concurrency).serve()
+    finally:
+        sys.stdout = original_stdout
+
+
+async def run_once():
+    """Execute a single request read from stdin"""
     # Read from stdin for API calls
-    input_data = json.loads(sys.stdin.read())
+    input_data = loads(sys.stdin.buffer.read())
 
     workflow_name = input_data.get("workflow_name")
     inputs = input_data.get("inputs", {})
@@ -93,17 +327,51 @@ async def main():
         sys.stdout = original_stdout
         
         # Output JSON to stdout (only this line should go to stdout)
-        print(json.dumps(result), flush=True)
+        print(dumps(result), flush=True)
         
     except Exception as e:
         # Restore stdout in case of error
         sys.stdout = original_stdout
-        print(json.dumps({
+        print(dumps({
             "success": False,
             "data": None,
             "error": f"Workflow execution failed: {str(e)}"
         }), flush=True)
 
 
+def main():
+    """Main function for API integration"""
+    parser = argparse.ArgumentParser(description="Execute Pipelex workflows")
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="Stay alive and serve newline-delimited JSON requests from stdin"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_WORKER_CONCURRENCY,
+        help="Maximum concurrent requests in worker mode"
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Print import and Pipelex initialization timings to stderr on exit"
+    )
+    args = parser.parse_args()
+    enter_project_root()
+
+    started = time.perf_counter()
+    try:
+        if args.worker:
+            asyncio.run(run_worker(max(1, args.concurrency)))
+        else:
+            asyncio.run(run_once())
+    finally:
+        if args.startup_report:
+            record_phase("run", started)
+            print(json.dumps({"startup": startup_report()}), file=sys.stderr, flush=True)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
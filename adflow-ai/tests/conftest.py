@@ -0,0 +1,23 @@
+"""
+Shared setup for the AdFlow unit tests
+
+    python -m pytest tests
+
+The tests exercise the scripts/ modules directly and never call a
+provider: only test_ad_generator initializes Pipelex, with the stub
+inference backend. Local state goes to a temporary DATA_DIR.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Set before any scripts module reads settings.DATA_DIR
+os.environ.setdefault("ADFLOW_DATA_DIR", tempfile.mkdtemp(prefix="adflow-tests-"))
+
+# Modules are imported as scripts.<name>; workflow_executor imports its siblings by bare name
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(1, str(PROJECT_ROOT / "scripts"))
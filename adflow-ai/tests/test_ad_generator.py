@@ -0,0 +1,34 @@
+"""AdGenerator on the offline stub backend (scripts/ad_generator.py)"""
+
+import asyncio
+
+import pytest
+
+from conftest import PROJECT_ROOT
+
+pytest.importorskip("pipelex")
+
+
+@pytest.fixture
+def generator(monkeypatch, tmp_path):
+    # Pipelex only checks these keys are set; the stub backend never calls a provider
+    for name in ("BLACKBOX_API_KEY", "PIPELEX_INFERENCE_API_KEY"):
+        monkeypatch.setenv(name, "test")
+    monkeypatch.setenv("PIPELEX_FORCE_DRY_RUN_MODE", "dry")
+    monkeypatch.setenv("ADFLOW_INFERENCE_BACKEND", "stub")
+    monkeypatch.setenv("ADFLOW_STUB_LATENCY_SCALE", "0")
+    monkeypatch.setenv("ADFLOW_STUB_SEED", "0")
+    monkeypatch.chdir(PROJECT_ROOT)
+
+    from scripts.ad_generator import AdGenerator
+    from scripts.history_store import HistoryStore
+
+    generator = AdGenerator()
+    generator.history = HistoryStore(tmp_path / "history.sqlite3")
+    return generator
+
+
+def test_inference_warm_up_is_not_recorded_in_history(generator):
+    timings = asyncio.run(generator.warm_up(inference=True))
+    assert "inference" in timings
+    assert generator.history.list()["items"] == []
@@ -0,0 +1,115 @@
+"""Concurrency limits and the bounded wait queue (scripts/admission.py)"""
+
+import asyncio
+
+import pytest
+
+from scripts.admission import AdmissionController, AdmissionRejected
+
+
+def make_controller(max_concurrent: int = 1, max_queue: int = 1, queue_timeout: float = 5.0) -> AdmissionController:
+    return AdmissionController("test", max_concurrent=max_concurrent, max_queue=max_queue, queue_timeout=queue_timeout)
+
+
+def test_admits_up_to_max_concurrent_at_once():
+    async def scenario():
+        controller = make_controller(max_concurrent=2)
+        tickets = [await controller.acquire(), await controller.acquire()]
+        assert controller.in_flight == 2
+        for ticket in tickets:
+            ticket.release()
+        assert controller.in_flight == 0
+        return controller.admitted
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_rejects_when_the_queue_is_full():
+    async def scenario():
+        controller = make_controller(max_concurrent=1, max_queue=1)
+        ticket = await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        assert "queue full" in str(rejected.value)
+        assert rejected.value.retry_after >= 1
+        ticket.release()
+        (await waiting).release()
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.rejected_queue_full == 1
+    assert controller.in_flight == 0
+
+
+def test_rejects_after_the_queue_timeout():
+    async def scenario():
+        controller = make_controller(queue_timeout=0.01)
+        ticket = await controller.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        ticket.release()
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+    assert "queue timeout" in str(rejected)
+    assert controller.rejected_timeout == 1
+    assert controller.queued == 0
+    assert controller.in_flight == 0
+
+
+def test_released_slots_go_to_waiters_in_arrival_order():
+    async def scenario():
+        controller = make_controller(max_concurrent=1, max_queue=3)
+        order = []
+
+        async def request(name: str):
+            async with controller.admit():
+                order.append(name)
+                await asyncio.sleep(0)
+
+        first = await controller.acquire()
+        waiters = [asyncio.create_task(request(name)) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        first.release()
+        await asyncio.gather(*waiters)
+        return controller, order
+
+    controller, order = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert controller.in_flight == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = make_controller(max_concurrent=1, max_queue=1)
+        ticket = await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert controller.queued == 0
+        # The freed queue place can be taken again
+        second = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        ticket.release()
+        (await second).release()
+        return controller
+
+    assert asyncio.run(scenario()).in_flight == 0
+
+
+def test_release_is_idempotent():
+    async def scenario():
+        controller = make_controller(max_concurrent=2)
+        ticket = await controller.acquire()
+        other = await controller.acquire()
+        ticket.release()
+        ticket.release()
+        assert controller.in_flight == 1
+        other.release()
+        return controller
+
+    assert asyncio.run(scenario()).in_flight == 0
@@ -0,0 +1,36 @@
+"""Loading and typing of source images (scripts/image_ingest.py)"""
+
+import asyncio
+
+import pytest
+
+from scripts.image_ingest import ImageIngestor
+
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010804000000b51c0c02"
+    "0000000b4944415478da63646000000006000230819d0f0000000049454e44ae426082"
+)
+
+
+class FakeFetcher:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def fetch(self, url: str) -> bytes:
+        return self.body
+
+
+def ingestor(tmp_path, body: bytes) -> ImageIngestor:
+    return ImageIngestor(project_root=tmp_path, fetcher=FakeFetcher(body), upload_dir=tmp_path / "uploads")
+
+
+def test_remote_image_is_typed_from_its_signature(tmp_path):
+    ingested = asyncio.run(ingestor(tmp_path, PNG).ingest("https://example.com/shoe"))
+    assert ingested.url.startswith("data:image/")
+    assert ingested.reference == "https://example.com/shoe"
+
+
+@pytest.mark.parametrize("body", [b"<!doctype html><title>404 Not Found</title>", b"", b"%PDF-1.7"])
+def test_remote_body_that_is_not_an_image_is_refused(tmp_path, body):
+    with pytest.raises(ValueError, match="Not a JPEG, PNG, GIF or WEBP image"):
+        asyncio.run(ingestor(tmp_path, body).ingest("https://example.com/shoe.jpg"))
@@ -0,0 +1,66 @@
+"""Latency-budget model choice and primary-model probing (scripts/model_router.py)"""
+
+import pytest
+
+from scripts.model_router import ModelRouter, variant_pipe_code
+
+PRIMARY = "claude-sonnet"
+FAST = "gpt-4o-mini"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("scripts.model_router.time.monotonic", lambda: now[0])
+    return now
+
+
+def make_router(monkeypatch, **overrides) -> ModelRouter:
+    settings = {"fast_model": FAST, "fallback_stages": ["generate_copy"], "probe_interval": 60.0}
+    router = ModelRouter(**{**settings, **overrides})
+    monkeypatch.setattr(router, "primary_model", lambda stage: PRIMARY)
+    return router
+
+
+def test_variant_pipe_code():
+    assert variant_pipe_code("generate_copy", "GPT-4o mini") == "generate_copy__gpt_4o_mini"
+
+
+def test_primary_model_within_budget_or_without_deadline(monkeypatch, clock):
+    router = make_router(monkeypatch)
+    router.observe("generate_copy", PRIMARY, 2.0)
+    assert router.choose("generate_copy", remaining=3.0) == PRIMARY
+    assert router.choose("generate_copy", remaining=None) == PRIMARY
+    assert router.choose("analyze_product", remaining=0.1) == PRIMARY
+
+
+def test_falls_back_when_the_primary_model_is_too_slow(monkeypatch, clock):
+    router = make_router(monkeypatch)
+    router.observe("generate_copy", PRIMARY, 10.0)
+    assert router.choose("generate_copy", remaining=4.0) == FAST
+    assert router.fallbacks == 1
+
+
+def test_slow_primary_model_is_probed_and_recovers(monkeypatch, clock):
+    router = make_router(monkeypatch)
+    router.observe("generate_copy", PRIMARY, 10.0)
+    assert router.choose("generate_copy", remaining=4.0) == FAST
+
+    # One request per probe interval runs the primary model again
+    clock[0] += 60.0
+    assert router.choose("generate_copy", remaining=4.0) == PRIMARY
+    assert router.choose("generate_copy", remaining=4.0) == FAST
+    assert router.probes == 1
+
+    # The probe finds it fast again: enough samples win the traffic back
+    for _ in range(8):
+        router.observe("generate_copy", PRIMARY, 1.0)
+    assert router.choose("generate_copy", remaining=4.0) == PRIMARY
+
+
+def test_probing_can_be_disabled(monkeypatch, clock):
+    router = make_router(monkeypatch, probe_interval=0)
+    router.observe("generate_copy", PRIMARY, 10.0)
+    clock[0] += 3600.0
+    assert router.choose("generate_copy", remaining=4.0) == FAST
+    assert router.probes == 0
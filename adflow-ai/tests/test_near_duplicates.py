@@ -0,0 +1,107 @@
+"""Perceptual hashing and the near-duplicate analysis index (scripts/near_duplicates.py)"""
+
+import random
+
+import pytest
+
+from scripts.near_duplicates import AnalysisIndex, HashIndex, dhash, hamming_distance, informative
+
+ANALYSIS = {"product_name": "Trail shoe", "category": "footwear"}
+
+PHASH = 0x9F3A_51C6_0E7B_D248
+
+
+def flip_bits(value: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def test_hamming_distance():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(0, (1 << 64) - 1) == 64
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 6, 10])
+def test_hash_index_matches_brute_force(max_distance):
+    rng = random.Random(max_distance)
+    index = HashIndex(max_distance)
+    stored = {}
+    base = rng.getrandbits(64)
+    for item_id in range(300):
+        # Half near the query base, half anywhere
+        value = flip_bits(base, rng.randrange(0, 16), rng) if item_id % 2 else rng.getrandbits(64)
+        stored[item_id] = value
+        index.add(value, item_id)
+    assert index.size == 300
+
+    for query in (base, flip_bits(base, 2, rng), rng.getrandbits(64)):
+        expected = sorted(
+            (hamming_distance(query, value), item_id)
+            for item_id, value in stored.items()
+            if hamming_distance(query, value) <= max_distance
+        )
+        assert index.search(query) == expected
+
+
+def test_analysis_index_reuses_close_hashes_per_bundle(tmp_path):
+    index = AnalysisIndex(tmp_path / "analyses.sqlite3", max_distance=4)
+    phash = random.Random(0).getrandbits(64)
+    index.add(phash, "bundle-a", "content-1", ANALYSIS)
+
+    match = index.find(phash ^ 0b101, "bundle-a")
+    assert match == {"analysis": ANALYSIS, "distance": 2, "content_hash": "content-1"}
+    # Too far, or analyzed by another workflow
+    assert index.find(phash ^ 0b11111, "bundle-a") is None
+    assert index.find(phash, "bundle-b") is None
+    assert (index.hits, index.misses, index.stored) == (1, 2, 1)
+
+
+def test_analysis_index_sees_rows_written_by_another_worker(tmp_path):
+    db_path = tmp_path / "analyses.sqlite3"
+    reader = AnalysisIndex(db_path)
+    assert reader.find(PHASH, "bundle") is None
+
+    AnalysisIndex(db_path).add(PHASH, "bundle", "content", ANALYSIS)
+    assert reader.find(PHASH, "bundle")["analysis"] == ANALYSIS
+    assert reader.stats()["indexed"] == 1
+
+
+def test_disabled_index_stores_and_finds_nothing(tmp_path):
+    index = AnalysisIndex(tmp_path / "analyses.sqlite3", enabled=False)
+    index.add(PHASH, "bundle", "content", ANALYSIS)
+    assert index.find(PHASH, "bundle") is None
+    assert index.find(None, "bundle") is None
+    assert not (tmp_path / "analyses.sqlite3").exists()
+
+
+@pytest.mark.parametrize("phash", [0, 1, 0b1010_0101, (1 << 64) - 1, (1 << 64) - 2])
+def test_degenerate_hashes_are_never_indexed_or_matched(tmp_path, phash):
+    assert not informative(phash)
+    index = AnalysisIndex(tmp_path / "analyses.sqlite3")
+    index.add(phash, "bundle", "blank", ANALYSIS)
+    assert index.find(phash, "bundle") is None
+    assert index.stats()["stored"] == 0
+
+
+def test_dhash_survives_resizing():
+    image_module = pytest.importorskip("PIL.Image")
+    rng = random.Random(1)
+    image = image_module.new("RGB", (64, 48))
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(64 * 48)])
+    image = image.resize((640, 480), image_module.BILINEAR)
+
+    assert informative(dhash(image))
+    assert hamming_distance(dhash(image), dhash(image.resize((320, 240)))) <= 6
+
+
+def test_flat_images_are_not_hashed():
+    image_module = pytest.importorskip("PIL.Image")
+    assert dhash(image_module.new("RGB", (640, 480), (10, 200, 30))) is None
+    assert dhash(image_module.new("RGB", (1, 1), (0, 0, 0))) is None
+    # Faint noise on a solid fill
+    rng = random.Random(2)
+    faint = image_module.new("L", (64, 48))
+    faint.putdata([128 + rng.randrange(3) for _ in range(64 * 48)])
+    assert dhash(faint) is None
@@ -0,0 +1,158 @@
+"""Retry classification, backoff and circuit breaking (scripts/resilience.py)"""
+
+import asyncio
+import random
+
+import pytest
+
+from scripts.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, Resilience, is_transient
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class MarkedError(Exception):
+    transient = False
+
+
+class Flaky:
+    """Fails with the given errors, in order, then returns "ok\""""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def make_resilience(**overrides) -> Resilience:
+    settings = {"max_retries": 3, "retry_delay": 0.0, "max_retry_delay": 0.0, "failure_threshold": 5,
+                "reset_timeout": 30.0, "rng": random.Random(0)}
+    return Resilience(**{**settings, **overrides})
+
+
+@pytest.mark.parametrize("error, expected", [
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (ConnectionResetError(), True),
+    (TimeoutError(), True),
+    (ValueError("bad output"), False),
+    (MarkedError(), False),
+    (type("RateLimitError", (Exception,), {})(), True),
+])
+def test_is_transient(error, expected):
+    assert is_transient(error) is expected
+
+
+def test_is_transient_follows_the_cause_chain():
+    try:
+        try:
+            raise ConnectionError("reset")
+        except ConnectionError as cause:
+            raise RuntimeError("pipe failed") from cause
+    except RuntimeError as wrapped:
+        assert is_transient(wrapped)
+
+
+def test_backoff_is_capped_and_jittered():
+    resilience = make_resilience(retry_delay=1.0, max_retry_delay=4.0)
+    delays = [resilience.backoff(attempt) for attempt in range(8) for _ in range(20)]
+    assert all(0.0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_transient_failures_are_retried():
+    resilience = make_resilience()
+    call = Flaky(StatusError(503), ConnectionError())
+    assert asyncio.run(resilience.call("model", "stage", call)) == "ok"
+    assert call.calls == 3
+    assert resilience.retries == 2
+    assert resilience.breaker("model").state == CLOSED
+
+
+def test_permanent_failures_are_not_retried():
+    resilience = make_resilience()
+    call = Flaky(StatusError(400))
+    with pytest.raises(StatusError):
+        asyncio.run(resilience.call("model", "stage", call))
+    assert call.calls == 1
+
+
+def test_retries_stop_at_max_retries():
+    resilience = make_resilience(max_retries=2)
+    call = Flaky(*[StatusError(503)] * 5)
+    with pytest.raises(StatusError):
+        asyncio.run(resilience.call("model", "stage", call))
+    assert call.calls == 3
+
+
+def test_circuit_opens_after_consecutive_transient_failures():
+    resilience = make_resilience(max_retries=0, failure_threshold=2)
+    for _ in range(2):
+        with pytest.raises(StatusError):
+            asyncio.run(resilience.call("model", "stage", Flaky(StatusError(503))))
+    assert resilience.breaker("model").state == OPEN
+
+    call = Flaky()
+    with pytest.raises(CircuitOpen):
+        asyncio.run(resilience.call("model", "stage", call))
+    assert call.calls == 0
+    # Other models keep their own circuit
+    assert asyncio.run(resilience.call("other", "stage", Flaky())) == "ok"
+
+
+def test_permanent_failures_do_not_open_the_circuit():
+    breaker = CircuitBreaker("model", failure_threshold=1)
+    breaker.record_failure(transient=False)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens_the_circuit(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("scripts.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("model", failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure(transient=True)
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    now[0] += 10.0
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_failure(transient=True)
+    assert breaker.state == OPEN
+
+    now[0] += 10.0
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    # Opened by the first failure, then again by the failed probe
+    assert breaker.times_opened == 2
+
+
+def test_cancelled_probe_frees_the_probe_slot(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("scripts.resilience.time.monotonic", lambda: now[0])
+    resilience = make_resilience(max_retries=0, failure_threshold=1, reset_timeout=10.0)
+    resilience.breaker("model").record_failure(transient=True)
+    now[0] += 10.0
+
+    async def cancel_probe():
+        probe = asyncio.create_task(resilience.call("model", "stage", lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await resilience.call("model", "stage", Flaky())
+
+    assert asyncio.run(cancel_probe()) == "ok"
@@ -0,0 +1,62 @@
+"""Two-tier result cache (scripts/result_cache.py)"""
+
+import asyncio
+import threading
+
+from scripts.result_cache import ResultCache, make_cache_key
+
+VALUE = {"ad_copy": {"headline": "Run further"}}
+
+
+def test_make_cache_key_separates_parts():
+    assert make_cache_key("ab", "c") != make_cache_key("a", "bc")
+
+
+def test_memory_then_disk_tier(tmp_path):
+    async def scenario():
+        writer = ResultCache(tmp_path / "cache.sqlite3")
+        await writer.set("key", VALUE)
+        assert await writer.get("key") == VALUE
+
+        # Another process only shares the disk tier
+        reader = ResultCache(tmp_path / "cache.sqlite3")
+        assert await reader.get("key") == VALUE
+        assert await reader.get("key") == VALUE
+        assert await reader.get("other") is None
+        return writer, reader
+
+    writer, reader = asyncio.run(scenario())
+    assert writer.memory_hits == 1
+    assert (reader.disk_hits, reader.memory_hits, reader.misses) == (1, 1, 1)
+
+
+def test_expired_entries_miss(tmp_path):
+    async def scenario():
+        cache = ResultCache(tmp_path / "cache.sqlite3", ttl=-1)
+        await cache.set("key", VALUE)
+        return await cache.get("key")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_disk_tier_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path / "cache.sqlite3")
+    threads = []
+    read_disk, write_disk = cache._read_disk, cache._write_disk
+
+    def record(method):
+        def wrapper(*args):
+            threads.append(threading.current_thread())
+            return method(*args)
+        return wrapper
+
+    monkeypatch.setattr(cache, "_read_disk", record(read_disk))
+    monkeypatch.setattr(cache, "_write_disk", record(write_disk))
+
+    async def scenario():
+        await cache.set("key", VALUE)
+        await cache.get("missing")
+
+    asyncio.run(scenario())
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,127 @@
+"""Coalescing of identical in-flight calls (scripts/single_flight.py)"""
+
+import asyncio
+
+import pytest
+
+from scripts.single_flight import SingleFlight, canonical_json
+
+
+class Work:
+    """Counts its runs and finishes once released"""
+
+    def __init__(self, result: str = "done", error: Exception = None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> str:
+        self.runs += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_canonical_json_ignores_key_order_and_padding():
+    padded = {"b": " x ", "a": [1, {"d": 2, "c": "y "}]}
+    assert canonical_json(padded) == canonical_json({"a": [1, {"c": "y", "d": 2}], "b": "x"})
+    assert canonical_json({"a": "x"}) != canonical_json({"a": "y"})
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        flights = SingleFlight("test")
+        work = Work()
+        callers = [asyncio.create_task(flights.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flights.in_flight == 1
+        work.release.set()
+        results = await asyncio.gather(*callers)
+        return flights, work, results
+
+    flights, work, results = asyncio.run(scenario())
+    assert work.runs == 1
+    assert results == [("done", False), ("done", True), ("done", True)]
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 2}
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flights = SingleFlight("test")
+        first, second = Work("first"), Work("second")
+        callers = [asyncio.create_task(flights.do("a", first)), asyncio.create_task(flights.do("b", second))]
+        await asyncio.sleep(0)
+        first.release.set()
+        second.release.set()
+        return await asyncio.gather(*callers)
+
+    assert asyncio.run(scenario()) == [("first", False), ("second", False)]
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flights = SingleFlight("test")
+        work = Work(error=ValueError("pipeline failed"))
+        callers = [asyncio.create_task(flights.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        work.release.set()
+        return flights, await asyncio.gather(*callers, return_exceptions=True)
+
+    flights, results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.in_flight == 0
+
+
+def test_a_finished_key_starts_new_work():
+    async def scenario():
+        flights = SingleFlight("test")
+        work = Work()
+        work.release.set()
+        await flights.do("key", work)
+        return await flights.do("key", work), work
+
+    (result, coalesced), work = asyncio.run(scenario())
+    assert (result, coalesced) == ("done", False)
+    assert work.runs == 2
+
+
+def test_one_caller_leaving_does_not_cancel_the_work():
+    async def scenario():
+        flights = SingleFlight("test")
+        work = Work()
+        leaving = asyncio.create_task(flights.do("key", work))
+        staying = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        work.release.set()
+        return await staying, work
+
+    result, work = asyncio.run(scenario())
+    assert result == ("done", True)
+    assert not work.cancelled
+
+
+def test_work_is_cancelled_once_every_caller_has_left():
+    async def scenario():
+        flights = SingleFlight("test")
+        work = Work()
+        callers = [asyncio.create_task(flights.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flights, work
+
+    flights, work = asyncio.run(scenario())
+    assert work.cancelled
+    assert flights.in_flight == 0
@@ -0,0 +1,101 @@
+"""Outbound URL checks and the image fetcher's redirect handling (scripts/url_guard.py)"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from scripts.image_fetcher import ImageFetcher
+from scripts.url_guard import UnsafeURL, check_public_url, is_public_address
+
+PUBLIC_URL = "http://93.184.215.14/shoe.png"
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("93.184.215.14", True),
+    ("2606:4700::1111", True),
+    ("127.0.0.1", False),
+    ("10.1.2.3", False),
+    ("172.16.0.1", False),
+    ("192.168.1.1", False),
+    ("169.254.169.254", False),
+    ("100.64.0.1", False),
+    ("0.0.0.0", False),
+    ("::1", False),
+    ("fe80::1%eth0", False),
+    ("fd00::1", False),
+    ("::ffff:127.0.0.1", False),
+    ("not an address", False),
+])
+def test_is_public_address(address, expected):
+    assert is_public_address(address) is expected
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/metrics",
+    "http://localhost/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/",
+    "https://10.0.0.5/image.png",
+    "file:///etc/passwd",
+    "ftp://93.184.215.14/image.png",
+    "http:///no-host",
+    "http://93.184.215.14:99999/",
+])
+def test_unsafe_urls_are_refused(url):
+    with pytest.raises(UnsafeURL):
+        asyncio.run(check_public_url(url))
+
+
+def test_public_url_is_allowed():
+    asyncio.run(check_public_url(PUBLIC_URL))
+
+
+def fetcher_with(handler, monkeypatch) -> ImageFetcher:
+    fetcher = ImageFetcher(cache_dir=None)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=False)
+
+    async def http():
+        return client
+
+    monkeypatch.setattr(fetcher, "_http", http)
+    return fetcher
+
+
+def test_fetcher_follows_public_redirects(monkeypatch):
+    def handler(request):
+        if request.url.path == "/moved.png":
+            return httpx.Response(302, headers={"location": PUBLIC_URL})
+        return httpx.Response(200, content=b"image bytes")
+
+    fetcher = fetcher_with(handler, monkeypatch)
+    assert asyncio.run(fetcher.fetch("http://93.184.215.14/moved.png")) == b"image bytes"
+
+
+def test_fetcher_refuses_redirects_to_private_hosts(monkeypatch):
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data/"})
+
+    fetcher = fetcher_with(handler, monkeypatch)
+    with pytest.raises(UnsafeURL):
+        asyncio.run(fetcher.fetch(PUBLIC_URL))
+    assert requested == [PUBLIC_URL]
+    assert fetcher.errors == 1
+
+
+def test_fetcher_stops_after_too_many_redirects(monkeypatch):
+    fetcher = fetcher_with(lambda request: httpx.Response(302, headers={"location": PUBLIC_URL}), monkeypatch)
+    with pytest.raises(ValueError, match="redirects"):
+        asyncio.run(fetcher.fetch(PUBLIC_URL))
+
+
+def test_client_of_a_finished_loop_is_closed_and_replaced():
+    fetcher = ImageFetcher(cache_dir=None)
+    first = asyncio.run(fetcher._http())
+    second = asyncio.run(fetcher._http())
+    assert first is not second
+    assert first.is_closed
+    asyncio.run(fetcher.aclose())
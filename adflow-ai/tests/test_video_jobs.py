@@ -0,0 +1,74 @@
+"""Persistent video job queue (scripts/video_jobs.py)"""
+
+import asyncio
+
+import pytest
+
+from scripts.url_guard import UnsafeURL
+from scripts.video_jobs import VideoJobQueue
+
+
+class FakeGenerator:
+    """generate_video finishes once released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def generate_video(self, video_prompt: str):
+        await self.release.wait()
+        return {"success": True, "data": {"video_url": "/api/videos/abc"}, "error": None}
+
+
+def make_queue(tmp_path) -> VideoJobQueue:
+    return VideoJobQueue(FakeGenerator(), tmp_path / "jobs.sqlite3", cancel_poll_seconds=0.01)
+
+
+@pytest.mark.parametrize("webhook_url", [
+    "http://127.0.0.1:8000/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "file:///etc/passwd",
+    "ftp://93.184.215.14/hook",
+])
+def test_webhooks_to_non_public_hosts_are_refused(tmp_path, webhook_url):
+    queue = make_queue(tmp_path)
+    with pytest.raises(UnsafeURL):
+        asyncio.run(queue.submit("a shoe on a beach", webhook_url=webhook_url))
+    assert queue.stats()["jobs"] == {}
+
+
+async def wait_for_status(queue: VideoJobQueue, job_id: str, status: str) -> None:
+    while queue.get(job_id)["status"] != status:
+        await asyncio.sleep(0.01)
+
+
+def test_cancel_stops_a_running_job(tmp_path):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        job = await queue.submit("a shoe on a beach")
+        await wait_for_status(queue, job["id"], "running")
+        cancelled = await queue.cancel(job["id"])
+        await queue.shutdown()
+        return cancelled
+
+    assert asyncio.run(scenario())["status"] == "cancelled"
+
+
+def test_cancel_keeps_a_job_that_finished_first(tmp_path, monkeypatch):
+    async def scenario():
+        queue = make_queue(tmp_path)
+        queue.generator.release.set()
+        job = await queue.submit("a shoe on a beach")
+        await wait_for_status(queue, job["id"], "succeeded")
+
+        # cancel() reads the job just before it finished
+        stale = {**queue.get(job["id"]), "status": "running", "result": None}
+        read = queue.get
+        reads = iter([stale])
+        monkeypatch.setattr(queue, "get", lambda job_id: next(reads, None) or read(job_id))
+        answer = await queue.cancel(job["id"])
+        await queue.shutdown()
+        return answer, read(job["id"])
+
+    answer, stored = asyncio.run(scenario())
+    assert answer["status"] == stored["status"] == "succeeded"
+    assert stored["result"] == {"video_url": "/api/videos/abc"}
@@ -0,0 +1,34 @@
+"""Local store of rendered videos (scripts/video_store.py)"""
+
+import json
+import os
+
+from scripts.video_store import VideoStore, video_key
+
+
+def store_video(store: VideoStore, prompt: str, size: int, mtime: float) -> str:
+    video_id = video_key(prompt, "veo")
+    data_path, meta_path = store._paths(video_id)
+    data_path.write_bytes(b"v" * size)
+    meta_path.write_text(json.dumps({"video_id": video_id, "size": size, "mime_type": "video/mp4"}))
+    os.utime(data_path, (mtime, mtime))
+    return video_id
+
+
+def test_playback_protects_a_video_from_eviction(tmp_path):
+    store = VideoStore(tmp_path, max_store_bytes=2500)
+    oldest = store_video(store, "played often", 1000, mtime=1000.0)
+    newer = store_video(store, "rendered later", 1000, mtime=2000.0)
+
+    assert store.get(oldest)["path"].exists()
+    store_video(store, "newest", 1000, mtime=3000.0)
+    store._evict()
+
+    assert store.get(oldest) is not None
+    assert store.get(newer) is None
+
+
+def test_unknown_or_malformed_ids_are_not_found(tmp_path):
+    store = VideoStore(tmp_path)
+    assert store.get("0" * 64) is None
+    assert store.get("../etc/passwd") is None
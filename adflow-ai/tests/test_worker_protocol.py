@@ -0,0 +1,101 @@
+"""NDJSON request protocol of the warm worker (scripts/workflow_executor.py)"""
+
+import asyncio
+import io
+import json
+
+import workflow_executor as we
+
+
+class FakeGenerator:
+    """Answers generate_complete_ad at once, or waits until released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.release.set()
+        self.calls = []
+
+    async def generate_complete_ad(self, image_url, product_info=None, deadline_ms=None):
+        self.calls.append(image_url)
+        await self.release.wait()
+        return {"success": True, "data": {"image_url": image_url}, "error": None}
+
+
+def request(request_id, workflow_name="generate_complete_ad", **inputs) -> bytes:
+    inputs.setdefault("image_url", "https://example.com/shoe.png")
+    return json.dumps({"id": request_id, "workflow_name": workflow_name, "inputs": inputs}).encode() + b"\n"
+
+
+def serve(data: bytes, limit: int = 1024, generator: FakeGenerator = None):
+    """Feed the request bytes to a worker and return its response lines by id"""
+    async def scenario():
+        output = io.StringIO()
+        server = we.WorkerServer(output, generator=generator or FakeGenerator())
+        reader = asyncio.StreamReader(limit=limit)
+        reader.feed_data(data)
+        reader.feed_eof()
+        await server.read_requests(reader)
+        return output.getvalue()
+
+    lines = [json.loads(line) for line in asyncio.run(scenario()).splitlines()]
+    return {line["id"]: line for line in lines}, lines
+
+
+def test_requests_are_answered_by_id():
+    responses, _ = serve(request(1) + request("two", image_url="https://example.com/bag.png"))
+    assert responses[1]["success"] is True
+    assert responses["two"]["data"] == {"image_url": "https://example.com/bag.png"}
+
+
+def test_invalid_requests_are_rejected_before_running():
+    generator = FakeGenerator()
+    data = request(1, workflow_name="nope") + request(2, image_url="") + b"not json\n"
+    responses, _ = serve(data, generator=generator)
+    assert responses[1]["error"] == "Unknown workflow: nope"
+    assert "Missing required input" in responses[2]["error"]
+    assert responses[None]["error"].startswith("Workflow execution failed")
+    assert generator.calls == []
+
+
+def test_over_long_line_is_answered_and_later_lines_still_served():
+    long_line = request(7, product_info="x" * 5000)
+    responses, lines = serve(long_line + request(8), limit=1024)
+    assert len(lines) == 2
+    assert responses[7]["success"] is False
+    assert "longer than" in responses[7]["error"]
+    assert responses[8]["success"] is True
+
+
+def test_over_long_line_without_a_leading_id():
+    line = json.dumps({"inputs": {"image_url": "x" * 5000}, "id": 9}).encode() + b"\n"
+    responses, lines = serve(line, limit=1024)
+    assert len(lines) == 1
+    assert "longer than" in responses[None]["error"]
+
+
+def test_last_line_without_newline_and_blank_lines():
+    responses, lines = serve(b"\n  \n" + request(1) + b"\n" + request(2).rstrip(b"\n"))
+    assert len(lines) == 2
+    assert responses[2]["success"] is True
+
+
+def test_cancel_line_aborts_the_running_request():
+    async def scenario():
+        output = io.StringIO()
+        generator = FakeGenerator()
+        generator.release.clear()
+        server = we.WorkerServer(output, generator=generator)
+        reader = asyncio.StreamReader(limit=1024)
+        reader.feed_data(request(5))
+        serving = asyncio.create_task(server.read_requests(reader))
+        while not generator.calls:
+            await asyncio.sleep(0)
+        reader.feed_data(b'{"id": 5, "cancel": true}\n')
+        reader.feed_eof()
+        await serving
+        return output.getvalue()
+
+    lines = [json.loads(line) for line in asyncio.run(scenario()).splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["id"] == 5
+    assert lines[0]["cancelled"] is True
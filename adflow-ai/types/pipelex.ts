@@ -5,6 +5,17 @@ export interface PipelexExecutionResult {
   output: any;
   error?: string;
   executionTime: number;
+  // The deadline passed before the workflow finished
+  timedOut?: boolean;
+  // The caller aborted the request
+  cancelled?: boolean;
+}
+
+export interface PipelexExecutionOptions {
+  // Deadline for the whole workflow; 0 disables it (default PIPELEX_TIMEOUT_MS)
+  timeoutMs?: number;
+  // Aborts the workflow, e.g. the incoming request's signal
+  signal?: AbortSignal;
 }
 
 export interface WorkflowExecutionRequest {